@@ -87,6 +87,36 @@ DATABASES = {
 }
 
 
+# Caches
+# Product card fragments live in their own bounded LRU so they can't push
+# everything else out of the default cache.
+# 'shared' holds what every worker process must agree on: the anonymous
+# page cache, its tag versions and the category tree version. It is a
+# database table (run `manage.py createcachetable` once); Redis
+# (django.core.cache.backends.redis.RedisCache) works as well.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template-fragments',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'shared_cache',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+PAGE_CACHE_ALIAS = 'shared'
+CATEGORY_TREE_CACHE_ALIAS = 'shared'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django import forms
+from django.utils import timezone
 from django.utils.html import format_html
 from django.urls import reverse
 from import_export import resources, fields
@@ -7,7 +8,7 @@ from import_export.admin import ImportExportModelAdmin
 from django.core.exceptions import ObjectDoesNotExist
 import json
 
-from .models import Ecommercecheckouts, VendorOrder, VendorFinancialSummary, VendorFinancialTransaction
+from .models import Ecommercecheckouts, OutboxMessage, VendorOrder, VendorFinancialSummary, VendorFinancialTransaction
 from products.models import DeliveryCharge
 from accounts.models import CustomUser
 from django.contrib.auth import get_user_model
@@ -372,3 +373,18 @@ class VendorFinancialTransactionAdmin(ImportExportModelAdmin, admin.ModelAdmin):
 
     def has_add_permission(self, request):
         return False
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['id', 'topic', 'status', 'attempts', 'available_at', 'created_at', 'processed_at']
+    list_filter = ['status', 'topic']
+    readonly_fields = ['topic', 'payload', 'attempts', 'claimed_by', 'last_error', 'created_at', 'processed_at']
+    actions = ['retry_messages']
+
+    @admin.action(description="Retry selected messages now")
+    def retry_messages(self, request, queryset):
+        count = queryset.exclude(status=OutboxMessage.DONE).update(
+            status=OutboxMessage.PENDING, attempts=0, available_at=timezone.now(), claimed_by='',
+        )
+        self.message_user(request, f"{count} messages queued again.")
@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.db.models import OuterRef, Subquery
+
+from .models import Ecommercecheckouts, OrderLine, VendorOrder
+from .outbox import handles
+
+
+User = get_user_model()
+
+CHECKOUT_PLACED = 'checkout.placed'
+
+
+def create_vendor_orders(checkout):
+    vendor_items_map = {}
+
+    for item in checkout.items_json:
+        vendor_id = item.get('vendor_id')
+        if vendor_id:
+            vendor_id = int(vendor_id)
+            vendor_items_map.setdefault(vendor_id, []).append(item)
+
+    # One query for every vendor and one insert for every order. bulk_create
+    # sends no post_save, which is fine: new orders are still processing, so
+    # update_vendor_financial_summary has nothing to record for them yet.
+    vendors = User.objects.in_bulk(list(vendor_items_map))
+    VendorOrder.objects.bulk_create([
+        VendorOrder(
+            vendor=vendors[vendor_id],
+            ecommerce_checkout=checkout,
+            items_json=vendor_items,
+            total_price=sum(
+                item.get('price', 0) * item.get('quantity', 1)
+                for item in vendor_items
+            ),
+            customer_name=checkout.customer_name,
+            customer_phone=checkout.customer_phone,
+            customer_address=checkout.customer_address,
+            delivery_charge=checkout.delivery_charge,
+        )
+        for vendor_id, vendor_items in vendor_items_map.items()
+        if vendor_id in vendors
+    ])
+
+    # Lines are written at checkout, before their vendor orders exist.
+    OrderLine.objects.filter(ecommerce_checkout=checkout).update(vendor_order=Subquery(
+        VendorOrder.objects.filter(ecommerce_checkout=checkout, vendor_id=OuterRef('vendor_id')).values('pk')[:1]
+    ))
+
+
+@handles(CHECKOUT_PLACED)
+def process_placed_checkout(payload):
+    checkout = Ecommercecheckouts.objects.select_related('delivery_charge').filter(pk=payload['checkout_id']).first()
+    # Gone, cancelled before we got to it, or done by an earlier attempt.
+    if checkout is None or checkout.status == 'cancelled' or checkout.vendor_orders.exists():
+        return
+    create_vendor_orders(checkout)
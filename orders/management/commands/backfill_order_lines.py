@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders.order_lines import BACKFILL_CHUNK_SIZE, backfill_order_lines
+
+
+class Command(BaseCommand):
+    help = "Writes OrderLines for checkouts placed before they were recorded, from their items_json."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE, help="Checkouts per transaction.")
+
+    def handle(self, *args, **options):
+        checkouts, lines = backfill_order_lines(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {lines} order lines for {checkouts} checkouts."))
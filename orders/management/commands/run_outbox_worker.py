@@ -0,0 +1,31 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.outbox import OUTBOX_BATCH_SIZE, process_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Processes queued post-checkout work (vendor order fan-out). Run as "
+        "many workers as needed; each message is claimed by one of them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process what is due now, then exit.")
+        parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE, help="Messages claimed at a time.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **options):
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        total = 0
+        while True:
+            count = process_batch(worker, options['batch_size'])
+            total += count
+            if not count:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} outbox messages."))
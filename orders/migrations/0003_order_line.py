@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_stock_reservation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_kind', models.CharField(choices=[('p', 'Product'), ('v', 'Vendor product')], max_length=1)),
+                ('product_id', models.PositiveIntegerField()),
+                ('variation_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('variation', models.JSONField(blank=True, default=dict)),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.PositiveIntegerField()),
+                ('vendor_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('ecommerce_checkout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='orders.ecommercecheckouts')),
+                ('vendor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_lines', to=settings.AUTH_USER_MODEL)),
+                ('vendor_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lines', to='orders.vendororder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product_kind', 'product_id', 'created_at'], name='order_line_product'), models.Index(fields=['vendor', 'created_at'], name='order_line_vendor'), models.Index(fields=['created_at'], name='order_line_created')],
+            },
+        ),
+    ]
@@ -93,4 +93,132 @@ class VendorFinancialTransaction(models.Model):
     vendor_amount = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
-        return f"Transaction for Order #{self.order.id} by {self.vendor.username}"
\ No newline at end of file
+        return f"Transaction for Order #{self.order.id} by {self.vendor.username}"
+
+# -----------------------------
+# Stock Reservation Model
+# -----------------------------
+class StockReservation(models.Model):
+    """
+    Stock taken by one checkout line, kept so it can be put back when the
+    checkout or its vendor order is cancelled; see orders.stock.
+    """
+    ecommerce_checkout = models.ForeignKey(
+        Ecommercecheckouts,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations'
+    )
+    vendor = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_reservations'
+    )
+    # Prefixed id ('p-12' / 'v-3') and the variation of that product, if any.
+    product_key = models.CharField(max_length=32)
+    variation_id = models.PositiveIntegerField(null=True, blank=True)
+    quantity = models.PositiveIntegerField()
+    released = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_key} for Checkout {self.ecommerce_checkout_id}"
+
+
+# -----------------------------
+# Order Line Model
+# -----------------------------
+class OrderLine(models.Model):
+    """
+    One product line of a checkout, mirroring its items_json entry so sales
+    can be filtered and aggregated in SQL. Written at checkout; older
+    checkouts are filled in by the backfill_order_lines command.
+    """
+    PRODUCT = 'p'
+    VENDOR_PRODUCT = 'v'
+
+    PRODUCT_KIND_CHOICES = [
+        (PRODUCT, 'Product'),
+        (VENDOR_PRODUCT, 'Vendor product'),
+    ]
+
+    ecommerce_checkout = models.ForeignKey(
+        Ecommercecheckouts,
+        on_delete=models.CASCADE,
+        related_name='lines'
+    )
+    vendor_order = models.ForeignKey(
+        VendorOrder,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='lines'
+    )
+    vendor = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='order_lines'
+    )
+    product_kind = models.CharField(max_length=1, choices=PRODUCT_KIND_CHOICES)
+    product_id = models.PositiveIntegerField()
+    variation_id = models.PositiveIntegerField(null=True, blank=True)
+    variation = models.JSONField(default=dict, blank=True)
+    name = models.CharField(max_length=255, blank=True)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+    # What the vendor was owed per unit when the order was placed.
+    vendor_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product_kind', 'product_id', 'created_at'], name='order_line_product'),
+            models.Index(fields=['vendor', 'created_at'], name='order_line_vendor'),
+            models.Index(fields=['created_at'], name='order_line_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_kind}-{self.product_id} in Checkout {self.ecommerce_checkout_id}"
+
+
+# -----------------------------
+# Outbox Model
+# -----------------------------
+class OutboxMessage(models.Model):
+    """
+    Work left for after a request, written in the same transaction as the
+    change that caused it and carried out by the run_outbox_worker command;
+    see orders.outbox.
+    """
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # Not before this time: set to the retry time after a failure, and past
+    # the lease while a worker holds the message.
+    available_at = models.DateTimeField()
+    claimed_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_due'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk} ({self.status})"
@@ -0,0 +1,126 @@
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from products.models import VendorProduct
+from .models import Ecommercecheckouts, OrderLine, VendorOrder
+
+
+BACKFILL_CHUNK_SIZE = 500
+
+
+def record_order_lines(checkout, cart_lines):
+    """
+    OrderLines for a new checkout from its priced CartLines. They are
+    linked to their vendor orders once orders.handlers has created them.
+    """
+    OrderLine.objects.bulk_create([
+        OrderLine(
+            ecommerce_checkout=checkout,
+            vendor_id=line.product.vendor_id,
+            product_kind=line.product.prefixed_id[0],
+            product_id=line.product.pk,
+            variation_id=line.variation_id,
+            variation=line.item['variation'],
+            name=line.item['name'][:255],
+            unit_price=line.price,
+            quantity=line.quantity,
+            vendor_price=getattr(line.product, 'vendor_price', None),
+            created_at=checkout.created_at,
+        )
+        for line in cart_lines
+    ])
+
+
+def _decimal(value):
+    try:
+        return Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+
+
+def lines_from_items(checkout, vendor_orders, vendor_products):
+    """
+    Unsaved OrderLines read back from a checkout's items_json. A bare
+    product id is the VendorProduct when the line's vendor owns it, as in
+    orders.signals; the variation row can't be told from the JSON.
+    vendor_products maps pk -> (vendor_id, vendor_price).
+    """
+    lines = []
+    for item in checkout.items_json if isinstance(checkout.items_json, list) else []:
+        if not isinstance(item, dict):
+            continue
+        product_id = str(item.get('product_id') or '')
+        vendor_id = str(item.get('vendor_id') or '')
+        price = _decimal(item.get('price'))
+        try:
+            quantity = int(item.get('quantity', 1))
+        except (TypeError, ValueError):
+            continue
+        if not product_id.isdigit() or not vendor_id.isdigit() or price is None or quantity < 1:
+            continue
+
+        owner, vendor_price = vendor_products.get(int(product_id), (None, None))
+        is_vendor_product = str(owner) == vendor_id
+        lines.append(OrderLine(
+            ecommerce_checkout=checkout,
+            vendor_order=vendor_orders.get(int(vendor_id)),
+            vendor_id=int(vendor_id),
+            product_kind=OrderLine.VENDOR_PRODUCT if is_vendor_product else OrderLine.PRODUCT,
+            product_id=int(product_id),
+            variation=item.get('variation') if isinstance(item.get('variation'), dict) else {},
+            name=str(item.get('name') or '')[:255],
+            unit_price=price,
+            quantity=quantity,
+            vendor_price=vendor_price if is_vendor_product else None,
+            created_at=checkout.created_at,
+        ))
+    return lines
+
+
+def _backfill_chunk(checkouts, vendor_products):
+    vendor_orders = {}
+    for order in VendorOrder.objects.filter(ecommerce_checkout__in=checkouts).only('pk', 'ecommerce_checkout_id', 'vendor_id'):
+        vendor_orders.setdefault(order.ecommerce_checkout_id, {})[order.vendor_id] = order
+
+    lines = []
+    for checkout in checkouts:
+        lines += lines_from_items(checkout, vendor_orders.get(checkout.pk, {}), vendor_products)
+
+    # Vendors deleted since the order was placed.
+    vendors = set(get_user_model().objects.filter(pk__in={line.vendor_id for line in lines}).values_list('pk', flat=True))
+    for line in lines:
+        if line.vendor_id not in vendors:
+            line.vendor_id = None
+
+    OrderLine.objects.bulk_create(lines, batch_size=500)
+    return len(lines)
+
+
+def backfill_order_lines(chunk_size=BACKFILL_CHUNK_SIZE):
+    """
+    Writes the OrderLines of every checkout that has none yet, a chunk of
+    checkouts per transaction, paging by pk so nothing is held open while
+    writing. Returns how many (checkouts, lines) were written.
+    """
+    vendor_products = {
+        pk: (vendor_id, vendor_price)
+        for pk, vendor_id, vendor_price in VendorProduct.objects.values_list('pk', 'vendor_id', 'vendor_price')
+    }
+    pending = (
+        Ecommercecheckouts.objects
+        .filter(~Exists(OrderLine.objects.filter(ecommerce_checkout=OuterRef('pk'))))
+        .order_by('pk')
+        .only('pk', 'items_json', 'created_at')
+    )
+
+    checkouts = lines = last_pk = 0
+    while True:
+        chunk = list(pending.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return checkouts, lines
+        with transaction.atomic():
+            lines += _backfill_chunk(chunk, vendor_products)
+        checkouts, last_pk = checkouts + len(chunk), chunk[-1].pk
@@ -0,0 +1,105 @@
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = getattr(settings, 'OUTBOX_BATCH_SIZE', 20)
+# A claimed message goes back to the queue if its worker hasn't finished
+# within this long, e.g. because it died.
+OUTBOX_LEASE_SECONDS = getattr(settings, 'OUTBOX_LEASE_SECONDS', 300)
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+OUTBOX_RETRY_SECONDS = getattr(settings, 'OUTBOX_RETRY_SECONDS', 10)
+# Process messages in-process right after commit instead of waiting for a
+# worker. On by default under DEBUG, so runserver alone still creates vendor
+# orders; production runs run_outbox_worker (see readme.txt and Procfile).
+OUTBOX_EAGER = getattr(settings, 'OUTBOX_EAGER', settings.DEBUG)
+
+HANDLERS = {}
+
+
+def handles(topic):
+    """Registers the function that carries out messages of a topic."""
+    def register(handler):
+        HANDLERS[topic] = handler
+        return handler
+    return register
+
+
+def enqueue(topic, payload):
+    """Adds a message in the caller's transaction, so it exists only if that commits."""
+    message = OutboxMessage.objects.create(topic=topic, payload=payload, available_at=timezone.now())
+    if OUTBOX_EAGER:
+        transaction.on_commit(lambda: process_batch('eager'))
+    return message
+
+
+def claim_messages(worker, limit=OUTBOX_BATCH_SIZE, lease=OUTBOX_LEASE_SECONDS):
+    """
+    Takes up to limit due messages for worker. Rows other workers are
+    claiming are skipped where the database can SKIP LOCKED; elsewhere the
+    guarded UPDATE decides, since a taken message's available_at has moved
+    past now.
+    """
+    now = timezone.now()
+    token = f'{worker}:{uuid.uuid4().hex}'
+    with transaction.atomic():
+        due = OutboxMessage.objects.filter(status=OutboxMessage.PENDING, available_at__lte=now).order_by('available_at', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('pk', flat=True)[:limit])
+        OutboxMessage.objects.filter(pk__in=ids, status=OutboxMessage.PENDING, available_at__lte=now).update(
+            claimed_by=token,
+            available_at=now + timedelta(seconds=lease),
+            attempts=F('attempts') + 1,
+        )
+    return list(OutboxMessage.objects.filter(claimed_by=token).order_by('pk'))
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(OUTBOX_RETRY_SECONDS * 2 ** (attempts - 1), 60 * 60))
+
+
+def process_message(message):
+    """
+    Runs the topic's handler and marks the message done in the same
+    transaction. Failures are retried with backoff until
+    OUTBOX_MAX_ATTEMPTS, then left as failed. Handlers must be safe to run
+    again: a message whose lease ran out can be picked up twice.
+    """
+    claimed = OutboxMessage.objects.filter(pk=message.pk, claimed_by=message.claimed_by)
+    try:
+        handler = HANDLERS.get(message.topic)
+        if handler is None:
+            raise LookupError(f"No outbox handler for {message.topic!r}")
+        with transaction.atomic():
+            handler(message.payload)
+            claimed.update(status=OutboxMessage.DONE, processed_at=timezone.now(), claimed_by='', last_error='')
+        return True
+    except Exception:
+        logger.exception("Outbox message %s (%s) failed", message.pk, message.topic)
+        gave_up = message.attempts >= OUTBOX_MAX_ATTEMPTS
+        claimed.update(
+            status=OutboxMessage.FAILED if gave_up else OutboxMessage.PENDING,
+            available_at=timezone.now() + _retry_delay(message.attempts),
+            claimed_by='',
+            last_error=traceback.format_exc(),
+        )
+        return False
+
+
+def process_batch(worker, limit=OUTBOX_BATCH_SIZE):
+    """Claims and processes one batch; returns how many messages it took."""
+    messages = claim_messages(worker, limit)
+    for message in messages:
+        process_message(message)
+    return len(messages)
@@ -0,0 +1,214 @@
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from products.models import VARIATION_ATTRIBUTES, Product, VendorProduct
+
+
+# Cart prices come from floats in localStorage.
+PRICE_TOLERANCE = Decimal('0.01')
+
+
+# item is the line as stored in items_json; variation_id is the variation
+# row the line was priced from, if any.
+CartLine = namedtuple('CartLine', 'product variation_id quantity price item')
+
+
+class CartError(Exception):
+    """A cart that can't be checked out as sent; problems lists each line's issue."""
+
+    def __init__(self, message, problems=()):
+        super().__init__(message)
+        self.problems = list(problems)
+
+
+class InvalidCart(CartError):
+    """A cart with malformed lines (bad quantity or price), as opposed to stale ones."""
+
+
+def _cart_product_id(item):
+    product_id = str(item.get('product_id') or '')
+    return int(product_id) if product_id.isdigit() else None
+
+
+def load_cart_products(items):
+    """
+    {(product_id, vendor_id): product} for the cart lines, one query per
+    product model whatever the cart size. Lines only carry the bare id, so
+    an id is the VendorProduct when the line's vendor owns it, and the
+    Product otherwise (the same reading as orders.signals).
+    """
+    ids = {pk for pk in map(_cart_product_id, items) if pk is not None}
+    products = Product.objects.in_bulk(ids) if ids else {}
+    vendor_products = VendorProduct.objects.in_bulk(ids) if ids else {}
+
+    resolved = {}
+    for item in items:
+        pk, vendor_id = _cart_product_id(item), str(item.get('vendor_id') or '')
+        vendor_product = vendor_products.get(pk)
+        if vendor_product is not None and vendor_id and str(vendor_product.vendor_id) == vendor_id:
+            resolved[pk, vendor_id] = vendor_product
+        elif pk in products:
+            resolved[pk, vendor_id] = products[pk]
+    return resolved
+
+
+def _quantity(value):
+    """A line's quantity as a positive int, or None; 1.9 is refused, not truncated."""
+    if isinstance(value, str) and value.strip().isdecimal():
+        value = int(value)
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        return None
+    return value
+
+
+def _sent_price(value):
+    try:
+        price = Decimal(str(value))
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+def _is_sellable(product):
+    if not product.is_active:
+        return False
+    return not isinstance(product, VendorProduct) or product.status == VendorProduct.STATUS_APPROVED
+
+
+def selected_variation(product, variation):
+    """
+    The line's {attribute: value} choice, lowercased like the product page
+    sends colors, or None if it names a value the product doesn't have.
+    """
+    matrix = product.variation_matrix or {}
+    variation = variation if isinstance(variation, dict) else {}
+    selected = {}
+    for attribute in VARIATION_ATTRIBUTES:
+        value = str(variation.get(attribute) or '').strip().lower()
+        if not value:
+            continue
+        if value not in {option.lower() for option in matrix.get(f'{attribute}s', [])}:
+            return None
+        selected[attribute] = value
+    return selected
+
+
+def _matches(row, selected):
+    return all((row[attribute] or '').lower() == value for attribute, value in selected.items())
+
+
+def catalog_prices(product, selected):
+    """
+    Unit prices the product page can show for a selection, best match
+    first: a chosen weight prices the line from its variation, anything
+    else sells at the product's own price.
+    """
+    if selected.get('weight'):
+        rows = [
+            row for row in (product.variation_matrix or {}).get('variations', [])
+            if row['price'] is not None and (row['weight'] or '').lower() == selected['weight']
+        ]
+        exact = [row for row in rows if _matches(row, selected)]
+        prices = list(dict.fromkeys(row['price'] for row in exact + rows))
+        if prices:
+            return [Decimal(str(price)) for price in prices]
+    price = product.get_display_price()
+    return [price] if price is not None else []
+
+
+def selected_variation_id(product, selected, price):
+    """
+    The one variation row a line buys: matching the selection, at its price
+    if that narrows it down. None if the line isn't bought as a variation
+    (a simple product with nothing selected or no matching row). Raises
+    LookupError when several rows match, or none does for a variable
+    product with variations, as the stock to take would be unknown.
+    """
+    if not selected and product.product_type != product.VARIABLE:
+        return None
+    variations = (product.variation_matrix or {}).get('variations', [])
+    rows = [row for row in variations if _matches(row, selected)]
+    priced = [row for row in rows if row['price'] is not None and Decimal(str(row['price'])) == price]
+    rows = priced or rows
+    if len(rows) > 1 or (not rows and variations and product.product_type == product.VARIABLE):
+        raise LookupError(f"{len(rows)} variations match {selected}")
+    return rows[0]['id'] if rows else None
+
+
+def price_cart(items):
+    """
+    Reprices the cart against the catalog and returns (lines, total), the
+    lines as CartLines. Every line is checked before raising, so the client
+    learns about all stale or invalid lines at once. Malformed lines raise
+    InvalidCart, stale ones CartError.
+    """
+    items = list(items or ())
+    invalid = [
+        {'product_id': None, 'name': 'Unknown', 'reason': 'invalid line'}
+        for item in items if not isinstance(item, dict)
+    ]
+    items = [item for item in items if isinstance(item, dict)]
+    if not items and not invalid:
+        raise CartError("Cart is empty.")
+    products = load_cart_products(items)
+
+    lines, problems, total = [], [], Decimal('0')
+    for item in items:
+        product_id, vendor_id = _cart_product_id(item), str(item.get('vendor_id') or '')
+        label = item.get('name') or 'Unknown'
+        quantity, sent_price = _quantity(item.get('quantity')), _sent_price(item.get('price'))
+        if quantity is None:
+            invalid.append({'product_id': product_id, 'name': label, 'reason': 'invalid quantity'})
+            continue
+        if sent_price is None:
+            invalid.append({'product_id': product_id, 'name': label, 'reason': 'invalid price'})
+            continue
+
+        product = products.get((product_id, vendor_id))
+        if product is None or not _is_sellable(product):
+            problems.append({'product_id': product_id, 'name': label, 'reason': 'unavailable'})
+            continue
+        if not product.vendor_id:
+            problems.append({'product_id': product_id, 'name': label, 'reason': 'missing vendor'})
+            continue
+
+        selected = selected_variation(product, item.get('variation'))
+        if selected is None:
+            problems.append({'product_id': product_id, 'name': label, 'reason': 'unknown variation'})
+            continue
+
+        prices = catalog_prices(product, selected)
+        price = next((price for price in prices if abs(price - sent_price) <= PRICE_TOLERANCE), None)
+        if price is None:
+            problems.append({
+                'product_id': product_id,
+                'name': product.name,
+                'reason': 'price changed',
+                'price': float(prices[0]) if prices else None,
+            })
+            continue
+
+        try:
+            variation_id = selected_variation_id(product, selected, price)
+        except LookupError:
+            problems.append({'product_id': product_id, 'name': product.name, 'reason': 'choose a variation'})
+            continue
+
+        total += price * quantity
+        lines.append(CartLine(product, variation_id, quantity, price, {
+            'name': product.name or '',
+            'image': product.primary_image.url if product.primary_image else item.get('image', ''),
+            'price': float(price),
+            'quantity': quantity,
+            'variation': item.get('variation') if isinstance(item.get('variation'), dict) else {},
+            'vendor_id': str(product.vendor_id),
+            'product_id': str(product.pk),
+        }))
+
+    if invalid:
+        raise InvalidCart("Some cart lines are malformed.", invalid)
+    if problems:
+        raise CartError("Some cart items are unavailable or have changed.", problems)
+    return lines, total
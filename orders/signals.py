@@ -3,43 +3,18 @@ from django.dispatch import receiver
 from .models import *
 from django.contrib.auth import get_user_model
 from decimal import Decimal
+from .handlers import CHECKOUT_PLACED
+from .outbox import enqueue
+from .stock import release_stock
 
 User = get_user_model()
 
 @receiver(post_save, sender=Ecommercecheckouts)
-def create_vendor_orders(sender, instance, created, **kwargs):
-    if not created:
-        return
-
-    items = instance.items_json
-    vendor_items_map = {}
-
-    for item in items:
-        vendor_id = item.get('vendor_id')
-        if vendor_id:
-            vendor_id = int(vendor_id)
-            vendor_items_map.setdefault(vendor_id, []).append(item)
-
-    for vendor_id, vendor_items in vendor_items_map.items():
-        try:
-            vendor = User.objects.get(id=vendor_id)
-            total_price = sum(
-                item.get('price', 0) * item.get('quantity', 1)
-                for item in vendor_items
-            )
-
-            VendorOrder.objects.create(
-                vendor=vendor,
-                ecommerce_checkout=instance,
-                items_json=vendor_items,
-                total_price=total_price,
-                customer_name=instance.customer_name,
-                customer_phone=instance.customer_phone,
-                customer_address=instance.customer_address,
-                delivery_charge=instance.delivery_charge,
-            )
-        except User.DoesNotExist:
-            continue
+def queue_checkout_processing(sender, instance, created, **kwargs):
+    # The vendor fan-out runs in the outbox worker (orders.handlers); the
+    # message commits or rolls back together with the checkout.
+    if created:
+        enqueue(CHECKOUT_PLACED, {'checkout_id': instance.pk})
 
 
 @receiver(post_save, sender=VendorOrder)
@@ -86,4 +61,17 @@ def update_vendor_financial_summary(sender, instance, created, **kwargs):
             order_price=total_price,
             admin_amount=admin_amount,
             vendor_amount=vendor_amount
-        )
\ No newline at end of file
+        )
+
+
+@receiver(post_save, sender=Ecommercecheckouts)
+def release_cancelled_checkout_stock(sender, instance, **kwargs):
+    if instance.status == 'cancelled':
+        release_stock(instance.stock_reservations.all())
+
+
+@receiver(post_save, sender=VendorOrder)
+def release_cancelled_vendor_order_stock(sender, instance, **kwargs):
+    # Only this vendor's lines of the checkout.
+    if instance.status == 'cancelled':
+        release_stock(instance.ecommerce_checkout.stock_reservations.filter(vendor=instance.vendor))
@@ -0,0 +1,125 @@
+from django.db import transaction
+from django.db.models import F, Q
+from django.dispatch import Signal
+
+from products.models import Product, ProductVariation, VendorProduct, VendorProductVariation
+from .models import StockReservation
+from .pricing import CartError
+
+
+PRODUCT_MODELS = {'p': Product, 'v': VendorProduct}
+VARIATION_MODELS = {'p': ProductVariation, 'v': VendorProductVariation}
+
+
+# Sent after commit with the prefixed ids of the products whose stock a
+# checkout or cancellation changed; the UPDATEs here bypass post_save.
+stock_changed = Signal()
+
+
+class OutOfStock(CartError):
+    pass
+
+
+def _demand(entries):
+    """
+    Quantities summed per product and per variation, each sorted into the
+    one global order every checkout locks rows in, so two checkouts never
+    wait on each other in a cycle.
+    """
+    products, variations = {}, {}
+    for kind, product_id, variation_id, quantity in entries:
+        # A variation line is counted against the variation only; see
+        # products.models.STOCK_QUANTITY_HELP.
+        if variation_id:
+            variations[kind, variation_id] = variations.get((kind, variation_id), 0) + quantity
+        else:
+            products[kind, product_id] = products.get((kind, product_id), 0) + quantity
+    return sorted(products.items()), sorted(variations.items())
+
+
+def _announce(product_keys, refresh_matrix):
+    """
+    Once the transaction commits, rebuilds the variation matrices (they
+    carry each row's stock) of refresh_matrix, (kind, pk) pairs, and sends
+    stock_changed for product_keys.
+    """
+    def changed():
+        for kind in PRODUCT_MODELS:
+            pks = {pk for row_kind, pk in refresh_matrix if row_kind == kind}
+            for product in PRODUCT_MODELS[kind].objects.filter(pk__in=pks):
+                product.refresh_variation_matrix()
+        stock_changed.send(sender=StockReservation, product_keys=sorted(product_keys))
+    transaction.on_commit(changed)
+
+
+def _take(model, field, pk, quantity):
+    # One conditional UPDATE: the row lock lasts only until commit, and
+    # there's no read-then-write window for a concurrent checkout. A NULL
+    # stock_quantity means the product isn't stock-tracked.
+    in_stock = Q(**{f'{field}__gte': quantity})
+    if model._meta.get_field(field).null:
+        in_stock |= Q(**{f'{field}__isnull': True})
+    return model.objects.filter(in_stock, pk=pk).update(**{field: F(field) - quantity})
+
+
+def reserve_stock(checkout, lines):
+    """
+    Takes the stock of every priced cart line for checkout, all or nothing.
+    Raises OutOfStock listing each line that can't be covered; the caller's
+    transaction then rolls back along with the checkout.
+    """
+    products, variations = _demand(
+        (line.product.prefixed_id[0], line.product.pk, line.variation_id, line.quantity) for line in lines
+    )
+    by_product = {(line.product.prefixed_id[0], line.product.pk): line.product for line in lines}
+    by_variation = {(line.product.prefixed_id[0], line.variation_id): line.product for line in lines}
+
+    with transaction.atomic():
+        problems = []
+        for (kind, pk), quantity in products:
+            if not _take(PRODUCT_MODELS[kind], 'stock_quantity', pk, quantity):
+                problems.append({'product_id': pk, 'name': by_product[kind, pk].name, 'reason': 'out of stock'})
+        for (kind, pk), quantity in variations:
+            if not _take(VARIATION_MODELS[kind], 'stock', pk, quantity):
+                product = by_variation[kind, pk]
+                problems.append({'product_id': product.pk, 'name': product.name, 'reason': 'variation out of stock'})
+        if problems:
+            raise OutOfStock("Some cart items are out of stock.", problems)
+
+        StockReservation.objects.bulk_create([
+            StockReservation(
+                ecommerce_checkout=checkout,
+                vendor_id=line.product.vendor_id,
+                product_key=line.product.prefixed_id,
+                variation_id=line.variation_id,
+                quantity=line.quantity,
+            )
+            for line in lines
+        ])
+        _announce(
+            {line.product.prefixed_id for line in lines},
+            {(line.product.prefixed_id[0], line.product.pk) for line in lines if line.variation_id},
+        )
+
+
+def release_stock(reservations):
+    """Puts back the stock of the reservations not released yet; safe to repeat."""
+    with transaction.atomic():
+        pending = list(reservations.select_for_update().filter(released=False))
+        if not pending:
+            return
+        StockReservation.objects.filter(pk__in=[r.pk for r in pending], released=False).update(released=True)
+
+        products, variations = _demand(
+            (r.product_key[0], int(r.product_key[2:]), r.variation_id, r.quantity) for r in pending
+        )
+        for (kind, pk), quantity in products:
+            PRODUCT_MODELS[kind].objects.filter(pk=pk, stock_quantity__isnull=False).update(
+                stock_quantity=F('stock_quantity') + quantity
+            )
+        for (kind, pk), quantity in variations:
+            VARIATION_MODELS[kind].objects.filter(pk=pk).update(stock=F('stock') + quantity)
+        _announce(
+            {r.product_key for r in pending},
+            {(r.product_key[0], int(r.product_key[2:])) for r in pending if r.variation_id},
+        )
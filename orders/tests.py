@@ -1,3 +1,267 @@
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from products.models import DeliveryCharge, Product, ProductVariation
+from website.page_cache import tag_versions
+from . import outbox
+from .handlers import CHECKOUT_PLACED, create_vendor_orders
+from .models import Ecommercecheckouts, OrderLine, OutboxMessage, VendorOrder
+from .order_lines import backfill_order_lines
+from .pricing import CartError, InvalidCart, price_cart
+from .stock import OutOfStock, release_stock, reserve_stock
+
+
+def cart_item(product, quantity=1, price=None, **extra):
+    return {
+        'product_id': str(product.pk),
+        'vendor_id': str(product.vendor_id),
+        'name': product.name,
+        'price': float(product.get_display_price()) if price is None else price,
+        'quantity': quantity,
+        'variation': {},
+        **extra,
+    }
+
+
+class OrdersTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = get_user_model().objects.create(username='vendor')
+        cls.zone = DeliveryCharge.objects.create(zone='Dhaka', charge=Decimal('60'))
+        cls.mug = Product.objects.create(
+            name='Clay mug', regular_price=Decimal('250'), vendor=cls.vendor, stock_quantity=5,
+        )
+
+
+class PriceCartTests(OrdersTestCase):
+    def test_prices_come_from_the_catalog(self):
+        lines, total = price_cart([cart_item(self.mug, quantity='2', price=250.004)])
+        self.assertEqual(lines[0].quantity, 2)
+        self.assertEqual(lines[0].price, Decimal('250'))
+        self.assertEqual(total, Decimal('500'))
+
+    def test_quantities_must_be_positive_whole_numbers(self):
+        for quantity in (1.9, '1.9', 0, -1, '', None, True, 'two', [1]):
+            with self.subTest(quantity=quantity):
+                with self.assertRaises(InvalidCart) as raised:
+                    price_cart([cart_item(self.mug, quantity=quantity)])
+                self.assertEqual(raised.exception.problems[0]['reason'], 'invalid quantity')
+
+    def test_whole_float_quantities_are_accepted(self):
+        lines, _ = price_cart([cart_item(self.mug, quantity=3.0)])
+        self.assertEqual(lines[0].quantity, 3)
+
+    def test_lines_that_are_not_objects_are_malformed(self):
+        with self.assertRaises(InvalidCart) as raised:
+            price_cart(['x', 5, cart_item(self.mug)])
+        self.assertEqual([problem['reason'] for problem in raised.exception.problems], ['invalid line'] * 2)
+
+    def test_empty_cart(self):
+        for items in ([], None):
+            with self.subTest(items=items), self.assertRaises(CartError) as raised:
+                price_cart(items)
+            self.assertNotIsInstance(raised.exception, InvalidCart)
+
+    def test_stale_prices_are_not_malformed(self):
+        with self.assertRaises(CartError) as raised:
+            price_cart([cart_item(self.mug, price=199)])
+        self.assertNotIsInstance(raised.exception, InvalidCart)
+        self.assertEqual(raised.exception.problems[0]['price'], 250.0)
+
+
+class CheckoutTests(OrdersTestCase):
+    def checkout(self, *items):
+        return self.client.post(reverse('website:checkout_ecommerce'), {
+            'cart_items': json.dumps(list(items)),
+            'delivery_zone': self.zone.zone,
+            'customer_name': 'Rahim',
+            'customer_phone_number': '01700000000',
+            'customer_address': 'Road 1',
+        })
+
+    def test_fractional_quantity_is_a_bad_request(self):
+        response = self.checkout(cart_item(self.mug, quantity=1.9))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['lines'][0]['reason'], 'invalid quantity')
+        self.assertFalse(Ecommercecheckouts.objects.exists())
+
+    def test_cart_of_junk_lines_is_a_bad_request(self):
+        # Not an order for the delivery charge alone.
+        response = self.checkout('x', 5)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([line['reason'] for line in response.json()['lines']], ['invalid line'] * 2)
+        self.assertFalse(Ecommercecheckouts.objects.exists())
+
+    def test_changed_price_is_a_conflict(self):
+        self.assertEqual(self.checkout(cart_item(self.mug, price=1)).status_code, 409)
+
+
+class StockTests(OrdersTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.shirt = Product.objects.create(
+            name='Cotton shirt', regular_price=Decimal('900'), vendor=cls.vendor,
+            product_type=Product.VARIABLE, stock_quantity=0,
+        )
+        cls.small = ProductVariation.objects.create(product=cls.shirt, size='S', color='Red', stock=2)
+        cls.large = ProductVariation.objects.create(product=cls.shirt, size='L', color='Red', stock=0)
+        cls.shirt.refresh_variation_matrix()
+
+    def place(self, *items):
+        lines, total = price_cart(list(items))
+        checkout = Ecommercecheckouts.objects.create(
+            customer_name='Rahim', customer_phone='01700000000', customer_address='Road 1',
+            delivery_charge=self.zone, items_json=[line.item for line in lines], total_amount=total,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock(checkout, lines)
+        return checkout
+
+    def shirt_item(self, size, quantity=1):
+        return cart_item(self.shirt, quantity=quantity, variation={'size': size, 'color': 'red'})
+
+    def test_variation_lines_take_only_the_variation_stock(self):
+        self.assertTrue(self.shirt.in_stock)
+        self.place(self.shirt_item('S', quantity=2))
+
+        self.small.refresh_from_db()
+        self.shirt.refresh_from_db()
+        self.assertEqual(self.small.stock, 0)
+        self.assertEqual(self.shirt.stock_quantity, 0)
+        # The matrix the product page reads was rebuilt on commit.
+        self.assertFalse(self.shirt.in_stock)
+
+    def test_sold_out_variation_is_refused(self):
+        with self.assertRaises(OutOfStock):
+            self.place(self.shirt_item('L'))
+
+    def test_variation_must_be_unique(self):
+        with self.assertRaises(CartError) as raised:
+            price_cart([cart_item(self.shirt, variation={'color': 'red'})])
+        self.assertEqual(raised.exception.problems[0]['reason'], 'choose a variation')
+
+    def test_simple_products_take_stock_quantity(self):
+        self.place(cart_item(self.mug, quantity=5))
+        self.mug.refresh_from_db()
+        self.assertEqual(self.mug.stock_quantity, 0)
+        self.assertFalse(self.mug.in_stock)
+
+        Product.objects.filter(pk=self.mug.pk).update(stock_quantity=None)
+        self.place(cart_item(self.mug, quantity=50))
+        self.mug.refresh_from_db()
+        self.assertIsNone(self.mug.stock_quantity)
+        self.assertTrue(self.mug.in_stock)
+
+    def test_stock_changes_invalidate_the_product_pages(self):
+        tags = ['catalog', f'product:{self.shirt.prefixed_id}']
+        before = tag_versions(tags)
+        checkout = self.place(self.shirt_item('S'))
+        after = tag_versions(tags)
+        self.assertNotEqual(before['catalog'], after['catalog'])
+        self.assertNotEqual(before[tags[1]], after[tags[1]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release_stock(checkout.stock_reservations.all())
+        self.small.refresh_from_db()
+        self.assertEqual(self.small.stock, 2)
+        self.assertNotEqual(tag_versions(tags)[tags[1]], after[tags[1]])
+
+
+class OutboxTests(OrdersTestCase):
+    def place_order(self):
+        return Ecommercecheckouts.objects.create(
+            customer_name='Rahim', customer_phone='01700000000', customer_address='Road 1',
+            delivery_charge=self.zone, items_json=[cart_item(self.mug)], total_amount=Decimal('250'),
+        )
+
+    def test_eager_mode_drains_the_outbox_on_commit(self):
+        with mock.patch.object(outbox, 'OUTBOX_EAGER', True), self.captureOnCommitCallbacks(execute=True):
+            checkout = self.place_order()
+        self.assertEqual(list(VendorOrder.objects.values_list('ecommerce_checkout', 'vendor')), [(checkout.pk, self.vendor.pk)])
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.DONE)
+
+    def test_worker_processes_queued_checkouts_once(self):
+        with mock.patch.object(outbox, 'OUTBOX_EAGER', False), self.captureOnCommitCallbacks(execute=True):
+            checkout = self.place_order()
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.topic, message.payload), (CHECKOUT_PLACED, {'checkout_id': checkout.pk}))
+        self.assertFalse(VendorOrder.objects.exists())
+
+        self.assertEqual(outbox.process_batch('worker-1'), 1)
+        self.assertEqual(outbox.process_batch('worker-2'), 0)
+        self.assertEqual(VendorOrder.objects.filter(ecommerce_checkout=checkout).count(), 1)
+
+    def test_failures_are_retried_then_given_up(self):
+        message = OutboxMessage.objects.create(topic='test.fails', payload={}, available_at=timezone.now())
+        failing = mock.Mock(side_effect=RuntimeError('boom'))
+        with mock.patch.dict(outbox.HANDLERS, {'test.fails': failing}), self.assertLogs('orders.outbox', 'ERROR'):
+            for attempt in range(1, outbox.OUTBOX_MAX_ATTEMPTS + 1):
+                OutboxMessage.objects.filter(pk=message.pk).update(available_at=timezone.now())
+                self.assertEqual(outbox.process_batch('worker'), 1)
+                message.refresh_from_db()
+                self.assertEqual(message.attempts, attempt)
+                self.assertGreater(message.available_at, timezone.now())
+        self.assertEqual(message.status, OutboxMessage.FAILED)
+        self.assertIn('boom', message.last_error)
+
+    def test_expired_leases_go_back_to_the_queue(self):
+        message = OutboxMessage.objects.create(topic=CHECKOUT_PLACED, payload={'checkout_id': 0}, available_at=timezone.now())
+        self.assertEqual(len(outbox.claim_messages('worker-1', lease=-1)), 1)
+        self.assertEqual([claimed.pk for claimed in outbox.claim_messages('worker-2')], [message.pk])
+
+
+class VendorOrderFanOutTests(OrdersTestCase):
+    def checkout_from(self, vendor_count):
+        vendors = [get_user_model().objects.create(username=f'vendor-{vendor_count}-{n}') for n in range(vendor_count)]
+        items = [
+            {'product_id': str(n), 'vendor_id': str(vendor.pk), 'name': 'Mug', 'price': 100.0, 'quantity': 2}
+            for n, vendor in enumerate(vendors)
+        ]
+        return Ecommercecheckouts.objects.create(
+            customer_name='Rahim', customer_phone='01700000000', customer_address='Road 1',
+            delivery_charge=self.zone, items_json=items, total_amount=Decimal('200') * vendor_count,
+        )
+
+    def fan_out_queries(self, checkout):
+        with CaptureQueriesContext(connection) as queries:
+            create_vendor_orders(checkout)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_the_vendors(self):
+        one, many = self.checkout_from(1), self.checkout_from(8)
+        self.assertEqual(self.fan_out_queries(many), self.fan_out_queries(one))
+        self.assertEqual(VendorOrder.objects.filter(ecommerce_checkout=many).count(), 8)
+        self.assertEqual(
+            set(VendorOrder.objects.filter(ecommerce_checkout=many).values_list('total_price', flat=True)),
+            {Decimal('200')},
+        )
+
+
+class BackfillOrderLinesTests(OrdersTestCase):
+    def test_backfill_is_idempotent(self):
+        for quantity in (1, 2, 3):
+            Ecommercecheckouts.objects.create(
+                customer_name='Rahim', customer_phone='01700000000', customer_address='Road 1',
+                delivery_charge=self.zone, total_amount=Decimal('250') * quantity,
+                items_json=[cart_item(self.mug, quantity=quantity), 'junk', {'product_id': 'x'}],
+            )
+        self.assertEqual(backfill_order_lines(chunk_size=1), (3, 3))
+        # As after a run that stopped part way: only the first one is done.
+        first = Ecommercecheckouts.objects.order_by('pk').first()
+        OrderLine.objects.exclude(ecommerce_checkout=first).delete()
 
-# Create your tests here.
+        self.assertEqual(backfill_order_lines(chunk_size=2), (2, 2))
+        self.assertEqual(backfill_order_lines(), (0, 0))
+        self.assertEqual(
+            sorted(OrderLine.objects.values_list('quantity', 'unit_price', 'vendor_id')),
+            [(quantity, Decimal('250'), self.vendor.pk) for quantity in (1, 2, 3)],
+        )
@@ -0,0 +1,209 @@
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Subquery, Window
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
+
+from .models import BoughtTogether, BoughtTogetherRun, VendorProduct
+from .related import visible_products_by_id
+
+
+BOUGHT_TOGETHER_LIMIT = getattr(settings, 'BOUGHT_TOGETHER_LIMIT', 4)
+# Companions kept per product; the long tail of one-off pairs is dropped.
+BOUGHT_TOGETHER_KEEP = getattr(settings, 'BOUGHT_TOGETHER_KEEP', 50)
+# Checkouts counted and written per transaction.
+MINING_CHUNK_SIZE = 2000
+
+
+def item_key(item, vendor_product_owners):
+    """
+    Prefixed id of a basket item, or None. Items carry the bare id, so like
+    orders.signals we take it for a VendorProduct when the item's vendor
+    owns one with that id, and for a Product otherwise.
+    """
+    product_id = str(item.get('product_id') or '')
+    if product_id[:2] in ('p-', 'v-'):
+        return product_id
+    if not product_id.isdigit():
+        return None
+    vendor_id = str(item.get('vendor_id') or '')
+    if vendor_id and str(vendor_product_owners.get(int(product_id))) == vendor_id:
+        return f"v-{product_id}"
+    return f"p-{product_id}"
+
+
+class PairCounter:
+    """
+    Basket co-occurrence counts. Product keys are interned to small ints and
+    every unordered pair is packed into one int, so a large batch of
+    checkouts costs one Counter entry per distinct pair.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.ids = {}
+        self.counts = Counter()
+
+    def __len__(self):
+        return len(self.counts)
+
+    def _id(self, key):
+        if key not in self.ids:
+            self.ids[key] = len(self.keys)
+            self.keys.append(key)
+        return self.ids[key]
+
+    def add_basket(self, keys):
+        ids = sorted({self._id(key) for key in keys})
+        for i, first in enumerate(ids):
+            for second in ids[i + 1:]:
+                self.counts[first << 32 | second] += 1
+
+    def __iter__(self):
+        for packed, count in self.counts.items():
+            yield self.keys[packed >> 32], self.keys[packed & 0xFFFFFFFF], count
+
+
+def live_generation():
+    """The generation readers see: that of the newest finished pass, 0 before any."""
+    return BoughtTogetherRun.objects.filter(finished_at__isnull=False).aggregate(
+        generation=Coalesce(Max('generation'), 0),
+    )['generation']
+
+
+def _live_pairs():
+    # Resolved inside the reading query, so it costs no extra round trip.
+    generation = BoughtTogetherRun.objects.filter(finished_at__isnull=False).order_by('-generation').values('generation')[:1]
+    return BoughtTogether.objects.filter(generation=Coalesce(Subquery(generation), 0))
+
+
+def _write_counts(counter, generation):
+    """Adds the counted pairs, in both directions, to the stored ones of generation."""
+    deltas = {}
+    for first, second, count in counter:
+        deltas[first, second] = count
+        deltas[second, first] = count
+
+    product_keys = list({product_key for product_key, _ in deltas})
+    changed = []
+    for start in range(0, len(product_keys), 500):
+        for row in BoughtTogether.objects.filter(generation=generation, product_key__in=product_keys[start:start + 500]):
+            count = deltas.pop((row.product_key, row.companion_key), None)
+            if count:
+                row.count += count
+                changed.append(row)
+
+    BoughtTogether.objects.bulk_update(changed, ['count'], batch_size=500)
+    BoughtTogether.objects.bulk_create(
+        [
+            BoughtTogether(generation=generation, product_key=pair[0], companion_key=pair[1], count=count)
+            for pair, count in deltas.items()
+        ],
+        batch_size=500,
+    )
+    _trim(product_keys, generation)
+    return len(counter)
+
+
+def _trim(product_keys, generation, keep=BOUGHT_TOGETHER_KEEP):
+    """Drops all but the keep best companions of each of the products."""
+    for start in range(0, len(product_keys), 500):
+        ranked = (
+            BoughtTogether.objects.filter(generation=generation, product_key__in=product_keys[start:start + 500])
+            .annotate(rank=Window(RowNumber(), partition_by=F('product_key'), order_by=[F('count').desc(), F('pk')]))
+            .filter(rank__gt=keep)
+        )
+        dropped = list(ranked.values_list('pk', flat=True))
+        for offset in range(0, len(dropped), 500):
+            BoughtTogether.objects.filter(pk__in=dropped[offset:offset + 500]).delete()
+
+
+def _drop_other_generations(generation):
+    """Deletes the rows of every generation but this one, a batch per transaction."""
+    while True:
+        with transaction.atomic():
+            stale = list(BoughtTogether.objects.exclude(generation=generation).values_list('pk', flat=True)[:5000])
+            BoughtTogether.objects.filter(pk__in=stale).delete()
+        if not stale:
+            return
+
+
+def mine_bought_together(full=False, chunk_size=MINING_CHUNK_SIZE):
+    """
+    Counts the product pairs of the checkouts not mined yet and records the
+    run. Cancelled checkouts are skipped. Each chunk of checkouts is written
+    in its own transaction together with the run's position, so an
+    incremental pass that dies part way keeps what it counted and the next
+    one carries on from there.
+
+    A full pass counts every checkout again into a new generation, while
+    pages keep reading the live one; finishing the run switches readers
+    over in one step, and only then are the old rows deleted. A full pass
+    that dies leaves the live counts alone, and the next full pass throws
+    its rows away.
+    """
+    Checkout = apps.get_model('orders', 'Ecommercecheckouts')
+
+    live = live_generation()
+    if full:
+        _drop_other_generations(live)
+        generation = (BoughtTogetherRun.objects.aggregate(generation=Max('generation'))['generation'] or live) + 1
+        since = 0
+    else:
+        generation = live
+        last_run = BoughtTogetherRun.objects.filter(generation=live).first()
+        since = last_run.last_checkout_id if last_run else 0
+    run = BoughtTogetherRun.objects.create(generation=generation, last_checkout_id=since, full=full)
+
+    owners = dict(VendorProduct.objects.values_list('pk', 'vendor_id'))
+    checkouts = (
+        Checkout.objects.exclude(status='cancelled')
+        .order_by('pk')
+        .values_list('pk', 'items_json')
+    )
+
+    while True:
+        chunk = list(checkouts.filter(pk__gt=run.last_checkout_id)[:chunk_size])
+        if not chunk:
+            break
+        counter = PairCounter()
+        for pk, items in chunk:
+            if isinstance(items, list):
+                keys = (item_key(item, owners) for item in items if isinstance(item, dict))
+                counter.add_basket(key for key in keys if key)
+        with transaction.atomic():
+            run.pairs += _write_counts(counter, generation)
+            run.checkouts += len(chunk)
+            run.last_checkout_id = chunk[-1][0]
+            run.save(update_fields=['pairs', 'checkouts', 'last_checkout_id'])
+
+    run.finished_at = timezone.now()
+    run.save(update_fields=['finished_at'])
+    if full:
+        _drop_other_generations(generation)
+    return run
+
+
+def bought_together(product_keys, limit=BOUGHT_TOGETHER_LIMIT):
+    """
+    Visible products most often bought with the given ones (prefixed ids),
+    best first and excluding the given ones: one product on product_detail,
+    the whole basket for the cart.
+    """
+    product_keys = list(dict.fromkeys(product_keys))
+    if not product_keys:
+        return []
+    rows = (
+        _live_pairs().filter(product_key__in=product_keys)
+        .exclude(companion_key__in=product_keys)
+        .order_by('-count')
+        .values_list('companion_key', 'count')
+    )
+    # A few spares per product for companions that are no longer visible.
+    totals = Counter()
+    for companion_key, count in rows[:limit * 3 * len(product_keys)]:
+        totals[companion_key] += count
+    return visible_products_by_id([key for key, _ in totals.most_common()])[:limit]
@@ -0,0 +1,111 @@
+import threading
+import time
+import uuid
+from collections import namedtuple
+from types import MappingProxyType
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+
+
+CATEGORY_TREE_VERSION_KEY = 'category_tree_version'
+# Must be shared by every worker process: a bump made in one has to reach
+# the path indexes and menus the others built.
+CATEGORY_TREE_CACHE_ALIAS = getattr(settings, 'CATEGORY_TREE_CACHE_ALIAS', 'default')
+# How long a process trusts its copy of the version before asking the shared
+# cache again, i.e. how late other workers may see a category change.
+CATEGORY_TREE_VERSION_CHECK_SECONDS = getattr(settings, 'CATEGORY_TREE_VERSION_CHECK_SECONDS', 5)
+
+CategoryPaths = namedtuple('CategoryPaths', 'version by_path by_id by_slug')
+
+# (version, checked at); replaced as a whole so readers never see a mix.
+_version = (None, 0.0)
+
+
+def category_tree_version():
+    """
+    Version stamp of the category tree, replaced by products.signals
+    whenever a Category changes. In-process structures built from the tree
+    (the path index, website.menus) compare against it.
+
+    The shared cache is only consulted once per
+    CATEGORY_TREE_VERSION_CHECK_SECONDS, so links and menus cost no queries
+    in between; this process's own bumps are seen right away.
+    """
+    global _version
+    version, checked_at = _version
+    now = time.monotonic()
+    if version is not None and now - checked_at < CATEGORY_TREE_VERSION_CHECK_SECONDS:
+        return version
+    cache = caches[CATEGORY_TREE_CACHE_ALIAS]
+    version = cache.get(CATEGORY_TREE_VERSION_KEY)
+    if version is None:
+        # Also after an eviction, which only costs a rebuild.
+        cache.add(CATEGORY_TREE_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(CATEGORY_TREE_VERSION_KEY)
+    _version = (version, now)
+    return version
+
+
+def bump_category_tree_version():
+    global _version
+    version = uuid.uuid4().hex
+    caches[CATEGORY_TREE_CACHE_ALIAS].set(CATEGORY_TREE_VERSION_KEY, version, None)
+    _version = (version, time.monotonic())
+
+
+def full_slug(category, categories):
+    """Full slug from an {id: category} map, without a query per level."""
+    slugs, seen = [], set()
+    while category is not None and category.pk not in seen:
+        seen.add(category.pk)
+        slugs.insert(0, category.slug)
+        category = categories.get(category.parent_id)
+    return '/'.join(slug for slug in slugs if slug)
+
+
+def build_category_paths(version):
+    Category = apps.get_model('products', 'Category')
+    categories = {c.pk: c for c in Category.objects.only('id', 'slug', 'parent_id')}
+    by_id = {pk: full_slug(category, categories) for pk, category in categories.items()}
+    return CategoryPaths(
+        version,
+        MappingProxyType({path: pk for pk, path in by_id.items() if path}),
+        MappingProxyType(by_id),
+        MappingProxyType({category.slug: pk for pk, category in categories.items() if category.slug}),
+    )
+
+
+_paths = None
+_lock = threading.Lock()
+
+
+def get_category_paths():
+    """full path <-> category id maps for the current tree, rebuilt lazily."""
+    global _paths
+    version = category_tree_version()
+    paths = _paths
+    if paths is None or paths.version != version:
+        with _lock:
+            if _paths is None or _paths.version != version:
+                _paths = build_category_paths(version)
+            paths = _paths
+    return paths
+
+
+def category_path(category_id):
+    return get_category_paths().by_id.get(category_id)
+
+
+def resolve_category_path(path):
+    """
+    (category_id, canonical) for a requested path. canonical is False when
+    only the last segment matched a category, i.e. the parent path is wrong
+    or outdated; category_id is None when nothing matched.
+    """
+    paths = get_category_paths()
+    path = path.strip('/')
+    if path in paths.by_path:
+        return paths.by_path[path], True
+    return paths.by_slug.get(path.rsplit('/', 1)[-1]), False
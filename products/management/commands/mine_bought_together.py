@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from products.bought_together import MINING_CHUNK_SIZE, mine_bought_together
+
+
+class Command(BaseCommand):
+    help = "Counts which products are bought together from the checkouts not mined yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Mine every checkout again into new counts, which replace the stored ones once complete.")
+        parser.add_argument('--chunk-size', type=int, default=MINING_CHUNK_SIZE, help="Checkouts counted and written per transaction.")
+
+    def handle(self, *args, **options):
+        run = mine_bought_together(full=options['full'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Mined {run.checkouts} checkouts ({run.pairs} product pairs), up to checkout {run.last_checkout_id}."
+        ))
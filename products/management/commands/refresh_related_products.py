@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.related import refresh_stale_related
+
+
+class Command(BaseCommand):
+    help = "Recomputes the stored related-products lists that changes have marked stale."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Recompute every product, not only stale ones.")
+
+    def handle(self, *args, **options):
+        count = refresh_stale_related(everything=options['all'])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed related products of {count} products."))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_category_closure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryPriceStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('histogram', models.JSONField(blank=True, default=list, help_text='Product counts per equal-width price bucket between min and max.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_stats', to='products.category')),
+            ],
+            options={
+                'verbose_name': 'Category price statistics',
+                'verbose_name_plural': 'Category price statistics',
+            },
+        ),
+    ]
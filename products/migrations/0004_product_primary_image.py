@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:02
+
+from django.db import migrations, models
+
+
+def fill_primary_images(apps, schema_editor):
+    for product_model, image_model in (('Product', 'ProductImage'), ('VendorProduct', 'VendorProductImage')):
+        Product = apps.get_model('products', product_model)
+        Image = apps.get_model('products', image_model)
+        images = (
+            Image.objects.exclude(image='').exclude(image__isnull=True).exclude(product__isnull=True)
+            .order_by('product_id', 'order', '-is_featured', 'pk')
+        )
+        seen = set()
+        for image in images.iterator():
+            if image.product_id in seen:
+                continue
+            seen.add(image.product_id)
+            try:
+                width, height = image.image.width, image.image.height
+            except (OSError, ValueError):
+                width = height = None
+            Product.objects.filter(pk=image.product_id).update(
+                primary_image=image.image.name, primary_image_width=width, primary_image_height=height,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_category_price_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='primary_image',
+            field=models.ImageField(blank=True, editable=False, max_length=255, null=True, upload_to='product_images/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='primary_image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='primary_image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vendorproduct',
+            name='primary_image',
+            field=models.ImageField(blank=True, editable=False, max_length=255, null=True, upload_to='vendor_product_images/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='vendorproduct',
+            name='primary_image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vendorproduct',
+            name='primary_image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_primary_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:11
+
+import json
+
+from django.db import migrations, models
+
+# Frozen copy of products.models.variation_matrix as of this migration, so
+# later changes to the model code cannot change what it writes.
+VARIATION_ATTRIBUTES = ('color', 'size', 'weight')
+
+
+def variation_matrix(variations):
+    rows = list(variations.order_by('pk').values('id', *VARIATION_ATTRIBUTES, 'price', 'stock'))
+    for row in rows:
+        row['price'] = float(row['price']) if row['price'] is not None else None
+    matrix = {
+        'variations': rows,
+        'combinations': {
+            '|'.join(row[attribute] or '' for attribute in VARIATION_ATTRIBUTES): {
+                'id': row['id'], 'price': row['price'], 'stock': row['stock'],
+            }
+            for row in rows
+        },
+    }
+    for attribute in VARIATION_ATTRIBUTES:
+        matrix[f'{attribute}s'] = list(dict.fromkeys(row[attribute] for row in rows if row[attribute]))
+    return matrix
+
+
+def fill_variation_matrices(apps, schema_editor):
+    for product_model, variation_model in (('Product', 'ProductVariation'), ('VendorProduct', 'VendorProductVariation')):
+        Product = apps.get_model('products', product_model)
+        Variation = apps.get_model('products', variation_model)
+        for pk in Product.objects.values_list('pk', flat=True).iterator():
+            matrix = variation_matrix(Variation.objects.filter(product_id=pk))
+            Product.objects.filter(pk=pk).update(
+                variation_matrix=matrix, variations_json=json.dumps(matrix['variations']),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_primary_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='variation_matrix',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='variations_json',
+            field=models.TextField(blank=True, default='[]', editable=False),
+        ),
+        migrations.AddField(
+            model_name='vendorproduct',
+            name='variation_matrix',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vendorproduct',
+            name='variations_json',
+            field=models.TextField(blank=True, default='[]', editable=False),
+        ),
+        migrations.RunPython(fill_variation_matrices, migrations.RunPython.noop),
+    ]
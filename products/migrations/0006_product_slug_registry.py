@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def register_slugs(apps, schema_editor):
+    # Products first: product_detail used to prefer them, so on a clash the
+    # vendor product is the one that moves to a suffixed slug.
+    ProductSlug = apps.get_model('products', 'ProductSlug')
+    taken = set()
+    for model_name, field in (('Product', 'product'), ('VendorProduct', 'vendor_product')):
+        model = apps.get_model('products', model_name)
+        entries = []
+        for pk, slug in model.objects.exclude(slug__isnull=True).exclude(slug='').values_list('pk', 'slug').iterator():
+            base_slug, counter = slug, 1
+            while slug in taken:
+                slug = f"{base_slug}-{counter}"
+                counter += 1
+            if slug != base_slug:
+                model.objects.filter(pk=pk).update(slug=slug)
+            taken.add(slug)
+            entries.append(ProductSlug(slug=slug, **{f'{field}_id': pk}))
+        ProductSlug.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_variation_matrix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSlug',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.CharField(max_length=255, unique=True)),
+                ('product', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='slug_entry', to='products.product')),
+                ('vendor_product', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='slug_entry', to='products.vendorproduct')),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('product__isnull', False), ('vendor_product__isnull', True)), models.Q(('product__isnull', True), ('vendor_product__isnull', False)), _connector='OR'), name='product_slug_single_target')],
+            },
+        ),
+        migrations.RunPython(register_slugs, migrations.RunPython.noop),
+    ]
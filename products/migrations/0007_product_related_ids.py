@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_slug_registry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='related_ids',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vendorproduct',
+            name='related_ids',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_related_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoughtTogetherRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_checkout_id', models.PositiveIntegerField(default=0)),
+                ('checkouts', models.PositiveIntegerField(default=0)),
+                ('pairs', models.PositiveIntegerField(default=0)),
+                ('full', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at', '-pk'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BoughtTogether',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_key', models.CharField(max_length=32)),
+                ('companion_key', models.CharField(max_length=32)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product_key', '-count'], name='bought_together_top')],
+                'constraints': [models.UniqueConstraint(fields=('product_key', 'companion_key'), name='bought_together_unique_pair')],
+            },
+        ),
+    ]
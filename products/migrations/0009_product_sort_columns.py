@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+
+def fill_sort_columns(apps, schema_editor):
+    # Values the catalog used to sort NULLs as, so listings keep their order.
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    for name in ('Product', 'VendorProduct'):
+        model = apps.get_model('products', name)
+        model.objects.filter(name__isnull=True).update(name='')
+        model.objects.filter(created_at__isnull=True).update(created_at=Coalesce(F('updated_at'), epoch))
+        model.objects.update(sort_price=Coalesce(F('regular_price'), 0, output_field=models.DecimalField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_bought_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sort_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='vendorproduct',
+            name='sort_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(fill_sort_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+import products.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='slug',
+            field=products.models.SharedSlugField(always_update=True, editable=False, populate_from='name', slugify=products.models.custom_slugify, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='vendorproduct',
+            name='slug',
+            field=products.models.SharedSlugField(always_update=True, editable=False, populate_from='name', slugify=products.models.custom_slugify, unique=True),
+        ),
+    ]
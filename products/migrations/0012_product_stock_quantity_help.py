@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_shared_slug_field'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='stock_quantity',
+            field=models.PositiveIntegerField(blank=True, default=0, help_text="Units in stock; leave empty if stock isn't tracked, 0 is sold out. Variable products sell from their variations' stock, so for them this only counts when the product has no variations.", null=True),
+        ),
+        migrations.AlterField(
+            model_name='vendorproduct',
+            name='stock_quantity',
+            field=models.PositiveIntegerField(blank=True, default=0, help_text="Units in stock; leave empty if stock isn't tracked, 0 is sold out. Variable products sell from their variations' stock, so for them this only counts when the product has no variations.", null=True),
+        ),
+    ]
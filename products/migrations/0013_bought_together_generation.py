@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_stock_quantity_help'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='boughttogether',
+            name='bought_together_unique_pair',
+        ),
+        migrations.RemoveIndex(
+            model_name='boughttogether',
+            name='bought_together_top',
+        ),
+        migrations.AddField(
+            model_name='boughttogether',
+            name='generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='boughttogetherrun',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='boughttogetherrun',
+            name='generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='boughttogether',
+            index=models.Index(fields=['generation', 'product_key', '-count'], name='bought_together_top'),
+        ),
+        migrations.AddConstraint(
+            model_name='boughttogether',
+            constraint=models.UniqueConstraint(fields=('generation', 'product_key', 'companion_key'), name='bought_together_unique_pair'),
+        ),
+    ]
@@ -1,5 +1,7 @@
+import json
 import os 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
 from django.conf import settings
 from django.utils.text import slugify
 from autoslug import AutoSlugField
@@ -8,6 +10,8 @@ from ckeditor.fields import RichTextField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
+
+from .category_paths import bump_category_tree_version, category_path
 from django.conf import settings  
 
 
@@ -21,6 +25,73 @@ def custom_slugify(value):
     return slugify(value)
 
 
+class SharedSlugField(AutoSlugField):
+    """
+    AutoSlugField that also steps past slugs the other product kind holds
+    in ProductSlug, so the final slug is on the instance before the row is
+    written and post_save receivers never see one that is about to change.
+    """
+
+    def pre_save(self, instance, add):
+        slug = super().pre_save(instance, add)
+        if slug:
+            slug = ProductSlug.free_slug(instance, slug)
+            setattr(instance, self.attname, slug)
+        return slug
+
+
+def primary_image_values(images):
+    """
+    Denormalized fields for a product's card image: the first image with a
+    file, in the images' own ordering, plus its pixel size. Reading the
+    size opens the file once here instead of on every listing render.
+    """
+    image = images.exclude(image='').exclude(image__isnull=True).order_by('order', '-is_featured', 'pk').first()
+    values = {'primary_image': None, 'primary_image_width': None, 'primary_image_height': None}
+    if image is not None:
+        values['primary_image'] = image.image.name
+        try:
+            values['primary_image_width'] = image.image.width
+            values['primary_image_height'] = image.image.height
+        except (OSError, ValueError):
+            pass
+    return values
+
+
+VARIATION_ATTRIBUTES = ('color', 'size', 'weight')
+
+# What orders.stock takes at checkout: a line bought as a variation row only
+# takes that row's stock, anything else takes stock_quantity.
+STOCK_QUANTITY_HELP = (
+    "Units in stock; leave empty if stock isn't tracked, 0 is sold out. "
+    "Variable products sell from their variations' stock, so for them this "
+    "only counts when the product has no variations."
+)
+
+
+def variation_matrix(variations):
+    """
+    Everything product_detail needs about a product's variations: the rows,
+    distinct attribute values in first-seen order, and price/stock keyed by
+    'color|size|weight'. Prices are floats, as the page's JS expects.
+    """
+    rows = list(variations.order_by('pk').values('id', *VARIATION_ATTRIBUTES, 'price', 'stock'))
+    for row in rows:
+        row['price'] = float(row['price']) if row['price'] is not None else None
+    matrix = {
+        'variations': rows,
+        'combinations': {
+            '|'.join(row[attribute] or '' for attribute in VARIATION_ATTRIBUTES): {
+                'id': row['id'], 'price': row['price'], 'stock': row['stock'],
+            }
+            for row in rows
+        },
+    }
+    for attribute in VARIATION_ATTRIBUTES:
+        matrix[f'{attribute}s'] = list(dict.fromkeys(row[attribute] for row in rows if row[attribute]))
+    return matrix
+
+
 class Category(models.Model):
     name = models.CharField(max_length=255, unique=True, blank=True, null=True, verbose_name=_("Category Name"))
     parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children', verbose_name=_("Parent Category"))
@@ -29,13 +100,65 @@ class Category(models.Model):
     image = models.ImageField(upload_to='category_images/', blank=True, null=True, verbose_name=_("Category Image"))
     
     def get_full_slug(self):
+        path = category_path(self.pk) if self.pk else None
+        if path is not None:
+            return path
         slugs = []
         category = self
-        while category:
+        # Parents that are already loaded are free; the rest of the path
+        # comes from the closure table in a single query.
+        while category.parent_id and Category.parent.is_cached(category):
             slugs.insert(0, category.slug)
             category = category.parent
-        return '/'.join(slugs)
-    
+        if category.pk and category.parent_id:
+            head = list(category.ancestor_links.order_by('-depth').values_list('ancestor__slug', flat=True))
+        else:
+            head = [category.slug]
+        return '/'.join(head + slugs)
+
+    def get_descendant_ids(self, include_self=True):
+        """Ids of every category below this one, as a subquery on the closure table."""
+        links = CategoryClosure.objects.filter(ancestor=self)
+        if not include_self:
+            links = links.exclude(depth=0)
+        return links.values('descendant_id')
+
+    def get_descendants(self, include_self=False):
+        return Category.objects.filter(pk__in=self.get_descendant_ids(include_self=include_self))
+
+    def _rebuild_closure(self, created, old_parent_id):
+        if created:
+            links = [CategoryClosure(ancestor=self, descendant=self, depth=0)]
+            if self.parent_id:
+                links += [
+                    CategoryClosure(ancestor_id=ancestor_id, descendant=self, depth=depth + 1)
+                    for ancestor_id, depth in CategoryClosure.objects.filter(
+                        descendant_id=self.parent_id
+                    ).values_list('ancestor_id', 'depth')
+                ]
+            CategoryClosure.objects.bulk_create(links)
+            return
+
+        if old_parent_id == self.parent_id:
+            return
+
+        # Re-parent: detach the whole subtree from its old ancestors, then
+        # link every subtree node to each ancestor of the new parent.
+        subtree = list(
+            CategoryClosure.objects.filter(ancestor=self).values_list('descendant_id', 'depth')
+        )
+        subtree_ids = [descendant_id for descendant_id, _ in subtree]
+        CategoryClosure.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+
+        if self.parent_id:
+            new_ancestors = CategoryClosure.objects.filter(
+                descendant_id=self.parent_id
+            ).values_list('ancestor_id', 'depth')
+            CategoryClosure.objects.bulk_create([
+                CategoryClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + depth + 1)
+                for ancestor_id, ancestor_depth in new_ancestors
+                for descendant_id, depth in subtree
+            ])
 
     def save(self, *args, **kwargs):
         if self.name == '':
@@ -43,6 +166,15 @@ class Category(models.Model):
         if self.slug == '':
             self.slug = None
 
+        created = self._state.adding or not self.pk
+        old_parent_id = None
+        if not created:
+            old_parent_id = Category.objects.filter(pk=self.pk).values_list('parent_id', flat=True).first()
+
+        if self.parent_id and not created and self.parent_id != old_parent_id:
+            if CategoryClosure.objects.filter(ancestor=self, descendant_id=self.parent_id).exists():
+                raise ValueError("A category cannot be moved under itself or one of its descendants.")
+
         if self.name and not self.slug:
             base_slug = slugify(self.name)
             temp_slug = base_slug
@@ -52,16 +184,19 @@ class Category(models.Model):
                 counter += 1
             self.slug = temp_slug
 
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._rebuild_closure(created, old_parent_id)
+            # Before post_save, so receivers already see the new paths; and
+            # again after commit for workers that rebuilt in between.
+            bump_category_tree_version()
+            transaction.on_commit(bump_category_tree_version)
 
     def __str__(self):
         return self.name or f"Unnamed Category ({self.id})"
 
     def get_absolute_url(self):
-        full_slug = self.get_full_slug()
-        if full_slug:
-            return reverse('category_detail', kwargs={'full_slug': full_slug})
-        return reverse('category_detail', kwargs={'slug': self.slug})
+        return reverse('website:category_detail', kwargs={'full_slug': self.get_full_slug()})
 
 
     class Meta:
@@ -70,6 +205,26 @@ class Category(models.Model):
         ordering = ['group_name', 'name']
 
 
+class CategoryClosure(models.Model):
+    """
+    Ancestor/descendant pairs for the category tree, including a depth-0 row
+    linking every category to itself. Maintained by Category.save() and the
+    pre_delete handler in products.signals.
+    """
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        indexes = [
+            models.Index(fields=['descendant', 'depth']),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+
 
 class Product(models.Model):
     SIMPLE = 'simple'
@@ -81,8 +236,8 @@ class Product(models.Model):
     ]
     vendor = models.ForeignKey( settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='products' )
 
-    name = models.CharField(max_length=255, blank=True, null=True) 
-    slug = AutoSlugField(populate_from='name', unique=True, slugify=custom_slugify, always_update=True)
+    name = models.CharField(max_length=255, blank=True, default='') 
+    slug = SharedSlugField(populate_from='name', unique=True, slugify=custom_slugify, always_update=True)
     short_description = RichTextField(blank=True, null=True) 
     description = RichTextField(blank=True, null=True) 
     product_type = models.CharField(max_length=20, choices=PRODUCT_TYPE_CHOICES, default=SIMPLE, blank=True, null=True) 
@@ -91,7 +246,7 @@ class Product(models.Model):
     regular_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0.0)], blank=True, null=True) 
     sale_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, validators=[MinValueValidator(0.0)])
     
-    stock_quantity = models.PositiveIntegerField(default=0, blank=True, null=True) 
+    stock_quantity = models.PositiveIntegerField(default=0, blank=True, null=True, help_text=STOCK_QUANTITY_HELP)
     
     is_active = models.BooleanField(default=True, blank=True, null=True, help_text="Is the product visible to customers?") 
     is_featured = models.BooleanField(default=False, blank=True, null=True, help_text="Should this product be highlighted?") 
@@ -99,11 +254,32 @@ class Product(models.Model):
     seo_title = models.CharField(max_length=255, blank=True, null=True, help_text="SEO Title for search engines (max 60-70 chars).") 
     meta_description = models.TextField(blank=True, null=True, help_text="Meta Description for search engines (max 150-160 chars).") 
 
-    created_at = models.DateTimeField(auto_now_add=True, null=True) 
+    # Kept in sync with the images by products.signals, so listing cards
+    # don't query the images table.
+    primary_image = models.ImageField(upload_to='product_images/%Y/%m/', max_length=255, blank=True, null=True, editable=False)
+    primary_image_width = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    primary_image_height = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    # Maintained from the variations by products.signals for product_detail.
+    variation_matrix = models.JSONField(default=dict, blank=True, editable=False)
+    variations_json = models.TextField(default='[]', blank=True, editable=False)
+    # Prefixed ids of the most related products, see products.related.
+    # None until computed or after a change around it.
+    related_ids = models.JSONField(null=True, blank=True, editable=False)
+    # regular_price for the catalog's price sort, 0 when unset; set by
+    # save(). A NULL regular_price means not for sale, so it stays nullable.
+    sort_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True) 
     updated_at = models.DateTimeField(auto_now=True, null=True) 
 
     class Meta:
         ordering = ['-created_at']
+        # Keyset pages of website.catalog seek on (sort column, id).
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            models.Index(fields=['sort_price', 'id'], name='product_price_id_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.pk:
@@ -111,9 +287,19 @@ class Product(models.Model):
                 original = Product.objects.get(pk=self.pk)
                 if original.name != self.name:
                     self.slug = None
+                # Only the refresh_* methods write these; don't clobber
+                # them from an instance loaded before the data changed.
+                self.primary_image = original.primary_image
+                self.primary_image_width = original.primary_image_width
+                self.primary_image_height = original.primary_image_height
+                self.variation_matrix = original.variation_matrix
+                self.variations_json = original.variations_json
+                self.related_ids = original.related_ids
             except Product.DoesNotExist:
                 pass
 
+        if self.name is None:
+            self.name = ''
         if self.slug == '':
             self.slug = None
 
@@ -130,8 +316,11 @@ class Product(models.Model):
             self.regular_price = 0
         if self.sale_price is not None and self.sale_price < 0:
             self.sale_price = 0
+        self.sort_price = self.regular_price or 0
 
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            ProductSlug.claim(self)
 
     def get_display_price(self):
         if self.sale_price is not None:
@@ -140,6 +329,27 @@ class Product(models.Model):
             return self.regular_price
         return None
 
+    def refresh_primary_image(self):
+        values = primary_image_values(self.images.all())
+        Product.objects.filter(pk=self.pk).update(**values)
+        for field, value in values.items():
+            setattr(self, field, value)
+
+    def refresh_variation_matrix(self):
+        self.variation_matrix = variation_matrix(self.variations.all())
+        self.variations_json = json.dumps(self.variation_matrix['variations'])
+        Product.objects.filter(pk=self.pk).update(
+            variation_matrix=self.variation_matrix, variations_json=self.variations_json,
+        )
+
+    @property
+    def in_stock(self):
+        """Whether product_detail offers the product for sale; see STOCK_QUANTITY_HELP."""
+        rows = (self.variation_matrix or {}).get('variations', [])
+        if self.product_type == self.VARIABLE and rows:
+            return any(row['stock'] > 0 for row in rows)
+        return self.stock_quantity is None or self.stock_quantity > 0
+
     @property
     def prefixed_id(self):
         return f"p-{self.id}"
@@ -232,8 +442,8 @@ class VendorProduct(models.Model):
     ]
 
     vendor = models.ForeignKey( settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='vendor_products' )
-    name = models.CharField(max_length=255, blank=True, null=True)
-    slug = AutoSlugField(populate_from='name', unique=True, slugify=custom_slugify, always_update=True)
+    name = models.CharField(max_length=255, blank=True, default='')
+    slug = SharedSlugField(populate_from='name', unique=True, slugify=custom_slugify, always_update=True)
     short_description = RichTextField(blank=True, null=True)
     description = RichTextField(blank=True, null=True)
     product_type = models.CharField(max_length=20, choices=PRODUCT_TYPE_CHOICES, default=SIMPLE, blank=True, null=True)
@@ -244,7 +454,7 @@ class VendorProduct(models.Model):
     vendor_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, validators=[MinValueValidator(0.0)])
     admin_commission = models.DecimalField(max_digits=5, decimal_places=2, default=0.00, validators=[MinValueValidator(0.00), MaxValueValidator(100.00)])
 
-    stock_quantity = models.PositiveIntegerField(default=0, blank=True, null=True)
+    stock_quantity = models.PositiveIntegerField(default=0, blank=True, null=True, help_text=STOCK_QUANTITY_HELP)
 
     is_active = models.BooleanField(default=True, blank=True, null=True, help_text="Is the product visible to customers?")
     is_featured = models.BooleanField(default=False, blank=True, null=True, help_text="Should this product be highlighted?")
@@ -259,11 +469,32 @@ class VendorProduct(models.Model):
     seo_title = models.CharField(max_length=255, blank=True, null=True, help_text="SEO Title for search engines (max 60-70 chars).")
     meta_description = models.TextField(blank=True, null=True, help_text="Meta Description for search engines (max 150-160 chars).")
 
-    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    # Kept in sync with the images by products.signals, so listing cards
+    # don't query the images table.
+    primary_image = models.ImageField(upload_to='vendor_product_images/%Y/%m/', max_length=255, blank=True, null=True, editable=False)
+    primary_image_width = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    primary_image_height = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    # Maintained from the variations by products.signals for product_detail.
+    variation_matrix = models.JSONField(default=dict, blank=True, editable=False)
+    variations_json = models.TextField(default='[]', blank=True, editable=False)
+    # Prefixed ids of the most related products, see products.related.
+    # None until computed or after a change around it.
+    related_ids = models.JSONField(null=True, blank=True, editable=False)
+    # regular_price for the catalog's price sort, 0 when unset; set by
+    # save(). A NULL regular_price means not for sale, so it stays nullable.
+    sort_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True, null=True)
 
     class Meta:
         ordering = ['-created_at']
+        # Keyset pages of website.catalog seek on (sort column, id).
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='vendor_product_created_id_idx'),
+            models.Index(fields=['name', 'id'], name='vendor_product_name_id_idx'),
+            models.Index(fields=['sort_price', 'id'], name='vendor_product_price_id_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if self.pk:
@@ -271,9 +502,19 @@ class VendorProduct(models.Model):
                 original = VendorProduct.objects.get(pk=self.pk)
                 if original.name != self.name:
                     self.slug = None
+                # Only the refresh_* methods write these; don't clobber
+                # them from an instance loaded before the data changed.
+                self.primary_image = original.primary_image
+                self.primary_image_width = original.primary_image_width
+                self.primary_image_height = original.primary_image_height
+                self.variation_matrix = original.variation_matrix
+                self.variations_json = original.variations_json
+                self.related_ids = original.related_ids
             except VendorProduct.DoesNotExist:
                 pass
 
+        if self.name is None:
+            self.name = ''
         if self.slug == '':
             self.slug = None
 
@@ -290,8 +531,11 @@ class VendorProduct(models.Model):
             self.regular_price = 0
         if self.sale_price is not None and self.sale_price < 0:
             self.sale_price = 0
+        self.sort_price = self.regular_price or 0
 
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            ProductSlug.claim(self)
 
     def get_display_price(self):
         if self.sale_price is not None:
@@ -300,6 +544,27 @@ class VendorProduct(models.Model):
             return self.regular_price
         return None
 
+    def refresh_primary_image(self):
+        values = primary_image_values(self.images.all())
+        VendorProduct.objects.filter(pk=self.pk).update(**values)
+        for field, value in values.items():
+            setattr(self, field, value)
+
+    def refresh_variation_matrix(self):
+        self.variation_matrix = variation_matrix(self.variations.all())
+        self.variations_json = json.dumps(self.variation_matrix['variations'])
+        VendorProduct.objects.filter(pk=self.pk).update(
+            variation_matrix=self.variation_matrix, variations_json=self.variations_json,
+        )
+
+    @property
+    def in_stock(self):
+        """Whether product_detail offers the product for sale; see STOCK_QUANTITY_HELP."""
+        rows = (self.variation_matrix or {}).get('variations', [])
+        if self.product_type == self.VARIABLE and rows:
+            return any(row['stock'] > 0 for row in rows)
+        return self.stock_quantity is None or self.stock_quantity > 0
+
     @property
     def prefixed_id(self):
         return f"v-{self.id}"
@@ -374,6 +639,139 @@ class VendorProductVariation(models.Model):
         return f"{self.product.name} - {self.size or ''} {self.weight or ''} {self.color or ''}".strip()
     
 
+class ProductSlug(models.Model):
+    """
+    Every product slug of both kinds in one table: slugs are unique across
+    Product and VendorProduct, and product_detail resolves with one lookup.
+    Rows are written by the products' save() and go away with them.
+    """
+    slug = models.CharField(max_length=255, unique=True)
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, null=True, blank=True, related_name='slug_entry')
+    vendor_product = models.OneToOneField(
+        VendorProduct, on_delete=models.CASCADE, null=True, blank=True, related_name='slug_entry'
+    )
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(product__isnull=False, vendor_product__isnull=True)
+                | Q(product__isnull=True, vendor_product__isnull=False),
+                name='product_slug_single_target',
+            ),
+        ]
+
+    def __str__(self):
+        return self.slug
+
+    @property
+    def target(self):
+        return self.product or self.vendor_product
+
+    @classmethod
+    def _owner(cls, instance):
+        return {'vendor_product' if isinstance(instance, VendorProduct) else 'product': instance}
+
+    @classmethod
+    def free_slug(cls, instance, slug):
+        """
+        slug, or its first free suffix if the other product kind already
+        holds it in the registry (AutoSlugField only checks its own table).
+        """
+        taken = cls.objects.all()
+        siblings = type(instance).objects.all()
+        if instance.pk:
+            taken = taken.exclude(**cls._owner(instance))
+            siblings = siblings.exclude(pk=instance.pk)
+        base_slug = slug
+        counter = 1
+        while taken.filter(slug=slug).exists() or siblings.filter(slug=slug).exists():
+            slug = f"{base_slug}-{counter}"
+            counter += 1
+        return slug
+
+    @classmethod
+    def claim(cls, instance):
+        """
+        Registers instance.slug, already made free by SharedSlugField. Two
+        saves racing for the same slug fail on the unique constraint rather
+        than renaming a product after its signals have run.
+        """
+        owner = cls._owner(instance)
+        if not instance.slug:
+            cls.objects.filter(**owner).delete()
+            return
+        cls.objects.update_or_create(**owner, defaults={'slug': instance.slug})
+
+
+class CategoryPriceStats(models.Model):
+    """
+    Price bounds of the visible products in a category's subtree (active
+    Products and approved, active VendorProducts). The row with no category
+    covers the whole catalog. Kept current by products.price_stats.
+    """
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='price_stats')
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    product_count = models.PositiveIntegerField(default=0)
+    histogram = models.JSONField(default=list, blank=True, help_text="Product counts per equal-width price bucket between min and max.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Category price statistics")
+        verbose_name_plural = _("Category price statistics")
+
+    def __str__(self):
+        return f"{self.category or 'All products'}: {self.min_price} - {self.max_price}"
+
+
+class BoughtTogether(models.Model):
+    """
+    How many checkouts contained both products. Either side can be a
+    Product or a VendorProduct, so both are stored as prefixed ids
+    ('p-12', 'v-3'). Each pair is kept in both directions; written by
+    products.bought_together. A full mining pass writes a new generation,
+    which replaces the live one only once it is complete.
+    """
+    generation = models.PositiveIntegerField(default=0)
+    product_key = models.CharField(max_length=32)
+    companion_key = models.CharField(max_length=32)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['generation', 'product_key', 'companion_key'], name='bought_together_unique_pair',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['generation', 'product_key', '-count'], name='bought_together_top'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_key} + {self.companion_key}: {self.count}"
+
+
+class BoughtTogetherRun(models.Model):
+    """
+    One mining pass into the BoughtTogether rows of its generation; the
+    next incremental pass starts after last_checkout_id. The live
+    generation is that of the newest finished pass.
+    """
+    generation = models.PositiveIntegerField(default=0)
+    last_checkout_id = models.PositiveIntegerField(default=0)
+    checkouts = models.PositiveIntegerField(default=0)
+    pairs = models.PositiveIntegerField(default=0)
+    full = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-pk']
+
+    def __str__(self):
+        return f"Bought-together run up to checkout {self.last_checkout_id}"
+
+
 class DeliveryCharge(models.Model):
     zone = models.CharField(max_length=255, unique=True)  # Delivery Zone Name
     charge = models.DecimalField(max_digits=10, decimal_places=2)  # Delivery Charge Amount
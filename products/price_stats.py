@@ -0,0 +1,185 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, F, IntegerField, Max, Min, Q
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .models import Category, CategoryClosure, CategoryPriceStats, Product, VendorProduct
+
+
+def visible_products():
+    """Querysets of the products shown in the storefront, one per model."""
+    return (
+        Product.objects.filter(is_active=True),
+        VendorProduct.objects.filter(is_active=True, status=VendorProduct.STATUS_APPROVED),
+    )
+
+
+def _histogram_buckets():
+    return getattr(settings, 'CATALOG_PRICE_HISTOGRAM_BUCKETS', 0)
+
+
+def _price_aggregates():
+    return {
+        'min_regular': Min('regular_price'),
+        'min_sale': Min('sale_price'),
+        'max_regular': Max('regular_price'),
+        'max_sale': Max('sale_price'),
+        'count': Count('pk', distinct=True),
+    }
+
+
+def _merge(totals, key, row):
+    entry = totals.setdefault(key, {'prices': [], 'count': 0})
+    entry['prices'] += [row[name] for name in ('min_regular', 'min_sale', 'max_regular', 'max_sale') if row[name] is not None]
+    entry['count'] += row['count']
+
+
+def _aggregate(querysets):
+    totals = {}
+    for queryset in querysets:
+        _merge(totals, None, queryset.aggregate(**_price_aggregates()))
+    return totals.get(None)
+
+
+def _aggregate_by_ancestor(querysets):
+    """One grouped query per model: price bounds keyed by closure ancestor id."""
+    totals = {}
+    for queryset in querysets:
+        rows = (
+            queryset.order_by()
+            .values(ancestor=F('categories__ancestor_links__ancestor_id'))
+            .annotate(**_price_aggregates())
+        )
+        for row in rows:
+            _merge(totals, row['ancestor'], row)
+    return totals
+
+
+def _histogram(querysets, low, high):
+    buckets = _histogram_buckets()
+    if not buckets or low is None or high is None:
+        return []
+    counts = [0] * buckets
+    span = (high - low) or 1
+    for queryset in querysets:
+        rows = (
+            queryset.order_by()
+            .annotate(bucket=Cast((Coalesce('sale_price', 'regular_price') - low) * buckets / span, IntegerField()))
+            .values('bucket')
+            .annotate(total=Count('pk', distinct=True))
+        )
+        for row in rows:
+            if row['bucket'] is not None:
+                counts[min(max(row['bucket'], 0), buckets - 1)] += row['total']
+    return counts
+
+
+def _stats_fields(entry, querysets):
+    prices = entry['prices'] if entry else []
+    low = min(prices) if prices else None
+    high = max(prices) if prices else None
+    return {
+        'min_price': low,
+        'max_price': high,
+        'product_count': entry['count'] if entry else 0,
+        'histogram': _histogram(querysets, low, high),
+    }
+
+
+def _recompute(ancestor_ids, catalog):
+    querysets = visible_products()
+
+    if ancestor_ids:
+        scoped = [qs.filter(categories__ancestor_links__ancestor_id__in=ancestor_ids) for qs in querysets]
+        totals = _aggregate_by_ancestor(scoped)
+        for category_id in ancestor_ids:
+            subtree = [qs.filter(categories__ancestor_links__ancestor_id=category_id) for qs in querysets]
+            CategoryPriceStats.objects.update_or_create(
+                category_id=category_id,
+                defaults=_stats_fields(totals.get(category_id), subtree),
+            )
+
+    if catalog:
+        CategoryPriceStats.objects.update_or_create(category=None, defaults=_stats_fields(_aggregate(querysets), querysets))
+
+
+def refresh_price_stats(category_ids=None, catalog=True):
+    """
+    Recomputes the stored price bounds for the given categories and every
+    category above them (their subtrees changed), plus the catalog-wide row
+    unless catalog is False. With no ids every category is refreshed.
+    """
+    if category_ids is None:
+        ancestor_ids = set(Category.objects.values_list('pk', flat=True))
+    else:
+        ancestor_ids = set(
+            CategoryClosure.objects.filter(descendant_id__in=list(category_ids)).values_list('ancestor_id', flat=True)
+        )
+    _recompute(ancestor_ids, catalog)
+
+
+def _cents(value):
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def price_state(product):
+    """(visible, prices) of a product as the stored stats count it."""
+    visible = bool(product.is_active) and getattr(product, 'status', VendorProduct.STATUS_APPROVED) == VendorProduct.STATUS_APPROVED
+    prices = tuple(_cents(price) for price in (product.regular_price, product.sale_price) if price is not None)
+    return visible, prices
+
+
+def apply_price_change(old_state, new_state, category_ids):
+    """
+    Updates the stored bounds of the categories above category_ids and the
+    catalog-wide row for one product going from old_state to new_state
+    (see price_state), without scanning the catalog: bounds widen to the
+    new prices and the count moves with visibility. Only a row whose min or
+    max was one of the prices taken away is recomputed, and every row is
+    when a histogram is kept, as its buckets can't be adjusted in place.
+    """
+    (was_visible, old_prices), (visible, new_prices) = old_state, new_state
+    if old_state == new_state or not (was_visible or visible):
+        return
+    added = new_prices if visible else ()
+    removed = list((Counter(old_prices if was_visible else ()) - Counter(added)).elements())
+    delta = int(visible) - int(was_visible)
+
+    ancestor_ids = CategoryClosure.objects.filter(descendant_id__in=list(category_ids)).values('ancestor_id')
+    rows = CategoryPriceStats.objects.filter(Q(category_id__in=ancestor_ids) | Q(category__isnull=True))
+    changed, stale, catalog = [], [], False
+    for row in rows:
+        if _histogram_buckets() or any(price in (row.min_price, row.max_price) for price in removed):
+            if row.category_id is None:
+                catalog = True
+            else:
+                stale.append(row.category_id)
+            continue
+        bounds = [price for price in (row.min_price, row.max_price, *added) if price is not None]
+        row.min_price = min(bounds, default=None)
+        row.max_price = max(bounds, default=None)
+        row.product_count = max(row.product_count + delta, 0)
+        row.updated_at = timezone.now()
+        changed.append(row)
+
+    CategoryPriceStats.objects.bulk_update(changed, ['min_price', 'max_price', 'product_count', 'updated_at'])
+    if stale or catalog:
+        _recompute(stale, catalog)
+
+
+def get_price_range(category=None):
+    """
+    (min_price, max_price) for a category subtree or the whole catalog, or
+    None when it holds no priced products. Missing rows are computed once.
+    """
+    stats = CategoryPriceStats.objects.filter(category=category).values_list('min_price', 'max_price')
+    bounds = stats.first()
+    if bounds is None:
+        refresh_price_stats([category.pk] if category else [])
+        bounds = stats.first()
+    if not bounds or bounds[0] is None:
+        return None
+    return bounds
@@ -0,0 +1,125 @@
+from django.conf import settings
+from django.db.models import Count
+from django.dispatch import Signal
+
+from orders.models import OutboxMessage
+from orders.outbox import enqueue, handles
+from .models import Product, VendorProduct
+from .price_stats import visible_products
+
+
+RELATED_PRODUCTS_LIMIT = getattr(settings, 'RELATED_PRODUCTS_LIMIT', 5)
+
+PRODUCT_MODELS = {'p': Product, 'v': VendorProduct}
+
+RELATED_STALE = 'products.related_stale'
+
+# Sent with the prefixed ids of the products whose stored list was just
+# recomputed, e.g. for website.signals to drop their cached pages.
+related_changed = Signal()
+
+
+def _kind(model):
+    return 'v' if model is VendorProduct else 'p'
+
+
+def compute_related_ids(product, limit=RELATED_PRODUCTS_LIMIT):
+    """
+    Prefixed ids of the visible products of both kinds sharing the most
+    categories with product, newest first among equals.
+    """
+    category_ids = list(product.categories.values_list('pk', flat=True))
+    if not category_ids:
+        return []
+
+    candidates = []
+    for queryset in visible_products():
+        if queryset.model is type(product):
+            queryset = queryset.exclude(pk=product.pk)
+        rows = (
+            queryset.filter(categories__in=category_ids)
+            .order_by()
+            .values('pk', 'created_at')
+            .annotate(shared=Count('categories'))
+            .order_by('-shared', '-created_at')[:limit]
+        )
+        kind = _kind(queryset.model)
+        candidates += [
+            (row['shared'], row['created_at'].timestamp() if row['created_at'] else 0, f"{kind}-{row['pk']}")
+            for row in rows
+        ]
+    candidates.sort(reverse=True)
+    return [prefixed_id for _, _, prefixed_id in candidates[:limit]]
+
+
+def refresh_related_ids(product):
+    product.related_ids = compute_related_ids(product)
+    type(product).objects.filter(pk=product.pk).update(related_ids=product.related_ids)
+
+
+def mark_related_stale(category_ids=(), products=()):
+    """
+    Drops the stored lists of every product in the given categories, and of
+    the given products, and queues their recomputation for the outbox
+    worker. Called from products.signals whenever membership or visibility
+    changes.
+    """
+    category_ids = [pk for pk in category_ids if pk]
+    marked = 0
+    for model in PRODUCT_MODELS.values():
+        if category_ids:
+            marked += model.objects.filter(categories__in=category_ids).update(related_ids=None)
+        product_ids = [product.pk for product in products if isinstance(product, model) and product.pk]
+        if product_ids:
+            marked += model.objects.filter(pk__in=product_ids).update(related_ids=None)
+    # One queued refresh covers every list marked before it runs.
+    if marked and not OutboxMessage.objects.filter(
+        topic=RELATED_STALE, status=OutboxMessage.PENDING, claimed_by='',
+    ).exists():
+        enqueue(RELATED_STALE, {})
+
+
+def related_products(product):
+    """
+    The related products to show with product, in order, from the stored
+    ids; one query per product model. A stale list shows nothing until the
+    worker (or refresh_related_products) has recomputed it.
+    """
+    return visible_products_by_id(product.related_ids or [])
+
+
+def visible_products_by_id(prefixed_ids):
+    """
+    The visible products behind a list of prefixed ids, in the same order,
+    with one query per product model. Unknown or hidden ones are skipped.
+    """
+    ids = {kind: [] for kind in PRODUCT_MODELS}
+    for prefixed_id in prefixed_ids:
+        kind, _, pk = prefixed_id.partition('-')
+        if kind in ids and pk.isdigit():
+            ids[kind].append(int(pk))
+
+    found = {}
+    for queryset in visible_products():
+        pks = ids[_kind(queryset.model)]
+        if pks:
+            found.update((item.prefixed_id, item) for item in queryset.filter(pk__in=pks))
+    return [found[prefixed_id] for prefixed_id in prefixed_ids if prefixed_id in found]
+
+
+def refresh_stale_related(everything=False):
+    """Recomputes stale lists (or all of them); returns how many."""
+    refreshed = []
+    for kind, model in PRODUCT_MODELS.items():
+        products = model.objects.all() if everything else model.objects.filter(related_ids__isnull=True)
+        for product in products.only('pk').iterator():
+            refresh_related_ids(product)
+            refreshed.append(f'{kind}-{product.pk}')
+    if refreshed:
+        related_changed.send(sender=None, product_keys=refreshed)
+    return len(refreshed)
+
+
+@handles(RELATED_STALE)
+def refresh_stale_related_message(payload):
+    refresh_stale_related()
@@ -0,0 +1,200 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.db import transaction
+from django.dispatch import receiver
+from .category_paths import bump_category_tree_version
+from .models import (
+    Category, CategoryClosure, Product, ProductImage, ProductVariation, VendorProduct, VendorProductImage,
+    VendorProductVariation,
+)
+from .price_stats import apply_price_change, price_state, refresh_price_stats
+from .related import mark_related_stale
+
+
+@receiver(pre_delete, sender=Category)
+def detach_category_subtree(sender, instance, **kwargs):
+    # Children are re-rooted by on_delete=SET_NULL, so their subtrees must
+    # lose every link to the deleted category's ancestors. Links to the
+    # deleted category itself are removed by the cascade.
+    subtree_ids = CategoryClosure.objects.filter(ancestor=instance).values('descendant_id')
+    ancestor_ids = CategoryClosure.objects.filter(descendant=instance).exclude(ancestor=instance).values('ancestor_id')
+    CategoryClosure.objects.filter(descendant_id__in=subtree_ids, ancestor_id__in=ancestor_ids).delete()
+
+
+@receiver(post_delete, sender=Category)
+def bump_category_tree(sender, **kwargs):
+    # Saves bump in Category.save(). Right away so this process sees its own
+    # change, and again after commit so no other worker keeps a tree it
+    # rebuilt from pre-commit data.
+    bump_category_tree_version()
+    transaction.on_commit(bump_category_tree_version)
+
+
+# ---------------------------------------------------------------------------
+# Category price statistics
+# ---------------------------------------------------------------------------
+
+@receiver(pre_save, sender=Category)
+def remember_category_parent(sender, instance, **kwargs):
+    instance._old_parent_id = (
+        Category.objects.filter(pk=instance.pk).values_list('parent_id', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Category)
+def refresh_price_stats_for_move(sender, instance, created, **kwargs):
+    # A new category holds no products yet and a rename changes no prices.
+    # A move takes its subtree away from the old ancestors and adds it to
+    # the new ones; the category's own subtree is unchanged. post_save comes
+    # before Category.save() relinks the closure, hence on_commit.
+    old_parent_id = getattr(instance, '_old_parent_id', None)
+    if not created and instance.parent_id != old_parent_id:
+        moved = [pk for pk in (old_parent_id, instance.parent_id) if pk]
+        transaction.on_commit(lambda: refresh_price_stats(moved, catalog=False))
+
+
+@receiver(post_delete, sender=Category)
+def refresh_price_stats_after_category_delete(sender, instance, **kwargs):
+    # Its own row goes with the cascade; its ancestors lose the subtree.
+    if instance.parent_id:
+        refresh_price_stats([instance.parent_id], catalog=False)
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=VendorProduct)
+def remember_price_state(sender, instance, **kwargs):
+    fields = ['is_active', 'regular_price', 'sale_price'] + (['status'] if sender is VendorProduct else [])
+    old = sender.objects.filter(pk=instance.pk).only(*fields).first() if instance.pk else None
+    instance._old_price_state = price_state(old) if old else (False, ())
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=VendorProduct)
+def refresh_price_stats_for_product(sender, instance, created, **kwargs):
+    # Only prices and visibility count; a new product has no categories yet.
+    old_state, new_state = getattr(instance, '_old_price_state', None), price_state(instance)
+    if old_state is None or old_state == new_state:
+        return
+    category_ids = [] if created else instance.categories.values_list('pk', flat=True)
+    apply_price_change(old_state, new_state, category_ids)
+
+
+@receiver(pre_delete, sender=Product)
+@receiver(pre_delete, sender=VendorProduct)
+def remember_product_categories(sender, instance, **kwargs):
+    instance._category_ids = list(instance.categories.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=VendorProduct)
+def refresh_price_stats_after_delete(sender, instance, **kwargs):
+    apply_price_change(price_state(instance), (False, ()), getattr(instance, '_category_ids', []))
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+@receiver(m2m_changed, sender=VendorProduct.categories.through)
+def refresh_price_stats_for_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # Changed from the Category side: only that category's subtree moved.
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_price_stats([instance.pk], catalog=False)
+    elif action == 'pre_clear':
+        instance._category_ids = list(instance.categories.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        refresh_price_stats(getattr(instance, '_category_ids', []), catalog=False)
+    elif action in ('post_add', 'post_remove'):
+        refresh_price_stats(pk_set, catalog=False)
+
+
+# ---------------------------------------------------------------------------
+# Denormalized primary image
+# ---------------------------------------------------------------------------
+
+def _refresh_primary_images(image_model, product_ids):
+    product_model = image_model._meta.get_field('product').related_model
+    for product in product_model.objects.filter(pk__in=[pk for pk in product_ids if pk]):
+        product.refresh_primary_image()
+
+
+@receiver(pre_save, sender=ProductImage)
+@receiver(pre_save, sender=VendorProductImage)
+def remember_image_product(sender, instance, **kwargs):
+    # An image moved to another product changes the old product's card too.
+    instance._old_product_id = (
+        sender.objects.filter(pk=instance.pk).values_list('product_id', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=VendorProductImage)
+def refresh_primary_image_after_save(sender, instance, **kwargs):
+    _refresh_primary_images(sender, {instance.product_id, getattr(instance, '_old_product_id', None)})
+
+
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=VendorProductImage)
+def refresh_primary_image_after_delete(sender, instance, **kwargs):
+    _refresh_primary_images(sender, {instance.product_id})
+
+
+# ---------------------------------------------------------------------------
+# Denormalized variation matrix
+# ---------------------------------------------------------------------------
+
+@receiver(pre_save, sender=ProductVariation)
+@receiver(pre_save, sender=VendorProductVariation)
+def remember_variation_product(sender, instance, **kwargs):
+    instance._old_product_id = (
+        sender.objects.filter(pk=instance.pk).values_list('product_id', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=ProductVariation)
+@receiver(post_save, sender=VendorProductVariation)
+@receiver(post_delete, sender=ProductVariation)
+@receiver(post_delete, sender=VendorProductVariation)
+def refresh_variation_matrix(sender, instance, **kwargs):
+    product_model = sender._meta.get_field('product').related_model
+    product_ids = {instance.product_id, getattr(instance, '_old_product_id', None)} - {None}
+    for product in product_model.objects.filter(pk__in=product_ids):
+        product.refresh_variation_matrix()
+
+
+# ---------------------------------------------------------------------------
+# Related products
+# ---------------------------------------------------------------------------
+# Lists are only dropped here; the outbox worker recomputes them (see
+# products.related), as does refresh_related_products.
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=VendorProduct)
+def mark_related_after_save(sender, instance, created, **kwargs):
+    # Only a visibility change matters here: category changes arrive through
+    # m2m_changed, and a new product has no categories yet.
+    old_state = getattr(instance, '_old_price_state', None)
+    if created or old_state is None or old_state[0] == price_state(instance)[0]:
+        return
+    mark_related_stale(instance.categories.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=VendorProduct)
+def mark_related_after_delete(sender, instance, **kwargs):
+    mark_related_stale(getattr(instance, '_category_ids', []))
+
+
+@receiver(pre_delete, sender=Category)
+def mark_related_before_category_delete(sender, instance, **kwargs):
+    mark_related_stale([instance.pk])
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+@receiver(m2m_changed, sender=VendorProduct.categories.through)
+def mark_related_for_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # Everyone in the category before a removal and after an addition.
+        if action in ('pre_remove', 'pre_clear', 'post_add'):
+            mark_related_stale([instance.pk])
+    elif action == 'pre_clear':
+        mark_related_stale(instance.categories.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        mark_related_stale(pk_set, [instance])
@@ -1,3 +1,321 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.db.models.signals import post_save
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import (
+    BoughtTogether, Category, CategoryClosure, CategoryPriceStats, DeliveryCharge, Product, ProductSlug, VendorProduct,
+)
+from orders import outbox
+from orders.models import Ecommercecheckouts, OutboxMessage
+from . import bought_together as mining
+from .price_stats import refresh_price_stats
+from .related import RELATED_STALE, compute_related_ids, refresh_stale_related
+
+
+def ancestors(category):
+    return list(
+        CategoryClosure.objects.filter(descendant=category).order_by('-depth').values_list('ancestor__name', flat=True)
+    )
+
+
+def descendants(category):
+    return set(category.get_descendants().values_list('name', flat=True))
+
+
+class CategoryClosureTests(TestCase):
+    def setUp(self):
+        self.home = Category.objects.create(name='Home')
+        self.kitchen = Category.objects.create(name='Kitchen', parent=self.home)
+        self.cookware = Category.objects.create(name='Cookware', parent=self.kitchen)
+        self.pans = Category.objects.create(name='Pans', parent=self.cookware)
+        self.garden = Category.objects.create(name='Garden')
+
+    def test_new_categories_link_to_every_ancestor(self):
+        self.assertEqual(ancestors(self.pans), ['Home', 'Kitchen', 'Cookware', 'Pans'])
+        self.assertEqual(descendants(self.home), {'Kitchen', 'Cookware', 'Pans'})
+        self.assertEqual(set(Category.objects.filter(pk__in=self.home.get_descendant_ids()).values_list('name', flat=True)),
+                         {'Home', 'Kitchen', 'Cookware', 'Pans'})
+
+    def test_reparent_moves_the_whole_subtree(self):
+        self.kitchen.parent = self.garden
+        self.kitchen.save()
+
+        self.assertEqual(ancestors(self.pans), ['Garden', 'Kitchen', 'Cookware', 'Pans'])
+        self.assertEqual(descendants(self.home), set())
+        self.assertEqual(descendants(self.garden), {'Kitchen', 'Cookware', 'Pans'})
+        self.assertEqual(
+            CategoryClosure.objects.get(ancestor=self.garden, descendant=self.pans).depth, 3,
+        )
+
+    def test_moving_to_the_root(self):
+        self.cookware.parent = None
+        self.cookware.save()
+        self.assertEqual(ancestors(self.pans), ['Cookware', 'Pans'])
+        self.assertEqual(descendants(self.home), {'Kitchen'})
+
+    def test_cannot_move_under_a_descendant(self):
+        self.kitchen.parent = self.pans
+        with self.assertRaises(ValueError):
+            self.kitchen.save()
+        self.assertEqual(ancestors(self.pans), ['Home', 'Kitchen', 'Cookware', 'Pans'])
+
+    def test_deleting_a_category_re_roots_its_children(self):
+        self.kitchen.delete()
+        self.assertEqual(ancestors(self.pans), ['Cookware', 'Pans'])
+        self.assertEqual(descendants(self.home), set())
+        self.assertEqual(descendants(self.cookware), {'Pans'})
+        self.assertIsNone(Category.objects.get(pk=self.cookware.pk).parent_id)
+
+
+class PriceStatsTests(TestCase):
+    def setUp(self):
+        self.home = Category.objects.create(name='Home')
+        self.kitchen = Category.objects.create(name='Kitchen', parent=self.home)
+        self.garden = Category.objects.create(name='Garden')
+        self.cheap, self.mid, self.dear = [
+            self.product(Product, price, self.kitchen) for price in ('10', '20', '30')
+        ]
+        self.hose = self.product(Product, '40', self.garden)
+        self.pot = self.product(VendorProduct, '5', self.kitchen)
+        refresh_price_stats()
+
+    def product(self, model, price, category):
+        product = model.objects.create(name=f'{model.__name__} {price}', regular_price=Decimal(price))
+        product.categories.add(category)
+        return product
+
+    def stats(self):
+        return {
+            row.category_id: (row.min_price, row.max_price, row.product_count)
+            for row in CategoryPriceStats.objects.all()
+        }
+
+    def assertStats(self, expected):
+        stored = self.stats()
+        self.assertEqual(stored, expected)
+        # The incremental update agrees with a recount from scratch.
+        refresh_price_stats()
+        self.assertEqual(self.stats(), stored)
+
+    def test_unrelated_saves_leave_the_stats_alone(self):
+        self.mid.name = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            self.mid.save()
+        self.assertFalse([query for query in queries.captured_queries if 'pricestats' in query['sql']])
+
+    def test_reprice_widens_the_bounds(self):
+        self.mid.regular_price = Decimal('50')
+        self.mid.save()
+        self.assertStats({
+            self.home.pk: (Decimal('10'), Decimal('50'), 3),
+            self.kitchen.pk: (Decimal('10'), Decimal('50'), 3),
+            self.garden.pk: (Decimal('40'), Decimal('40'), 1),
+            None: (Decimal('10'), Decimal('50'), 4),
+        })
+
+    def test_reprice_of_the_bound_recomputes(self):
+        self.cheap.regular_price = Decimal('25')
+        self.cheap.save()
+        self.assertStats({
+            self.home.pk: (Decimal('20'), Decimal('30'), 3),
+            self.kitchen.pk: (Decimal('20'), Decimal('30'), 3),
+            self.garden.pk: (Decimal('40'), Decimal('40'), 1),
+            None: (Decimal('20'), Decimal('40'), 4),
+        })
+
+    def test_deactivate(self):
+        self.hose.is_active = False
+        self.hose.save()
+        self.dear.is_active = False
+        self.dear.save()
+        self.assertStats({
+            self.home.pk: (Decimal('10'), Decimal('20'), 2),
+            self.kitchen.pk: (Decimal('10'), Decimal('20'), 2),
+            self.garden.pk: (None, None, 0),
+            None: (Decimal('10'), Decimal('20'), 2),
+        })
+
+    def test_approve(self):
+        self.pot.status = VendorProduct.STATUS_APPROVED
+        self.pot.save()
+        self.assertStats({
+            self.home.pk: (Decimal('5'), Decimal('30'), 4),
+            self.kitchen.pk: (Decimal('5'), Decimal('30'), 4),
+            self.garden.pk: (Decimal('40'), Decimal('40'), 1),
+            None: (Decimal('5'), Decimal('40'), 5),
+        })
+
+    def test_delete(self):
+        self.hose.delete()
+        self.assertStats({
+            self.home.pk: (Decimal('10'), Decimal('30'), 3),
+            self.kitchen.pk: (Decimal('10'), Decimal('30'), 3),
+            self.garden.pk: (None, None, 0),
+            None: (Decimal('10'), Decimal('30'), 3),
+        })
+
+
+class ProductSlugTests(TestCase):
+    def setUp(self):
+        self.teapot = Product.objects.create(name='Teapot', regular_price=Decimal('10'))
+
+    def registry(self):
+        return {entry.slug: entry.target for entry in ProductSlug.objects.select_related('product', 'vendor_product')}
+
+    def test_slugs_are_unique_across_product_kinds(self):
+        seen = []
+
+        def record(sender, instance, **kwargs):
+            seen.append(instance.slug)
+
+        post_save.connect(record, sender=VendorProduct)
+        self.addCleanup(post_save.disconnect, record, sender=VendorProduct)
+        vendor_teapot = VendorProduct.objects.create(name='Teapot', regular_price=Decimal('12'))
+
+        # Receivers already saw the final slug.
+        self.assertEqual(seen, ['teapot-1'])
+        self.assertEqual(self.registry(), {'teapot': self.teapot, 'teapot-1': vendor_teapot})
+        self.assertEqual(VendorProduct.objects.get().slug, 'teapot-1')
+
+    def test_rename_moves_the_slug(self):
+        self.teapot.name = 'Kettle'
+        self.teapot.save()
+        vendor_teapot = VendorProduct.objects.create(name='Teapot', regular_price=Decimal('12'))
+
+        self.assertEqual(self.registry(), {'kettle': self.teapot, 'teapot': vendor_teapot})
+        self.assertEqual(Product.objects.get().slug, 'kettle')
+
+    def test_rename_onto_a_taken_slug_gets_a_suffix(self):
+        VendorProduct.objects.create(name='Kettle', regular_price=Decimal('12'))
+        self.teapot.name = 'Kettle'
+        self.teapot.save()
+        self.assertEqual(self.teapot.slug, 'kettle-1')
+        self.assertEqual(sorted(self.registry()), ['kettle', 'kettle-1'])
+
+
+class RelatedProductsTests(TestCase):
+    def setUp(self):
+        self.kitchen = Category.objects.create(name='Kitchen')
+        self.tea = Category.objects.create(name='Tea')
+        self.teapot = self.product(Product, 'Teapot', self.kitchen, self.tea)
+        self.cups = self.product(Product, 'Cups', self.kitchen, self.tea)
+        self.kettle = self.product(Product, 'Kettle', self.kitchen)
+        self.caddy = self.product(VendorProduct, 'Caddy', self.kitchen, self.tea, status=VendorProduct.STATUS_APPROVED)
+        self.pending = self.product(VendorProduct, 'Strainer', self.kitchen, self.tea)
+        self.garden = self.product(Product, 'Hose', Category.objects.create(name='Garden'))
+        refresh_stale_related()
+        OutboxMessage.objects.all().delete()
+
+    def product(self, model, name, *categories, **fields):
+        product = model.objects.create(name=name, regular_price=Decimal('10'), **fields)
+        product.categories.add(*categories)
+        return product
+
+    def stored(self, product):
+        return type(product).objects.get(pk=product.pk).related_ids
+
+    def test_most_shared_categories_then_newest_first(self):
+        self.assertEqual(
+            compute_related_ids(self.teapot),
+            [self.caddy.prefixed_id, self.cups.prefixed_id, self.kettle.prefixed_id],
+        )
+        self.assertEqual(self.stored(self.teapot), compute_related_ids(self.teapot))
+        self.assertEqual(self.stored(self.garden), [])
+
+    def test_plain_saves_keep_the_lists(self):
+        self.cups.name = 'Tea cups'
+        self.cups.save()
+        self.assertIsNotNone(self.stored(self.teapot))
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_visibility_changes_queue_a_refresh(self):
+        self.cups.is_active = False
+        self.cups.save()
+        self.pending.status = VendorProduct.STATUS_APPROVED
+        self.pending.save()
+        self.assertIsNone(self.stored(self.teapot))
+        self.assertIsNotNone(self.stored(self.garden))
+        self.assertEqual(list(OutboxMessage.objects.values_list('topic', flat=True)), [RELATED_STALE])
+
+        self.assertEqual(outbox.process_batch('worker'), 1)
+        self.assertEqual(self.stored(self.teapot), [
+            self.pending.prefixed_id, self.caddy.prefixed_id, self.kettle.prefixed_id,
+        ])
+
+    def test_category_changes_mark_both_sides(self):
+        self.garden.categories.add(self.tea)
+        self.assertIsNone(self.stored(self.teapot))
+        self.assertIsNone(self.stored(self.garden))
+        refresh_stale_related()
+        self.assertIn(self.garden.prefixed_id, self.stored(self.teapot))
+
+    def test_product_page_only_reads_the_stored_list(self):
+        Product.objects.filter(pk=self.teapot.pk).update(related_ids=None)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/product/{self.teapot.slug}/')
+        self.assertEqual(response.context['related_products'], [])
+        self.assertFalse([query for query in queries.captured_queries if query['sql'].startswith('UPDATE')])
+
+        refresh_stale_related()
+        response = self.client.get(f'/product/{self.teapot.slug}/')
+        self.assertEqual([product.name for product in response.context['related_products']], ['Caddy', 'Cups', 'Kettle'])
+
+
+class BoughtTogetherTests(TestCase):
+    def setUp(self):
+        self.zone = DeliveryCharge.objects.create(zone='Dhaka', charge=Decimal('60'))
+        self.teapot, self.cups, self.kettle, self.tray = [
+            Product.objects.create(name=name, regular_price=Decimal('10')) for name in ('Teapot', 'Cups', 'Kettle', 'Tray')
+        ]
+
+    def checkout(self, *products):
+        return Ecommercecheckouts.objects.create(
+            customer_name='Rahim', customer_phone='01700000000', customer_address='Road 1', delivery_charge=self.zone,
+            items_json=[{'product_id': str(product.pk), 'vendor_id': ''} for product in products],
+        )
+
+    def companions(self):
+        return [product.name for product in mining.bought_together([self.teapot.prefixed_id])]
+
+    def test_counts_pairs_incrementally(self):
+        self.checkout(self.teapot, self.cups)
+        self.checkout(self.teapot, self.cups, self.kettle)
+        mining.mine_bought_together()
+        self.checkout(self.teapot, self.kettle)
+        self.checkout(self.teapot, self.kettle)
+        run = mining.mine_bought_together()
+
+        self.assertEqual(run.checkouts, 2)
+        self.assertEqual(self.companions(), ['Kettle', 'Cups'])
+
+    def test_full_pass_replaces_the_counts_only_when_complete(self):
+        self.checkout(self.teapot, self.cups)
+        mining.mine_bought_together()
+        Ecommercecheckouts.objects.update(status='cancelled')
+        self.checkout(self.teapot, self.tray)
+        self.checkout(self.teapot, self.tray)
+
+        write_counts = mining._write_counts
+
+        def fail_second_chunk(counter, generation):
+            if BoughtTogether.objects.filter(generation=generation).exists():
+                raise RuntimeError('died')
+            return write_counts(counter, generation)
+
+        with mock.patch.object(mining, '_write_counts', fail_second_chunk), self.assertRaises(RuntimeError):
+            mining.mine_bought_together(full=True, chunk_size=1)
+        # Pages keep the live counts while a full pass is unfinished.
+        self.assertEqual(self.companions(), ['Cups'])
+
+        mining.mine_bought_together(full=True, chunk_size=1)
+        self.assertEqual(self.companions(), ['Tray'])
+        self.assertEqual(set(BoughtTogether.objects.values_list('generation', flat=True)), {mining.live_generation()})
 
-# Create your tests here.
+        # Incremental passes carry on in the new generation.
+        self.checkout(self.teapot, self.kettle)
+        self.assertEqual(mining.mine_bought_together().checkouts, 1)
+        self.assertEqual(self.companions(), ['Tray', 'Kettle'])
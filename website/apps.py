@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.core.management import call_command
+from django.db.models.signals import post_migrate
+
+
+def create_cache_tables(sender, using, **kwargs):
+    # The shared page cache is a DatabaseCache; create its table as part of
+    # migrate so a fresh checkout doesn't fail on the first anonymous page.
+    call_command('createcachetable', database=using, verbosity=0)
 
 
 class WebsiteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'website'
+
+    def ready(self):
+        import website.checks
+        import website.signals
+        post_migrate.connect(create_cache_tables, sender=self)
@@ -0,0 +1,225 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from unidecode import unidecode
+
+from products.category_paths import full_slug
+from products.models import Category, Product, VendorProduct
+
+
+# Workers that did not see a change themselves pick it up after this long.
+AUTOCOMPLETE_REFRESH_SECONDS = getattr(settings, 'AUTOCOMPLETE_REFRESH_SECONDS', 300)
+AUTOCOMPLETE_LIMIT = 10
+
+
+def normalize(text):
+    return ' '.join(unidecode(text or '').lower().split())
+
+
+def word_keys(label):
+    """Every word-start suffix, so 'red cotton shirt' is found by 'cot'."""
+    words = normalize(label).split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class PrefixIndex:
+    """
+    In-process sorted-array prefix index. Entries are (key, ref) pairs kept
+    in a sorted list; a lookup is a bisect plus a short forward scan, so it
+    never touches the database. ``ref`` identifies the source object, e.g.
+    ('product', 'p-12'), and maps to the suggestion payload.
+
+    Writers copy the list and swap it in, so lookups never need the lock.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._keys = {}
+        self._payloads = {}
+        self._lock = threading.Lock()
+
+    def bulk_add(self, items):
+        """Initial load: items are (ref, label, payload) tuples."""
+        with self._lock:
+            entries = list(self._entries)
+            for ref, label, payload in items:
+                keys = word_keys(label)
+                entries.extend((key, ref) for key in keys)
+                self._keys[ref] = keys
+                self._payloads[ref] = payload
+            entries.sort()
+            self._entries = entries
+
+    def add(self, ref, label, payload):
+        with self._lock:
+            entries = self._without(ref)
+            keys = word_keys(label)
+            for key in keys:
+                insort(entries, (key, ref))
+            self._keys[ref] = keys
+            self._payloads[ref] = payload
+            self._entries = entries
+
+    def remove(self, ref):
+        with self._lock:
+            if ref not in self._keys:
+                return
+            self._entries = self._without(ref)
+            self._payloads.pop(ref, None)
+
+    def _without(self, ref):
+        entries = list(self._entries)
+        for key in self._keys.pop(ref, []):
+            position = bisect_left(entries, (key, ref))
+            if position < len(entries) and entries[position] == (key, ref):
+                del entries[position]
+        return entries
+
+    def lookup(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        entries = self._entries
+        results, seen = [], set()
+        position = bisect_left(entries, (prefix,))
+        while position < len(entries) and len(results) < limit:
+            key, ref = entries[position]
+            if not key.startswith(prefix):
+                break
+            payload = self._payloads.get(ref)
+            if ref not in seen and payload is not None:
+                seen.add(ref)
+                results.append(payload)
+            position += 1
+        return results
+
+
+def _product_ref(product):
+    return ('product', product.prefixed_id)
+
+
+def product_payload(product):
+    return {
+        'type': 'product',
+        'id': product.prefixed_id,
+        'label': product.name,
+        'url': reverse('website:product_detail', args=[product.slug]),
+    }
+
+
+def category_payload(category, full_slug):
+    return {
+        'type': 'category',
+        'id': category.pk,
+        'label': category.name,
+        'url': reverse('website:category_detail', kwargs={'full_slug': full_slug}),
+    }
+
+
+def vendor_payload(vendor):
+    return {
+        'type': 'vendor',
+        'id': vendor.pk,
+        'label': vendor.company_name,
+        'url': f"{reverse('website:search')}?{urlencode({'vendor': vendor.pk})}",
+    }
+
+
+def _is_listed(product):
+    if not product.is_active or not product.name or not product.slug:
+        return False
+    if isinstance(product, VendorProduct):
+        return product.status == VendorProduct.STATUS_APPROVED
+    return True
+
+
+class CatalogAutocomplete:
+    """Prefix index over product, category and vendor company names."""
+
+    def __init__(self):
+        self.index = None
+        self.built_at = 0
+
+    def build(self):
+        items = []
+        for product in Product.objects.filter(is_active=True).only('id', 'name', 'slug', 'is_active'):
+            if _is_listed(product):
+                items.append((_product_ref(product), product.name, product_payload(product)))
+        for product in VendorProduct.objects.filter(
+            is_active=True, status=VendorProduct.STATUS_APPROVED
+        ).only('id', 'name', 'slug', 'is_active', 'status'):
+            if _is_listed(product):
+                items.append((_product_ref(product), product.name, product_payload(product)))
+
+        categories = {c.pk: c for c in Category.objects.only('id', 'name', 'slug', 'parent_id')}
+        for category in categories.values():
+            if category.name and category.slug:
+                items.append((('category', category.pk), category.name,
+                              category_payload(category, full_slug(category, categories))))
+
+        vendors = get_user_model().objects.filter(is_vendor=True).exclude(company_name__isnull=True).exclude(company_name='')
+        for vendor in vendors.only('id', 'company_name'):
+            items.append((('vendor', vendor.pk), vendor.company_name, vendor_payload(vendor)))
+
+        index = PrefixIndex()
+        index.bulk_add(items)
+        self.index = index
+        self.built_at = time.monotonic()
+
+    def invalidate(self):
+        self.index = None
+
+    def get_index(self):
+        if self.index is None or time.monotonic() - self.built_at > AUTOCOMPLETE_REFRESH_SECONDS:
+            self.build()
+        return self.index
+
+    def lookup(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        return self.get_index().lookup(prefix, limit)
+
+    # Incremental updates, called from website.signals. Nothing to do until
+    # the index has been built by a lookup.
+
+    def update_product(self, product):
+        if self.index is None:
+            return
+        if _is_listed(product):
+            self.index.add(_product_ref(product), product.name, product_payload(product))
+        else:
+            self.index.remove(_product_ref(product))
+
+    def remove_product(self, product):
+        if self.index is not None:
+            self.index.remove(_product_ref(product))
+
+    def update_category(self, category):
+        if self.index is None:
+            return
+        if category.children.exists():
+            # The URLs of the whole subtree may have changed.
+            self.invalidate()
+        elif category.name and category.slug:
+            self.index.add(('category', category.pk), category.name,
+                           category_payload(category, category.get_full_slug()))
+        else:
+            self.index.remove(('category', category.pk))
+
+    def remove_category(self, category):
+        # Its children were re-rooted, which changes their URLs too.
+        self.invalidate()
+
+    def update_vendor(self, vendor):
+        if self.index is None:
+            return
+        if vendor.is_vendor and vendor.company_name:
+            self.index.add(('vendor', vendor.pk), vendor.company_name, vendor_payload(vendor))
+        else:
+            self.index.remove(('vendor', vendor.pk))
+
+
+catalog_autocomplete = CatalogAutocomplete()
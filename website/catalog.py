@@ -0,0 +1,356 @@
+import base64
+import binascii
+import heapq
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import CharField, Count, F, Q, Value
+
+from products.models import Product, ProductVariation, VendorProduct, VendorProductVariation
+
+
+CATALOG_SORT_OPTIONS = {
+    '-created_at': 'Newest',
+    'created_at': 'Oldest',
+    'name': 'Name (A-Z)',
+    '-name': 'Name (Z-A)',
+    'regular_price': 'Price (Low to High)',
+    '-regular_price': 'Price (High to Low)',
+}
+
+DEFAULT_CATALOG_SORT = '-created_at'
+
+# Search results default to relevance order, which only exists with a ranking.
+RELEVANCE_SORT = 'relevance'
+SEARCH_SORT_OPTIONS = {RELEVANCE_SORT: 'Relevance', **CATALOG_SORT_OPTIONS}
+
+PRODUCT_KIND = 'p'
+VENDOR_PRODUCT_KIND = 'v'
+
+# Variation attribute -> key in the ``available_filters`` template context.
+FACET_ATTRIBUTES = {
+    'color': 'colors',
+    'size': 'sizes',
+    'weight': 'weights',
+}
+
+
+CATALOG_PAGE_SIZE = 50
+# Listings page by number; from this page on, "next" hands out a keyset
+# cursor instead, as OFFSET grows with the depth.
+CATALOG_CURSOR_AFTER_PAGE = getattr(settings, 'CATALOG_CURSOR_AFTER_PAGE', 10)
+
+# Sort option -> the non-null column it orders by. Each product table has
+# a (column, id) index for it, so keyset pages seek instead of sorting.
+SORT_COLUMNS = {
+    'created_at': 'created_at',
+    'name': 'name',
+    'regular_price': 'sort_price',
+}
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+
+
+def clean_sort(sort_by):
+    return sort_by if sort_by in CATALOG_SORT_OPTIONS else DEFAULT_CATALOG_SORT
+
+
+def encode_cursor(direction, sort_by, value, kind, pk):
+    """Opaque ?cursor= token: direction, sort, and the boundary row."""
+    if isinstance(value, (datetime, Decimal)):
+        value = value.isoformat() if isinstance(value, datetime) else str(value)
+    payload = json.dumps([direction, sort_by, value, kind, pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, sort_by):
+    """
+    (direction, value, kind, pk) from a cursor token, or None when it is
+    malformed or was made for another sort order.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, cursor_sort, value, kind, pk = json.loads(raw)
+        if cursor_sort != sort_by or direction not in (CURSOR_NEXT, CURSOR_PREVIOUS):
+            return None
+        if kind not in (PRODUCT_KIND, VENDOR_PRODUCT_KIND) or not isinstance(pk, int):
+            return None
+        field = sort_by.lstrip('-')
+        if field == 'created_at':
+            value = datetime.fromisoformat(value)
+        elif field == 'regular_price':
+            value = Decimal(value)
+        elif not isinstance(value, str):
+            return None
+    except (binascii.Error, ValueError, TypeError, InvalidOperation, UnicodeDecodeError):
+        return None
+    return direction, value, kind, pk
+
+
+def hydrate_catalog_rows(rows):
+    """
+    Turns (kind, pk) rows into Product / VendorProduct instances, keeping
+    the row order. Costs one query per product model; cards use the
+    denormalized primary image, so images aren't prefetched.
+    """
+    product_ids = [pk for kind, pk in rows if kind == PRODUCT_KIND]
+    vendor_product_ids = [pk for kind, pk in rows if kind == VENDOR_PRODUCT_KIND]
+
+    instances = {}
+    if product_ids:
+        for product in Product.objects.filter(pk__in=product_ids):
+            instances[(PRODUCT_KIND, product.pk)] = product
+    if vendor_product_ids:
+        for product in VendorProduct.objects.filter(pk__in=vendor_product_ids):
+            instances[(VENDOR_PRODUCT_KIND, product.pk)] = product
+
+    return [instances[row] for row in rows if row in instances]
+
+
+class CatalogQuery:
+    """
+    A Paginator-compatible listing over Products and VendorProducts.
+
+    Numbered pages merge both querysets with a single UNION ALL so that
+    sorting, LIMIT and OFFSET happen in the database; slicing only loads
+    the rows of the requested page. Keyset pages seek each table on its
+    (sort column, id) index instead and merge the two short runs here.
+    """
+
+    def __init__(self, products, vendor_products, sort_by=DEFAULT_CATALOG_SORT):
+        self.products = products
+        self.vendor_products = vendor_products
+        self.sort_by = clean_sort(sort_by)
+        self.column = SORT_COLUMNS[self.sort_by.lstrip('-')]
+        self._count = None
+
+    def _rows(self, queryset, kind):
+        return (
+            queryset.order_by()
+            .annotate(kind=Value(kind, output_field=CharField()), sort_key=F(self.column))
+            .values_list('kind', 'pk', 'sort_key')
+            .distinct()
+        )
+
+    def union(self):
+        """Ordered UNION ALL of (kind, pk, sort_key) rows."""
+        products = self._rows(self.products, PRODUCT_KIND)
+        vendor_products = self._rows(self.vendor_products, VENDOR_PRODUCT_KIND)
+        prefix = '-' if self.sort_by.startswith('-') else ''
+        return (
+            products.union(vendor_products, all=True)
+            .order_by(f'{prefix}sort_key', f'{prefix}kind', f'{prefix}pk')
+        )
+
+    def rows_after(self, after, limit, reverse=False):
+        """
+        Up to limit (kind, pk, sort_key) rows past an after = (sort_key,
+        kind, pk) boundary (from the start when None), in listing order or
+        backwards when reverse. Each table is queried on its own with the
+        seek condition and LIMIT, so the cost doesn't grow with the depth
+        of the page.
+        """
+        descending = self.sort_by.startswith('-') != reverse
+        runs = []
+        for queryset, kind in ((self.products, PRODUCT_KIND), (self.vendor_products, VENDOR_PRODUCT_KIND)):
+            rows = self._rows(queryset, kind)
+            if after is not None:
+                rows = rows.filter(self._after(kind, after, descending))
+            # kind is constant within a table, so (column, id) is the order.
+            prefix = '-' if descending else ''
+            runs.append(list(rows.order_by(f'{prefix}sort_key', f'{prefix}pk')[:limit]))
+        merged = heapq.merge(*runs, key=lambda row: (row[2], row[0], row[1]), reverse=descending)
+        return list(merged)[:limit]
+
+    def _after(self, kind, after, descending):
+        """
+        Keyset condition on (sort column, kind, pk) for one table. The kind
+        is constant per table, so its comparison is settled here and the
+        SELECT only filters on the indexed (column, id) pair.
+        """
+        value, after_kind, after_pk = after
+        past = 'lt' if descending else 'gt'
+        column = self.column
+        if kind == after_kind:
+            return Q(**{f'{column}__{past}': value}) | Q(**{column: value, f'pk__{past}': after_pk})
+        if (kind > after_kind) != descending:
+            return Q(**{f'{column}__{past}e': value})
+        return Q(**{f'{column}__{past}': value})
+
+    def count(self):
+        if self._count is None:
+            self._count = self.union().count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            rows = self.union()[key]
+            return hydrate_catalog_rows([(kind, pk) for kind, pk, _ in rows])
+        return self[key:key + 1][0]
+
+    def boundary_cursor(self, direction, instance):
+        kind = VENDOR_PRODUCT_KIND if isinstance(instance, VendorProduct) else PRODUCT_KIND
+        return encode_cursor(direction, self.sort_by, getattr(instance, self.column), kind, instance.pk)
+
+    def cursor_page(self, cursor=None, per_page=CATALOG_PAGE_SIZE):
+        """
+        The page after (or before) a cursor row, or the first page without
+        one. Costs the same at any depth: no COUNT and no OFFSET, just a
+        range condition on each table's sort index.
+        """
+        after, backwards = None, False
+        if cursor is not None:
+            direction, value, kind, pk = cursor
+            after, backwards = (value, kind, pk), direction == CURSOR_PREVIOUS
+        rows = self.rows_after(after, per_page + 1, reverse=backwards)
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        if backwards:
+            rows.reverse()
+        page = CursorPage(hydrate_catalog_rows([(kind, pk) for kind, pk, _ in rows]))
+        if page.object_list:
+            # Coming from a later page there is one behind us, and vice versa.
+            if cursor is not None and (more or not backwards):
+                page.previous_cursor = self.boundary_cursor(CURSOR_PREVIOUS, page.object_list[0])
+            if more or backwards:
+                page.next_cursor = self.boundary_cursor(CURSOR_NEXT, page.object_list[-1])
+        return page
+
+
+class CursorPage:
+    """A keyset page; quacks like a Page for the listing templates."""
+
+    paginator = None
+
+    def __init__(self, object_list):
+        self.object_list = object_list
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginate_catalog(listing, request, per_page=CATALOG_PAGE_SIZE):
+    """
+    Page of a catalog listing for the current request. Listings page by
+    number (``?page=``) as they always have; a ``?cursor=`` page is walked
+    in keyset mode, with no COUNT or OFFSET. Numbered pages from
+    CATALOG_CURSOR_AFTER_PAGE on link to the next page by cursor, so deep
+    walks switch to keyset mode. Ranked search results only page by number.
+    """
+    if isinstance(listing, CatalogQuery):
+        cursor = decode_cursor(request.GET.get('cursor', ''), listing.sort_by)
+        if cursor is not None:
+            return listing.cursor_page(cursor, per_page)
+
+    page = Paginator(listing, per_page).get_page(request.GET.get('page'))
+    page.next_cursor = page.previous_cursor = None
+    if isinstance(listing, CatalogQuery) and page.has_next() and page.number >= CATALOG_CURSOR_AFTER_PAGE:
+        page.next_cursor = listing.boundary_cursor(CURSOR_NEXT, page.object_list[-1])
+    page.page_links = list(page.paginator.get_elided_page_range(page.number, on_each_side=2, on_ends=0))
+    return page
+
+
+def search_catalog(products, vendor_products, hits):
+    """
+    Restricts both listing querysets to ranked search hits, as returned by
+    a website.search_index backend. Returns the filtered querysets and a
+    (kind, pk) -> rank mapping for RankedCatalogQuery.
+    """
+    ranking = {hit: rank for rank, hit in enumerate(hits)}
+    products = products.filter(pk__in=[pk for kind, pk in hits if kind == PRODUCT_KIND])
+    vendor_products = vendor_products.filter(pk__in=[pk for kind, pk in hits if kind == VENDOR_PRODUCT_KIND])
+    return products, vendor_products, ranking
+
+
+class RankedCatalogQuery:
+    """
+    Paginator-compatible listing in search-rank order. Only the ids of the
+    (bounded) hit list are loaded; instances are built for the page slice.
+    """
+
+    def __init__(self, products, vendor_products, ranking):
+        self.products = products
+        self.vendor_products = vendor_products
+        self.ranking = ranking
+        self._rows = None
+
+    def rows(self):
+        if self._rows is None:
+            rows = [(PRODUCT_KIND, pk) for pk in self.products.order_by().values_list('pk', flat=True).distinct()]
+            rows += [(VENDOR_PRODUCT_KIND, pk) for pk in self.vendor_products.order_by().values_list('pk', flat=True).distinct()]
+            self._rows = sorted(rows, key=lambda row: self.ranking.get(row, len(self.ranking)))
+        return self._rows
+
+    def count(self):
+        return len(self.rows())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return hydrate_catalog_rows(self.rows()[key])
+        return self[key:key + 1][0]
+
+
+def _facet_rows(variations, products):
+    """One grouped SELECT per attribute, restricted to the given products."""
+    variations = variations.filter(product__in=products.values('pk'))
+    selects = [
+        variations.exclude(Q(**{f'{attribute}__isnull': True}) | Q(**{attribute: ''}))
+        .annotate(attribute=Value(attribute, output_field=CharField()), value=F(attribute))
+        .values('attribute', 'value')
+        .annotate(products=Count('product_id', distinct=True))
+        .values_list('attribute', 'value', 'products')
+        .order_by()
+        for attribute in FACET_ATTRIBUTES
+    ]
+    return selects[0].union(*selects[1:], all=True)
+
+
+def catalog_facets(products, vendor_products):
+    """
+    Colour/size/weight facets for a listing, with the number of products
+    carrying each value.
+
+    The grouping runs in one UNION ALL query over both variation tables, and
+    the listing querysets are used as subqueries, so no id lists are loaded
+    into Python. Returns ``{'colors': [(value, count), ...], ...}`` sorted by
+    value.
+    """
+    rows = _facet_rows(ProductVariation.objects.all(), products).union(
+        _facet_rows(VendorProductVariation.objects.all(), vendor_products), all=True
+    )
+
+    counts = {attribute: {} for attribute in FACET_ATTRIBUTES}
+    for attribute, value, total in rows:
+        counts[attribute][value] = counts[attribute].get(value, 0) + total
+
+    return {
+        key: sorted(counts[attribute].items())
+        for attribute, key in FACET_ATTRIBUTES.items()
+    }
@@ -0,0 +1,32 @@
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+from products.category_paths import CATEGORY_TREE_CACHE_ALIAS
+from .page_cache import PAGE_CACHE_ALIAS, PAGE_CACHE_ENABLED, page_cache
+
+
+@register(Tags.caches)
+def check_page_cache_is_shared(app_configs, **kwargs):
+    # Invalidations only reach the process that made them, so the other
+    # workers keep serving stale pages for up to PAGE_CACHE_TIMEOUT.
+    if not PAGE_CACHE_ENABLED or not isinstance(page_cache(), LocMemCache):
+        return []
+    return [Warning(
+        f"The page cache alias {PAGE_CACHE_ALIAS!r} is a per-process LocMemCache.",
+        hint="Point PAGE_CACHE_ALIAS at a cache every worker shares (DatabaseCache or Redis), "
+             "or set PAGE_CACHE_ENABLED = False.",
+        id='website.W001',
+    )]
+
+
+@register(Tags.caches)
+def check_category_tree_version_is_shared(app_configs, **kwargs):
+    # Other workers would keep their mega menu and path index until restart.
+    if not isinstance(caches[CATEGORY_TREE_CACHE_ALIAS], LocMemCache):
+        return []
+    return [Warning(
+        f"The category tree version is kept in {CATEGORY_TREE_CACHE_ALIAS!r}, a per-process LocMemCache.",
+        hint="Point CATEGORY_TREE_CACHE_ALIAS at a cache every worker shares (DatabaseCache or Redis).",
+        id='website.W002',
+    )]
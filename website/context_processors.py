@@ -1,29 +1,14 @@
-from collections import defaultdict
-from products.models import Category
+from .menus import get_mega_menu, lazy_footer_categories_html
 
 def mega_menu_categories(request):
-    parent_categories = Category.objects.filter(parent__isnull=True)[:12]
-    structured_mega_menu = {}
-
-    for parent in parent_categories:
-        grouped = defaultdict(list)
-        for child in parent.children.all():
-            group = child.group_name or "Other"
-            grouped[group].append(child)
-
-            for grandchild in child.children.all():
-                grouped[group].append(grandchild)
-
-        structured_mega_menu[parent.id] = dict(grouped)
-
+    # Built once per category-tree version; no queries on a warm cache.
+    menu = get_mega_menu()
     return {
-        'parent_categories': parent_categories,
-        'structured_mega_menu': structured_mega_menu,
+        'parent_categories': menu.parents,
+        'structured_mega_menu': menu.groups,
     }
 
 def all_categories(request):
-    footer_categories = Category.objects.filter()
     return {
-        'footer_categories': footer_categories,
+        'footer_categories': lazy_footer_categories_html(),
     }
-
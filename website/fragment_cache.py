@@ -0,0 +1,78 @@
+import hashlib
+import threading
+
+from django.core.cache import InvalidCacheBackendError, caches
+from django.template.loader import get_template
+
+
+PRODUCT_CARD_TEMPLATE = 'website/_product_card.html'
+
+# Same alias Django's {% cache %} tag uses, when it's configured.
+FRAGMENT_CACHE_ALIAS = 'template_fragments'
+
+
+class CacheStats:
+    """Per-process hit/miss counters, for sizing a cache."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else None,
+        }
+
+
+product_card_stats = CacheStats()
+
+
+def fragment_cache():
+    try:
+        return caches[FRAGMENT_CACHE_ALIAS]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def product_card_key(product):
+    """
+    Changes whenever the card would: saving the product bumps updated_at,
+    and image changes rewrite primary_image without touching updated_at.
+    """
+    version = f"{product.updated_at.isoformat() if product.updated_at else ''}:{product.primary_image.name or ''}"
+    return f"product_card:{product.prefixed_id}:{hashlib.md5(version.encode()).hexdigest()}"
+
+
+def render_product_cards(products):
+    """
+    HTML for a page of product cards. Cached cards come back in one
+    get_many; only the misses are rendered and stored.
+    """
+    products = list(products)
+    cache = fragment_cache()
+    keys = [product_card_key(product) for product in products]
+    cached = cache.get_many(keys)
+
+    template = None
+    rendered = {}
+    cards = []
+    for key, product in zip(keys, products):
+        html = cached.get(key)
+        if html is None:
+            template = template or get_template(PRODUCT_CARD_TEMPLATE)
+            html = rendered[key] = template.render({'product': product})
+        cards.append(html)
+
+    if rendered:
+        cache.set_many(rendered)
+    product_card_stats.record(len(cached), len(rendered))
+    return ''.join(cards)
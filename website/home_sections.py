@@ -0,0 +1,75 @@
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from products.models import Category, Product
+from .models import Banner, HomeComponents, Testimonial
+from .page_cache import tag_versions
+
+
+HomeSection = namedtuple('HomeSection', 'template ttl tags context')
+
+
+def _categories():
+    return {'categories': Category.objects.all()[:13]}
+
+
+def _banners():
+    return {
+        'desktop_banners': Banner.objects.filter(is_active=True, for_mobile=False).order_by('-created_at'),
+        'mobile_banners': Banner.objects.filter(is_active=True, for_mobile=True).order_by('-created_at'),
+    }
+
+
+def _testimonials():
+    return {
+        'testimonials_desktop': Testimonial.objects.filter(is_active=True, for_mobile=False),
+        'testimonials_mobile': Testimonial.objects.filter(is_active=True, for_mobile=True),
+    }
+
+
+def _popular_products():
+    return {'popular_products': Product.objects.filter(is_featured=True).prefetch_related('categories')[:8]}
+
+
+def _components():
+    return {'home_components': HomeComponents.objects.select_related('category')}
+
+
+# Each section is rendered on its own and cached under the versions of its
+# tags, which website.signals invalidates. The TTL is only a backstop.
+HOME_SECTIONS = {
+    'categories': HomeSection('website/home/categories.html', 60 * 60 * 6, ('layout',), _categories),
+    'banners': HomeSection('website/home/banners.html', 60 * 60, ('home:banners',), _banners),
+    'testimonials': HomeSection('website/home/testimonials.html', 60 * 60 * 6, ('home:testimonials',), _testimonials),
+    'popular_products': HomeSection(
+        'website/home/popular_products.html', 60 * 15, ('home:popular_products', 'layout'), _popular_products,
+    ),
+    'components': HomeSection('website/home/components.html', 60 * 60 * 6, ('home:components', 'layout'), _components),
+}
+
+
+def _section_key(name, versions):
+    tokens = ':'.join(versions[tag] for tag in HOME_SECTIONS[name].tags)
+    return f'home_section:{name}:{tokens}'
+
+
+def render_home_sections():
+    """
+    {name: html} for every home page section. Warm sections come back in
+    one get_many; only missing or invalidated ones are queried and rendered.
+    """
+    versions = tag_versions({tag for section in HOME_SECTIONS.values() for tag in section.tags})
+    keys = {name: _section_key(name, versions) for name in HOME_SECTIONS}
+    cached = cache.get_many(keys.values())
+
+    sections = {}
+    for name, section in HOME_SECTIONS.items():
+        html = cached.get(keys[name])
+        if html is None:
+            html = render_to_string(section.template, section.context())
+            cache.set(keys[name], html, section.ttl)
+        sections[name] = mark_safe(html)
+    return sections
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from website.search_index import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the catalog full-text search index from Products and VendorProducts."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} products with {backend.__class__.__name__}."
+        ))
@@ -0,0 +1,99 @@
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.functional import lazy
+from django.utils.safestring import SafeString, mark_safe
+
+from products.category_paths import CATEGORY_TREE_CACHE_ALIAS, category_tree_version, full_slug
+from products.models import Category
+
+
+MEGA_MENU_PARENTS = 12
+FOOTER_CATEGORIES_TEMPLATE = '_base/_footer_categories.html'
+# Shared by every worker, so the footer is rendered once per tree version
+# rather than once per process.
+MENU_CACHE_ALIAS = getattr(settings, 'MENU_CACHE_ALIAS', CATEGORY_TREE_CACHE_ALIAS)
+
+MenuCategory = namedtuple('MenuCategory', 'id name full_slug image_url')
+MegaMenu = namedtuple('MegaMenu', 'version parents groups')
+
+
+def build_mega_menu(version):
+    """
+    Parents with their children grouped by group_name; grandchildren are
+    listed in their parent's group. One query for the whole tree.
+    """
+    categories = {c.pk: c for c in Category.objects.only('id', 'name', 'slug', 'parent_id', 'group_name', 'image')}
+    children = {}
+    for category in categories.values():
+        children.setdefault(category.parent_id, []).append(category)
+
+    def item(category):
+        image_url = category.image.url if category.image else None
+        return MenuCategory(category.pk, category.name, full_slug(category, categories), image_url)
+
+    parents = tuple(item(parent) for parent in children.get(None, [])[:MEGA_MENU_PARENTS])
+    groups = {}
+    for parent in parents:
+        grouped = {}
+        for child in children.get(parent.id, []):
+            entries = grouped.setdefault(child.group_name or "Other", [])
+            entries.append(item(child))
+            entries += [item(grandchild) for grandchild in children.get(child.pk, [])]
+        groups[parent.id] = MappingProxyType({group: tuple(entries) for group, entries in grouped.items()})
+
+    return MegaMenu(version, parents, MappingProxyType(groups))
+
+
+_mega_menu = None
+_lock = threading.Lock()
+
+
+def get_mega_menu():
+    """The immutable menu for the current version, rebuilt lazily."""
+    global _mega_menu
+    version = category_tree_version()
+    menu = _mega_menu
+    if menu is None or menu.version != version:
+        with _lock:
+            if _mega_menu is None or _mega_menu.version != version:
+                _mega_menu = build_mega_menu(version)
+            menu = _mega_menu
+    return menu
+
+
+_footer = (None, None)
+
+
+def footer_categories_html():
+    """
+    The footer's category links, rendered once per category-tree version
+    and shared through the cache; each process keeps the current copy.
+    """
+    global _footer
+    version = category_tree_version()
+    footer_version, html = _footer
+    if footer_version == version:
+        return mark_safe(html)
+    cache = caches[MENU_CACHE_ALIAS]
+    key = f'footer_categories:{version}'
+    html = cache.get(key)
+    if html is None:
+        categories = {c.pk: c for c in Category.objects.only('id', 'name', 'slug', 'parent_id')}
+        items = [
+            MenuCategory(category.pk, category.name, slug, None)
+            for category in categories.values()
+            if (slug := full_slug(category, categories))
+        ]
+        html = render_to_string(FOOTER_CATEGORIES_TEMPLATE, {'footer_categories': items})
+        cache.set(key, html, 60 * 60 * 24)
+    _footer = (version, html)
+    return mark_safe(html)
+
+
+# Only rendered (or fetched) if a template actually prints it.
+lazy_footer_categories_html = lazy(footer_categories_html, SafeString)
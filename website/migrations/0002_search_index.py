@@ -0,0 +1,55 @@
+import html
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS website_search_index USING fts5("
+        "kind UNINDEXED, object_id UNINDEXED, name, body, categories, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+
+    # Index the existing catalog (same documents as website.search_index).
+    Product = apps.get_model('products', 'Product')
+    VendorProduct = apps.get_model('products', 'VendorProduct')
+    catalog = (
+        ('p', Product.objects.filter(is_active=True)),
+        ('v', VendorProduct.objects.filter(is_active=True, status='approved')),
+    )
+    rows = []
+    for kind, queryset in catalog:
+        for product in queryset.prefetch_related('categories'):
+            body = html.unescape(strip_tags(f"{product.short_description or ''} {product.description or ''}"))
+            rows.append((
+                kind,
+                product.pk,
+                product.name or '',
+                ' '.join(body.split()),
+                ' '.join(c.name for c in product.categories.all() if c.name),
+            ))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO website_search_index (kind, object_id, name, body, categories) VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS website_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
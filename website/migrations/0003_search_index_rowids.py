@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+KIND_CODES = {'p': 0, 'v': 1}
+
+
+def rekey_search_index(apps, schema_editor):
+    # Documents get rowid = object_id * 2 + kind code (see
+    # website.search_index.document_rowid) so they can be replaced by rowid.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT kind, object_id, name, body, categories FROM website_search_index")
+        rows = [
+            (int(object_id) * 2 + KIND_CODES[kind], kind, object_id, name, body, categories)
+            for kind, object_id, name, body, categories in cursor.fetchall()
+            if kind in KIND_CODES
+        ]
+        cursor.execute("DELETE FROM website_search_index")
+        cursor.executemany(
+            "INSERT OR REPLACE INTO website_search_index (rowid, kind, object_id, name, body, categories) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0002_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(rekey_search_index, migrations.RunPython.noop),
+    ]
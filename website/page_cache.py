@@ -0,0 +1,185 @@
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .fragment_cache import CacheStats
+
+
+# Must be shared by every worker process, or one worker's invalidations
+# never reach the others; see website.checks.
+PAGE_CACHE_ALIAS = getattr(settings, 'PAGE_CACHE_ALIAS', 'default')
+PAGE_CACHE_ENABLED = getattr(settings, 'PAGE_CACHE_ENABLED', True)
+
+# Entries are invalidated by signals; the timeout only bounds memory.
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+page_cache_stats = CacheStats()
+
+
+def page_cache():
+    return caches[PAGE_CACHE_ALIAS]
+
+
+def _tag_key(tag):
+    return f'page_tag:{tag}'
+
+
+def normalized_query(request):
+    """Query string with params and their values sorted and blanks dropped."""
+    params = []
+    for key in sorted(request.GET):
+        params += [(key, value) for value in sorted(request.GET.getlist(key)) if value != '']
+    return '&'.join(f'{key}={value}' for key, value in params)
+
+
+def page_cache_key(request):
+    raw = f'{request.path}?{normalized_query(request)}'
+    return f'page:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def tag_versions(tags):
+    """
+    Current version token of every tag, creating missing ones. A tag whose
+    token was invalidated (or evicted) gets a new one, so pages stored
+    under the old token no longer match.
+    """
+    cache = page_cache()
+    keys = {_tag_key(tag): tag for tag in tags}
+    versions = cache.get_many(keys)
+    # Tokens start with their creation time, which pages use as Last-Modified.
+    missing = {key: f'{int(time.time())}.{uuid.uuid4().hex}' for key in keys if key not in versions}
+    if missing:
+        for key, token in missing.items():
+            cache.add(key, token, None)
+        versions.update(cache.get_many(missing))
+    return {keys[key]: token for key, token in versions.items()}
+
+
+def invalidate_page_tags(*tags):
+    page_cache().delete_many([_tag_key(tag) for tag in tags])
+
+
+def add_page_tags(request, *tags):
+    """Lets a view declare what a page depends on once it knows."""
+    if getattr(request, '_page_cache_tags', None) is not None:
+        request._page_cache_tags.update(tag_versions(tags))
+
+
+def _version_time(token):
+    try:
+        return int(token.split('.', 1)[0])
+    except ValueError:
+        return 0
+
+
+def page_validators(key, versions):
+    """(etag, last_modified) of a page built from the given tag versions."""
+    digest = hashlib.md5(f'{key}|{sorted(versions.items())}'.encode()).hexdigest()
+    return quote_etag(digest), max(map(_version_time, versions.values()), default=0)
+
+
+def with_validators(request, response, key, versions):
+    """
+    Sets ETag and Last-Modified on the page and returns a 304 instead when
+    the client's copy is still current. Clients are told to always
+    revalidate, since the tag versions change without notice.
+    """
+    etag, last_modified = page_validators(key, versions)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+
+
+def _is_storable(request, response):
+    # A page that sets cookies is specific to this client.
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def _is_cacheable(request):
+    if not PAGE_CACHE_ENABLED:
+        return False
+    if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return False
+    # Pending flash messages are rendered into the page.
+    return not len(get_messages(request))
+
+
+def cache_anonymous_page(*tags):
+    """
+    Whole-page cache for anonymous GETs, keyed on path and normalized query
+    string. Each entry remembers the version of every tag it depends on and
+    is only served while they are all unchanged; see website.signals.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not _is_cacheable(request):
+                return view(request, *args, **kwargs)
+
+            cache = page_cache()
+            key = page_cache_key(request)
+            entry = cache.get(key)
+            if entry is not None and tag_versions(entry['tags']) == entry['tags']:
+                page_cache_stats.record(1, 0)
+                response = HttpResponse(entry['content'], content_type=entry['content_type'])
+                response['X-Page-Cache'] = 'hit'
+                return with_validators(request, response, key, entry['tags'])
+
+            # Versions are taken before rendering, so a change made
+            # meanwhile leaves the stored page already stale.
+            request._page_cache_tags = tag_versions(tags)
+            response = view(request, *args, **kwargs)
+            page_cache_stats.record(0, 1)
+
+            response['X-Page-Cache'] = 'miss'
+            if not _is_storable(request, response):
+                return response
+            cache.set(key, {
+                'tags': request._page_cache_tags,
+                'content': response.content,
+                'content_type': response['Content-Type'],
+            }, PAGE_CACHE_TIMEOUT)
+            return with_validators(request, response, key, request._page_cache_tags)
+        return wrapped
+    return decorator
+
+
+def conditional_page(*tags):
+    """
+    ETag/Last-Modified for anonymous GETs of a page that is not stored but
+    depends on nothing beyond tags, e.g. search results. A client with a
+    current copy gets its 304 before the view runs.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not _is_cacheable(request):
+                return view(request, *args, **kwargs)
+
+            key = page_cache_key(request)
+            versions = tag_versions(tags)
+            etag, last_modified = page_validators(key, versions)
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return with_validators(request, not_modified, key, versions)
+
+            response = view(request, *args, **kwargs)
+            if not _is_storable(request, response):
+                return response
+            return with_validators(request, response, key, versions)
+        return wrapped
+    return decorator
@@ -0,0 +1,219 @@
+import heapq
+import html
+import re
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils.html import strip_tags
+from django.utils.module_loading import import_string
+
+from products.models import Product, VendorProduct
+from .catalog import PRODUCT_KIND, VENDOR_PRODUCT_KIND
+
+
+SEARCH_INDEX_TABLE = 'website_search_index'
+
+# How many ranked hits a query may return to the listing pipeline.
+SEARCH_RESULT_LIMIT = getattr(settings, 'CATALOG_SEARCH_LIMIT', 1000)
+
+
+# Document rowids interleave the two kinds, so a product's document is
+# found by rowid instead of scanning the UNINDEXED kind/object_id columns.
+KIND_CODES = {PRODUCT_KIND: 0, VENDOR_PRODUCT_KIND: 1}
+
+
+def product_kind(instance):
+    return VENDOR_PRODUCT_KIND if isinstance(instance, VendorProduct) else PRODUCT_KIND
+
+
+def document_rowid(kind, object_id):
+    return int(object_id) * 2 + KIND_CODES[kind]
+
+
+def is_searchable(instance):
+    if not instance.is_active:
+        return False
+    if isinstance(instance, VendorProduct):
+        return instance.status == VendorProduct.STATUS_APPROVED
+    return True
+
+
+def plain_text(value):
+    """RichTextField HTML -> plain text suitable for indexing."""
+    return ' '.join(html.unescape(strip_tags(value or '')).split())
+
+
+def build_document(instance, category_names=None):
+    if category_names is None:
+        category_names = instance.categories.values_list('name', flat=True)
+    return {
+        'kind': product_kind(instance),
+        'object_id': instance.pk,
+        'name': instance.name or '',
+        'body': plain_text(f"{instance.short_description or ''} {instance.description or ''}"),
+        'categories': ' '.join(name for name in category_names if name),
+    }
+
+
+def searchable_products():
+    """Every indexable product, with category names prefetched."""
+    yield from Product.objects.filter(is_active=True).prefetch_related('categories').iterator(chunk_size=500)
+    yield from VendorProduct.objects.filter(
+        is_active=True, status=VendorProduct.STATUS_APPROVED
+    ).prefetch_related('categories').iterator(chunk_size=500)
+
+
+class BaseSearchBackend(ABC):
+    """
+    Interface for catalog search backends. ``search`` returns (kind, pk)
+    pairs, best match first; kind is 'p' for Product and 'v' for
+    VendorProduct, as in ``prefixed_id``. ``within`` is an optional
+    (products, vendor_products) pair of querysets the hits must belong to,
+    so listing filters apply before the result limit rather than after.
+    """
+
+    def index(self, instance):
+        if is_searchable(instance):
+            self.add_documents([build_document(instance)])
+        else:
+            self.remove(product_kind(instance), instance.pk)
+
+    def add_documents(self, documents):
+        pass
+
+    def remove(self, kind, object_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def rebuild(self):
+        self.clear()
+        batch = []
+        count = 0
+        for instance in searchable_products():
+            batch.append(build_document(instance, [c.name for c in instance.categories.all()]))
+            if len(batch) >= 500:
+                self.add_documents(batch)
+                count += len(batch)
+                batch = []
+        self.add_documents(batch)
+        return count + len(batch)
+
+    @abstractmethod
+    def search(self, query, limit=SEARCH_RESULT_LIMIT, within=None):
+        """Ranked (kind, pk) hits for query, at most limit of them."""
+
+
+def _candidates(within):
+    products, vendor_products = within or (Product.objects.all(), VendorProduct.objects.all())
+    return ((PRODUCT_KIND, products), (VENDOR_PRODUCT_KIND, vendor_products))
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Fallback that matches with icontains; keeps no index of its own. Hits
+    of both kinds are merged newest first.
+    """
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT, within=None):
+        search_q = Q(name__icontains=query) | Q(short_description__icontains=query) | \
+                   Q(description__icontains=query) | Q(categories__name__icontains=query)
+        streams = []
+        for kind, queryset in _candidates(within):
+            rows = (
+                queryset.filter(search_q).order_by(F('created_at').desc(nulls_last=True), '-pk')
+                .values_list('created_at', 'pk').distinct()[:limit]
+            )
+            streams.append([(created_at is not None, created_at, pk, kind) for created_at, pk in rows])
+        merged = heapq.merge(*streams, key=lambda row: row[:3], reverse=True)
+        return [(kind, pk) for _, _, pk, kind in merged][:limit]
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """
+    SQLite FTS5 index stored in ``website_search_index`` (created by the
+    website migrations). Results are ranked with bm25, weighting name
+    matches over category names over description text.
+    """
+
+    table = SEARCH_INDEX_TABLE
+    # bm25 takes one weight per column: kind, object_id, name, body, categories.
+    weights = (0.0, 0.0, 10.0, 1.0, 4.0)
+
+    def add_documents(self, documents):
+        if not documents:
+            return
+        with transaction.atomic(), connection.cursor() as cursor:
+            rowids = [document_rowid(doc['kind'], doc['object_id']) for doc in documents]
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(rowid,) for rowid in rowids])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, kind, object_id, name, body, categories) '
+                f'VALUES (%s, %s, %s, %s, %s, %s)',
+                [
+                    (rowid, doc['kind'], doc['object_id'], doc['name'], doc['body'], doc['categories'])
+                    for rowid, doc in zip(rowids, documents)
+                ],
+            )
+
+    def remove(self, kind, object_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [document_rowid(kind, object_id)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    @staticmethod
+    def match_expression(query):
+        # Quote every term so user input can't use FTS5 operators, and
+        # prefix-match it so partial words still hit.
+        terms = re.findall(r'\w+', query)
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    @staticmethod
+    def within_clause(within):
+        """
+        SQL restricting the matched rowids to the given querysets' rows, as
+        subqueries compiled by the ORM, and its params.
+        """
+        if within is None:
+            return '', []
+        selects, params = [], []
+        for kind, queryset in _candidates(within):
+            rowids = queryset.order_by().annotate(
+                search_rowid=F('pk') * 2 + KIND_CODES[kind],
+            ).values('search_rowid')
+            sql, select_params = rowids.query.sql_with_params()
+            selects.append(f'rowid IN ({sql})')
+            params += select_params
+        return f" AND ({' OR '.join(selects)})", params
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT, within=None):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        within_sql, within_params = self.within_clause(within)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT kind, object_id FROM {self.table} WHERE {self.table} MATCH %s{within_sql} '
+                f'ORDER BY bm25({self.table}, %s, %s, %s, %s, %s) LIMIT %s',
+                [expression, *within_params, *self.weights, limit],
+            )
+            return [(kind, int(object_id)) for kind, object_id in cursor.fetchall()]
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        default = (
+            'website.search_index.SQLiteFTS5Backend' if connection.vendor == 'sqlite'
+            else 'website.search_index.DatabaseSearchBackend'
+        )
+        _backend = import_string(getattr(settings, 'CATALOG_SEARCH_BACKEND', default))()
+    return _backend
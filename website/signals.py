@@ -0,0 +1,230 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.contrib.auth import get_user_model
+from django.dispatch import receiver
+from orders.stock import stock_changed
+from products.related import related_changed
+from products.models import (
+    Category, Product, ProductImage, ProductVariation, VendorProduct, VendorProductImage, VendorProductVariation,
+)
+from .models import Banner, HomeComponents, Testimonial
+from .autocomplete import catalog_autocomplete
+from .catalog import PRODUCT_KIND, VENDOR_PRODUCT_KIND
+from .page_cache import invalidate_page_tags
+from .search_index import get_search_backend, product_kind
+
+
+# ---------------------------------------------------------------------------
+# Full-text search index
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=VendorProduct)
+def index_product(sender, instance, **kwargs):
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=VendorProduct)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove(product_kind(instance), instance.pk)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+@receiver(m2m_changed, sender=VendorProduct.categories.through)
+def reindex_product_categories(sender, instance, action, reverse, pk_set, model, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    backend = get_search_backend()
+    if not reverse:
+        backend.index(instance)
+    elif pk_set:
+        for product in model.objects.filter(pk__in=pk_set):
+            backend.index(product)
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_name(sender, instance, **kwargs):
+    instance._previous_name = (
+        Category.objects.filter(pk=instance.pk).values_list('name', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    if created or instance.name == getattr(instance, '_previous_name', instance.name):
+        return
+    backend = get_search_backend()
+    for product in instance.products.all():
+        backend.index(product)
+    for product in instance.vendor_products.all():
+        backend.index(product)
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_products(sender, instance, **kwargs):
+    instance._product_ids = list(instance.products.values_list('pk', flat=True))
+    instance._vendor_product_ids = list(instance.vendor_products.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def reindex_deleted_category_products(sender, instance, **kwargs):
+    backend = get_search_backend()
+    for product in Product.objects.filter(pk__in=getattr(instance, '_product_ids', [])):
+        backend.index(product)
+    for product in VendorProduct.objects.filter(pk__in=getattr(instance, '_vendor_product_ids', [])):
+        backend.index(product)
+
+
+# ---------------------------------------------------------------------------
+# Autocomplete prefix index
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=VendorProduct)
+def autocomplete_update_product(sender, instance, **kwargs):
+    catalog_autocomplete.update_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=VendorProduct)
+def autocomplete_remove_product(sender, instance, **kwargs):
+    catalog_autocomplete.remove_product(instance)
+
+
+@receiver(post_save, sender=Category)
+def autocomplete_update_category(sender, instance, **kwargs):
+    catalog_autocomplete.update_category(instance)
+
+
+@receiver(post_delete, sender=Category)
+def autocomplete_remove_category(sender, instance, **kwargs):
+    catalog_autocomplete.remove_category(instance)
+
+
+# User fields a vendor suggestion is built from.
+VENDOR_SUGGESTION_FIELDS = {'is_vendor', 'company_name'}
+
+
+@receiver(post_save, sender=get_user_model())
+def autocomplete_update_vendor(sender, instance, update_fields=None, **kwargs):
+    # e.g. the last_login update on every sign-in
+    if update_fields is not None and not VENDOR_SUGGESTION_FIELDS & set(update_fields):
+        return
+    catalog_autocomplete.update_vendor(instance)
+
+
+# ---------------------------------------------------------------------------
+# Anonymous page cache tags (see website.page_cache)
+# ---------------------------------------------------------------------------
+
+def _product_page_tags(product, category_ids=None):
+    if category_ids is None:
+        category_ids = product.categories.values_list('pk', flat=True)
+    # Product pages list related products from the same categories.
+    return [f'product:{product.prefixed_id}', *[f'category:{pk}' for pk in category_ids]]
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_layout_pages(sender, **kwargs):
+    # The mega menu and footer list categories on every page.
+    invalidate_page_tags('layout')
+
+
+HOME_SECTION_TAGS = {
+    Banner: 'home:banners',
+    Testimonial: 'home:testimonials',
+    HomeComponents: 'home:components',
+}
+
+
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+@receiver(post_save, sender=Testimonial)
+@receiver(post_delete, sender=Testimonial)
+@receiver(post_save, sender=HomeComponents)
+@receiver(post_delete, sender=HomeComponents)
+def invalidate_home_page(sender, **kwargs):
+    invalidate_page_tags('home', HOME_SECTION_TAGS[sender])
+
+
+@receiver(pre_save, sender=Product)
+def remember_featured(sender, instance, **kwargs):
+    instance._was_featured = bool(
+        instance.pk and Product.objects.filter(pk=instance.pk, is_featured=True).exists()
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_featured_products(sender, instance, **kwargs):
+    if instance.is_featured or getattr(instance, '_was_featured', False):
+        invalidate_page_tags('home:popular_products')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=VendorProduct)
+def invalidate_product_pages(sender, instance, **kwargs):
+    invalidate_page_tags('catalog', *_product_page_tags(instance))
+
+
+@receiver(pre_delete, sender=Product)
+@receiver(pre_delete, sender=VendorProduct)
+def remember_product_page_tags(sender, instance, **kwargs):
+    instance._page_tags = _product_page_tags(instance, list(instance.categories.values_list('pk', flat=True)))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=VendorProduct)
+def invalidate_deleted_product_pages(sender, instance, **kwargs):
+    invalidate_page_tags('catalog', *getattr(instance, '_page_tags', []))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=VendorProductImage)
+@receiver(post_delete, sender=VendorProductImage)
+@receiver(post_save, sender=ProductVariation)
+@receiver(post_delete, sender=ProductVariation)
+@receiver(post_save, sender=VendorProductVariation)
+@receiver(post_delete, sender=VendorProductVariation)
+def invalidate_product_detail_pages(sender, instance, **kwargs):
+    # Cards show the primary image and the facets come from variations.
+    tags = ['catalog']
+    if instance.product_id:
+        kind = VENDOR_PRODUCT_KIND if sender in (VendorProductImage, VendorProductVariation) else PRODUCT_KIND
+        tags.append(f'product:{kind}-{instance.product_id}')
+        if sender is ProductImage and Product.objects.filter(pk=instance.product_id, is_featured=True).exists():
+            tags.append('home:popular_products')
+    invalidate_page_tags(*tags)
+
+
+@receiver(stock_changed)
+def invalidate_restocked_pages(sender, product_keys, **kwargs):
+    # Product pages show "Out of Stock" and the variations' stock.
+    invalidate_page_tags('catalog', *[f'product:{key}' for key in product_keys])
+
+
+@receiver(related_changed)
+def invalidate_related_pages(sender, product_keys, **kwargs):
+    # The worker refilled their related-products sections.
+    invalidate_page_tags(*[f'product:{key}' for key in product_keys])
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+@receiver(m2m_changed, sender=VendorProduct.categories.through)
+def invalidate_recategorized_pages(sender, instance, action, reverse, pk_set, model, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        products = model.objects.filter(pk__in=pk_set) if pk_set is not None else model.objects.filter(categories=instance)
+        tags = [f'category:{instance.pk}', *[f'product:{product.prefixed_id}' for product in products]]
+        if model is Product and products.filter(is_featured=True).exists():
+            tags.append('home:popular_products')
+    else:
+        tags = _product_page_tags(instance, pk_set if action != 'pre_clear' else None)
+        if isinstance(instance, Product) and instance.is_featured:
+            # The home page lists featured products' category names.
+            tags.append('home:popular_products')
+    invalidate_page_tags('catalog', *tags)
+
@@ -1,16 +1,24 @@
 from django import template
+from django.utils.safestring import mark_safe
 from urllib.parse import urlencode
 
+from website.fragment_cache import render_product_cards
+
 register = template.Library()
 
+PAGINATION_KEYS = ('page', 'cursor')
+
 @register.simple_tag(takes_context=True)
 def modify_query(context, **kwargs):
     request = context['request']
     params = request.GET.copy()
 
-    if any(k != 'page' and k in kwargs for k in kwargs):
-        if 'page' in params:
-            del params['page']
+    # Any change invalidates the current position, and a page number and a
+    # cursor never go together.
+    if kwargs:
+        for key in PAGINATION_KEYS:
+            if key not in kwargs and key in params:
+                del params[key]
 
     for key, value in kwargs.items():
         if value is None:
@@ -32,6 +40,12 @@ def modify_query(context, **kwargs):
     return urlencode(final_params)
 
 
+@register.simple_tag
+def product_cards(products):
+    """Listing cards, served from the fragment cache where possible."""
+    return mark_safe(render_product_cards(products))
+
+
 @register.filter
 def mask_name(full_name):
     if not full_name:
@@ -1,3 +1,367 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from products import category_paths
+from products.models import Category, Product, ProductVariation, VendorProduct, VendorProductVariation
+from . import checks
+from .catalog import CATALOG_SORT_OPTIONS, CatalogQuery, catalog_facets, paginate_catalog
+from .autocomplete import catalog_autocomplete
+from . import menus
+from .context_processors import mega_menu_categories
+from .page_cache import invalidate_page_tags, page_cache
+from .search_index import (
+    SEARCH_INDEX_TABLE, BaseSearchBackend, DatabaseSearchBackend, SQLiteFTS5Backend, document_rowid,
+)
+
+
+def indexed_rows():
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT rowid, kind, object_id, name FROM {SEARCH_INDEX_TABLE} ORDER BY rowid')
+        return cursor.fetchall()
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.backend = SQLiteFTS5Backend()
+
+    def test_documents_are_keyed_by_rowid(self):
+        product = Product.objects.create(name='Walnut desk', regular_price=Decimal('10'))
+        vendor_product = VendorProduct.objects.create(
+            name='Walnut shelf', regular_price=Decimal('10'), status=VendorProduct.STATUS_APPROVED,
+        )
+        self.assertEqual(indexed_rows(), [
+            (document_rowid('p', product.pk), 'p', product.pk, 'Walnut desk'),
+            (document_rowid('v', vendor_product.pk), 'v', vendor_product.pk, 'Walnut shelf'),
+        ])
+
+        product.name = 'Oak desk'
+        product.save()
+        self.assertEqual(self.backend.search('desk'), [('p', product.pk)])
+        self.assertEqual(len(indexed_rows()), 2)
+
+        self.backend.remove('p', product.pk)
+        self.assertEqual(indexed_rows(), [(document_rowid('v', vendor_product.pk), 'v', vendor_product.pk, 'Walnut shelf')])
+
+    def test_kinds_with_the_same_pk_do_not_collide(self):
+        self.backend.add_documents([
+            {'kind': 'p', 'object_id': 7, 'name': 'lamp', 'body': '', 'categories': ''},
+            {'kind': 'v', 'object_id': 7, 'name': 'lamp', 'body': '', 'categories': ''},
+        ])
+        self.backend.remove('v', 7)
+        self.assertEqual(self.backend.search('lamp'), [('p', 7)])
+
+    def test_filters_apply_before_the_limit(self):
+        kitchen = Category.objects.create(name='Kitchen')
+        for i in range(5):
+            Product.objects.create(name=f'Steel kettle {i}', regular_price=Decimal('10'))
+        wanted = Product.objects.create(name='Copper kettle', description='kettle', regular_price=Decimal('10'))
+        wanted.categories.add(kitchen)
+
+        within = (Product.objects.filter(categories=kitchen), VendorProduct.objects.filter(categories=kitchen))
+        self.assertNotIn(('p', wanted.pk), self.backend.search('kettle', limit=3))
+        self.assertEqual(self.backend.search('kettle', limit=3, within=within), [('p', wanted.pk)])
+
+    def test_database_backend_keeps_both_kinds(self):
+        for i in range(3):
+            Product.objects.create(name=f'Linen shirt {i}', regular_price=Decimal('10'))
+        vendor_product = VendorProduct.objects.create(
+            name='Linen scarf', regular_price=Decimal('10'), status=VendorProduct.STATUS_APPROVED,
+        )
+        hits = DatabaseSearchBackend().search('linen', limit=3)
+        self.assertEqual(hits[0], ('v', vendor_product.pk))
+        self.assertEqual(len(hits), 3)
+
+    def test_backends_must_implement_search(self):
+        with self.assertRaises(TypeError):
+            BaseSearchBackend()
+
+
+class CatalogKeysetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Repeated names and prices, and a product with no price, so pages
+        # break inside runs of equal sort values.
+        for i in range(9):
+            Product.objects.create(name=f'Item {i % 3}', regular_price=Decimal(i % 4) if i != 4 else None)
+        for i in range(8):
+            VendorProduct.objects.create(name=f'Item {i % 3}', regular_price=Decimal(i % 4))
+
+    def listing(self, sort_by):
+        return CatalogQuery(Product.objects.all(), VendorProduct.objects.all(), sort_by)
+
+    def walk(self, sort_by, params, per_page=4):
+        request = RequestFactory().get('/shop/', params)
+        return paginate_catalog(self.listing(sort_by), request, per_page)
+
+    def test_cursor_pages_match_the_numbered_order(self):
+        for sort_by in CATALOG_SORT_OPTIONS:
+            with self.subTest(sort_by=sort_by):
+                listing = self.listing(sort_by)
+                expected = [product.prefixed_id for product in listing[0:listing.count()]]
+
+                page = listing.cursor_page(None, 4)
+                pages = [[product.prefixed_id for product in page]]
+                while page.has_next():
+                    page = self.walk(sort_by, {'cursor': page.next_cursor})
+                    pages.append([product.prefixed_id for product in page])
+                self.assertEqual(sum(pages, []), expected)
+
+                backwards = [pages[-1]]
+                while page.has_previous():
+                    page = self.walk(sort_by, {'cursor': page.previous_cursor})
+                    backwards.append([product.prefixed_id for product in page])
+                self.assertEqual(backwards[::-1], pages)
+
+    def test_cursor_pages_seek_without_count_or_offset(self):
+        page = self.listing('name').cursor_page(None, 4)
+        with CaptureQueriesContext(connection) as queries:
+            page = self.walk('name', {'cursor': page.next_cursor})
+        self.assertEqual(len(page), 4)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+            self.assertNotIn('UNION', query['sql'])
+
+    def test_listings_page_by_number_by_default(self):
+        page = self.walk('-created_at', {})
+        self.assertEqual(page.number, 1)
+        self.assertEqual(page.paginator.num_pages, 5)
+        self.assertIsNone(page.next_cursor)
+
+        page = self.walk('-created_at', {'page': '2', 'cursor': 'garbage'})
+        self.assertEqual(page.number, 2)
+        self.assertIsNone(page.previous_cursor)
+
+    def test_deep_numbered_pages_hand_over_to_cursors(self):
+        with mock.patch('website.catalog.CATALOG_CURSOR_AFTER_PAGE', 3):
+            self.assertIsNone(self.walk('name', {'page': '2'}).next_cursor)
+            page = self.walk('name', {'page': '3'})
+        following = self.walk('name', {'cursor': page.next_cursor})
+        numbered = self.walk('name', {'page': '4'})
+        self.assertEqual(list(following), list(numbered))
+
+    def test_price_sort_treats_missing_price_as_zero(self):
+        unpriced = Product.objects.get(regular_price__isnull=True)
+        self.assertEqual(unpriced.sort_price, 0)
+        first = self.listing('regular_price').rows_after(None, 1)
+        self.assertEqual(first[0][2], 0)
+
+
+class CatalogFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shirt = Product.objects.create(name='Shirt', regular_price=Decimal('10'))
+        cls.dress = Product.objects.create(name='Dress', regular_price=Decimal('10'))
+        cls.scarf = VendorProduct.objects.create(name='Scarf', regular_price=Decimal('10'))
+        ProductVariation.objects.create(product=cls.shirt, color='Red', size='S')
+        ProductVariation.objects.create(product=cls.shirt, color='Red', size='M')
+        ProductVariation.objects.create(product=cls.dress, color='Blue', size='M', weight='')
+        VendorProductVariation.objects.create(product=cls.scarf, color='Red', weight='0.2')
+
+    def test_counts_products_per_value_in_one_query(self):
+        with self.assertNumQueries(1):
+            facets = catalog_facets(Product.objects.all(), VendorProduct.objects.all())
+        self.assertEqual(facets, {
+            # The shirt's two red variations count once.
+            'colors': [('Blue', 1), ('Red', 2)],
+            'sizes': [('M', 2), ('S', 1)],
+            'weights': [('0.2', 1)],
+        })
+
+    def test_counts_only_the_listed_products(self):
+        facets = catalog_facets(Product.objects.filter(pk=self.dress.pk), VendorProduct.objects.none())
+        self.assertEqual(facets, {'colors': [('Blue', 1)], 'sizes': [('M', 1)], 'weights': []})
+
+
+class PageCacheTests(TestCase):
+    def test_page_cache_is_shared_between_processes(self):
+        self.assertIsInstance(page_cache(), DatabaseCache)
+        self.assertEqual(checks.check_page_cache_is_shared(None), [])
+
+    def test_warns_about_a_per_process_page_cache(self):
+        with mock.patch.object(checks, 'page_cache', lambda: caches['default']):
+            self.assertEqual([warning.id for warning in checks.check_page_cache_is_shared(None)], ['website.W001'])
+
+    def test_anonymous_pages_are_stored_until_a_tag_changes(self):
+        self.assertEqual(self.client.get('/shop/')['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client.get('/shop/')['X-Page-Cache'], 'hit')
+
+        Product.objects.create(name='Teapot', regular_price=Decimal('5'))
+        self.assertEqual(self.client.get('/shop/')['X-Page-Cache'], 'miss')
+
+        invalidate_page_tags('layout')
+        self.assertEqual(self.client.get('/shop/')['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client.get('/shop/')['X-Page-Cache'], 'hit')
+
+    def test_current_copies_are_revalidated_with_304(self):
+        etag = self.client.get('/shop/')['ETag']
+        self.assertEqual(self.client.get('/shop/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        invalidate_page_tags('catalog')
+        response = self.client.get('/shop/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_signed_in_users_bypass_the_cache(self):
+        user = get_user_model().objects.create(username='shopper')
+        self.client.force_login(user, backend='django.contrib.auth.backends.ModelBackend')
+        self.client.get('/shop/')
+        self.assertNotIn('X-Page-Cache', self.client.get('/shop/'))
+
+
+class MegaMenuTests(TestCase):
+    def setUp(self):
+        self.kitchen = Category.objects.create(name='Kitchen')
+        Category.objects.create(name='Kettles', parent=self.kitchen, group_name='Boil')
+        self.request = RequestFactory().get('/')
+
+    def names(self):
+        menu = mega_menu_categories(self.request)
+        return [
+            (parent.name, [item.name for item in menu['structured_mega_menu'][parent.id].get('Boil', ())])
+            for parent in menu['parent_categories']
+        ]
+
+    def test_warm_menu_costs_no_queries(self):
+        self.names()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(), [('Kitchen', ['Kettles'])])
+
+    def test_own_changes_show_up_right_away(self):
+        self.names()
+        Category.objects.create(name='Toasters', parent=self.kitchen, group_name='Boil')
+        self.assertEqual(self.names(), [('Kitchen', ['Kettles', 'Toasters'])])
+
+    def test_other_workers_changes_show_up_after_the_check_interval(self):
+        self.names()
+        # As another worker would: new row and version, nothing local.
+        Category.objects.bulk_create([Category(name='Garden', slug='garden')])
+        caches[category_paths.CATEGORY_TREE_CACHE_ALIAS].set(category_paths.CATEGORY_TREE_VERSION_KEY, 'elsewhere', None)
+        self.assertEqual(self.names(), [('Kitchen', ['Kettles'])])
+
+        with mock.patch.object(category_paths, 'CATEGORY_TREE_VERSION_CHECK_SECONDS', 0):
+            self.assertEqual(self.names(), [('Garden', []), ('Kitchen', ['Kettles'])])
+
+
+    def test_footer_is_shared_and_kept_per_version(self):
+        menus.footer_categories_html()
+        with self.assertNumQueries(0):
+            html = menus.footer_categories_html()
+        self.assertIn('/category/kitchen/kettles/', html)
+        key = f'footer_categories:{category_paths.category_tree_version()}'
+        self.assertEqual(caches[menus.MENU_CACHE_ALIAS].get(key), html)
+        self.assertIsInstance(caches[menus.MENU_CACHE_ALIAS], DatabaseCache)
+
+class CategoryUrlTests(TestCase):
+    def setUp(self):
+        self.home = Category.objects.create(name='Home')
+        self.kitchen = Category.objects.create(name='Kitchen', parent=self.home)
+        self.kettles = Category.objects.create(name='Kettles', parent=self.kitchen)
+        self.garden = Category.objects.create(name='Garden')
+
+    def test_links_cost_no_queries_once_built(self):
+        categories = list(Category.objects.all()) * 3
+        categories[0].get_absolute_url()
+        with self.assertNumQueries(0):
+            urls = [category.get_absolute_url() for category in categories]
+        self.assertEqual(len(urls), 12)
+        self.assertIn('/category/home/kitchen/kettles/', urls)
+
+    def test_wrong_parent_path_redirects_permanently(self):
+        response = self.client.get('/category/garden/kettles/?sort=price')
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'], '/category/home/kitchen/kettles/?sort=price')
+        self.assertEqual(self.client.get('/category/nothing-here/').status_code, 404)
+
+    def test_paths_follow_a_reparent(self):
+        self.assertEqual(self.client.get('/category/home/kitchen/kettles/').status_code, 200)
+        self.kitchen.parent = self.garden
+        self.kitchen.save()
+
+        self.assertEqual(self.kettles.get_absolute_url(), '/category/garden/kitchen/kettles/')
+        self.assertEqual(self.client.get('/category/garden/kitchen/kettles/').status_code, 200)
+        response = self.client.get('/category/home/kitchen/kettles/')
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'], '/category/garden/kitchen/kettles/')
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        catalog_autocomplete.invalidate()
+        self.addCleanup(catalog_autocomplete.invalidate)
+        self.kettle = Product.objects.create(name='Red enamel kettle', regular_price=Decimal('10'))
+        catalog_autocomplete.get_index()
+
+    def labels(self, prefix):
+        with self.assertNumQueries(0):
+            return [suggestion['label'] for suggestion in catalog_autocomplete.lookup(prefix)]
+
+    def test_matches_any_word_start(self):
+        self.assertEqual(self.labels('ENAM'), ['Red enamel kettle'])
+        self.assertEqual(self.labels('namel'), [])
+
+    def test_product_changes_update_the_built_index(self):
+        self.kettle.name = 'Blue enamel kettle'
+        self.kettle.save()
+        self.assertEqual(self.labels('blue'), ['Blue enamel kettle'])
+        self.assertEqual(self.labels('red'), [])
+
+        self.kettle.is_active = False
+        self.kettle.save()
+        self.assertEqual(self.labels('kettle'), [])
+
+        teapot = VendorProduct.objects.create(name='Enamel teapot', regular_price=Decimal('10'))
+        self.assertEqual(self.labels('teapot'), [])
+        teapot.status = VendorProduct.STATUS_APPROVED
+        teapot.save()
+        self.assertEqual(self.labels('teapot'), ['Enamel teapot'])
+        teapot.delete()
+        self.assertEqual(self.labels('teapot'), [])
+
+    def test_new_leaf_categories_are_added(self):
+        Category.objects.create(name='Kettles')
+        suggestion = catalog_autocomplete.lookup('kettles')[0]
+        self.assertEqual((suggestion['type'], suggestion['url']), ('category', '/category/kettles/'))
+
+    def test_vendor_suggestions_list_the_vendor_products(self):
+        vendor = get_user_model().objects.create(username='potter', is_vendor=True, company_name='Clay Works')
+        suggestion = catalog_autocomplete.lookup('clay')[0]
+        self.assertEqual(suggestion['url'], f'/search/?vendor={vendor.pk}')
+
+        with mock.patch.object(catalog_autocomplete, 'update_vendor') as update_vendor:
+            vendor.save(update_fields=['last_login'])
+        update_vendor.assert_not_called()
+
+
+class WishlistApiTests(TestCase):
+    def setUp(self):
+        self.teapot = Product.objects.create(name='Teapot', regular_price=Decimal('10'))
+        self.caddy = VendorProduct.objects.create(name='Caddy', regular_price=Decimal('5'), status='approved')
+        self.hidden = VendorProduct.objects.create(name='Strainer', regular_price=Decimal('5'))
+        self.url = reverse('website:wishlist_products_api') + (
+            f'?ids={self.teapot.prefixed_id}&ids={self.caddy.prefixed_id}&ids={self.hidden.prefixed_id}&ids=junk'
+        )
+
+    def test_lists_visible_products_by_name(self):
+        response = self.client.get(self.url)
+        self.assertEqual([product['name'] for product in response.json()], ['Caddy', 'Teapot'])
+        self.assertEqual(response.json()[1]['regular_price'], 10.0)
+
+    def test_unchanged_wishlist_is_revalidated_with_304(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.teapot.sale_price = Decimal('8')
+        self.teapot.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[1]['sale_price'], 8.0)
@@ -10,6 +10,9 @@ urlpatterns = [
     path('product/<str:slug>/', views.product_detail, name='product_detail'),
     path('wishlist/', views.wishlist_page_view, name='wishlist_page'),
     path('api/wishlist-products/', views.wishlist_products_api, name='wishlist_products_api'),
+    path('api/autocomplete/', views.autocomplete_api, name='autocomplete'),
+    path('api/bought-together/', views.bought_together_api, name='bought_together'),
+    path('api/cache-stats/', views.cache_stats_api, name='cache_stats'),
     path('shop/', views.shop, name='shop'),
     path('checkout_ecommerce/', views.checkout_ecommerce, name='checkout_ecommerce'),
     path('order_success/', views.order_success, name='order_success'),
@@ -1,49 +1,47 @@
 from products.models import *
 from .models import *
 from django.shortcuts import render, get_object_or_404, redirect
+import hashlib
+import heapq
 import json
-from decimal import Decimal
 from django.views import View
-from django.db.models import Q, Min, Max
-from django.http import Http404
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404, HttpResponsePermanentRedirect
+from django.urls import reverse
 from .forms import ProductFilterForm
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 import math
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_http_methods
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from orders.models import *
-from itertools import chain
-
-
+from orders.order_lines import record_order_lines
+from orders.pricing import CartError, InvalidCart, price_cart
+from orders.stock import OutOfStock, reserve_stock
+from products.category_paths import category_path, resolve_category_path
+from products.price_stats import get_price_range
+from products.bought_together import bought_together
+from products.related import related_products
+from .catalog import (
+    CatalogQuery, RankedCatalogQuery, CATALOG_SORT_OPTIONS, PRODUCT_KIND, RELEVANCE_SORT, SEARCH_SORT_OPTIONS,
+    VENDOR_PRODUCT_KIND, catalog_facets, clean_sort, paginate_catalog, search_catalog,
+)
+from .search_index import get_search_backend
+from .autocomplete import catalog_autocomplete
+from .fragment_cache import product_card_stats
+from .home_sections import render_home_sections
+from .page_cache import add_page_tags, cache_anonymous_page, conditional_page, page_cache_stats
+from django.contrib.admin.views.decorators import staff_member_required
+
+
+@cache_anonymous_page('layout', 'home', 'catalog')
 def home(request):
-    testimonials_desktop = Testimonial.objects.filter(is_active=True, for_mobile=False)
-    testimonials_mobile = Testimonial.objects.filter(is_active=True, for_mobile=True)
-    desktop_banners = Banner.objects.filter(is_active=True, for_mobile=False).order_by('-created_at')
-    mobile_banners = Banner.objects.filter(is_active=True, for_mobile=True).order_by('-created_at')
-    categories = Category.objects.all()[:13]
-    popular_products = Product.objects.filter(is_featured=True)[:8]
-    home_components = HomeComponents.objects.all()
-    return render(request, 'website/home.html', {
-        'categories': categories,
-        'popular_products': popular_products,
-        'desktop_banners': desktop_banners,
-        'mobile_banners': mobile_banners,
-        'testimonials_desktop': testimonials_desktop,
-        'testimonials_mobile': testimonials_mobile,
-        'home_components':home_components,
-    })
-
-# Helper function to get all descendant categories
-def get_descendants(category):
-    """Recursively gets a category and all its children/grandchildren."""
-    descendants = []
-    children = category.children.all()
-    for child in children:
-        descendants.append(child)
-        descendants.extend(get_descendants(child))
-    return descendants
+    # Sections are cached and invalidated one by one; see home_sections.
+    return render(request, 'website/home.html', {'sections': render_home_sections()})
 
+@cache_anonymous_page('layout', 'catalog')
 def category_detail(request, full_slug=None):
     # --- Filters from request ---
     min_price_param = request.GET.get('min_price')
@@ -57,8 +55,15 @@ def category_detail(request, full_slug=None):
     # --- Fetch category and top-level categories ---
     current_category = None
     if full_slug:
-        slug = full_slug.split('/')[-1]
-        current_category = get_object_or_404(Category, slug=slug)
+        category_id, canonical = resolve_category_path(full_slug)
+        if category_id is None:
+            raise Http404("No Category matches the given query.")
+        if not canonical:
+            # Wrong or outdated parent path: send it to the real one.
+            url = reverse('website:category_detail', kwargs={'full_slug': category_path(category_id)})
+            query = request.GET.urlencode()
+            return HttpResponsePermanentRedirect(f'{url}?{query}' if query else url)
+        current_category = get_object_or_404(Category, pk=category_id)
 
     categories_for_menu = Category.objects.filter(parent__isnull=True).prefetch_related('children')
 
@@ -68,20 +73,13 @@ def category_detail(request, full_slug=None):
 
     # --- Category filter (applies to querysets) ---
     if current_category:
-        descendant_categories = [current_category] + get_descendants(current_category)
-        products_qs = products_qs.filter(categories__in=descendant_categories).distinct()
-        vendor_products_qs = vendor_products_qs.filter(categories__in=descendant_categories).distinct()
-    
-    # --- Pre-calculate filter ranges based on the filtered querysets ---
-    all_prices_in_qs = list(products_qs.values_list('regular_price', flat=True)) + \
-                       list(vendor_products_qs.values_list('regular_price', flat=True))
-    all_sale_prices_in_qs = list(products_qs.exclude(sale_price__isnull=True).values_list('sale_price', flat=True)) + \
-                            list(vendor_products_qs.exclude(sale_price__isnull=True).values_list('sale_price', flat=True))
+        descendant_ids = current_category.get_descendant_ids()
+        products_qs = products_qs.filter(categories__in=descendant_ids).distinct()
+        vendor_products_qs = vendor_products_qs.filter(categories__in=descendant_ids).distinct()
     
-    all_prices_for_range = [p for p in all_prices_in_qs + all_sale_prices_in_qs if p is not None]
-    
-    overall_min_price = min(all_prices_for_range) if all_prices_for_range else 0
-    overall_max_price = max(all_prices_for_range) if all_prices_for_range else 1000
+    # --- Filter ranges from the precomputed category price stats ---
+    price_range = get_price_range(current_category)
+    overall_min_price, overall_max_price = price_range if price_range else (0, 1000)
 
     # --- Parse and apply price filters to querysets ---
     try:
@@ -103,13 +101,6 @@ def category_detail(request, full_slug=None):
     products_qs = products_qs.filter(price_q)
     vendor_products_qs = vendor_products_qs.filter(price_q)
 
-    # --- Search filter (applies to querysets) ---
-    if search_query:
-        search_q = Q(name__icontains=search_query) | Q(short_description__icontains=search_query) | \
-                   Q(description__icontains=search_query) | Q(categories__name__icontains=search_query)
-        products_qs = products_qs.filter(search_q)
-        vendor_products_qs = vendor_products_qs.filter(search_q)
-
     # --- Variation filters (applies to querysets) ---
     variation_q = Q()
     if color_filter:
@@ -123,66 +114,19 @@ def category_detail(request, full_slug=None):
         products_qs = products_qs.filter(variation_q).distinct()
         vendor_products_qs = vendor_products_qs.filter(variation_q).distinct()
 
-    # --- Sorting (applies to querysets) ---
-    valid_sort_options = {
-        '-created_at': 'Newest',
-        'created_at': 'Oldest',
-        'name': 'Name (A-Z)',
-        '-name': 'Name (Z-A)',
-        'regular_price': 'Price (Low to High)',
-        '-regular_price': 'Price (High to Low)',
-    }
-    sort_by = sort_by if sort_by in valid_sort_options else '-created_at'
-    products_qs = products_qs.order_by(sort_by)
-    vendor_products_qs = vendor_products_qs.order_by(sort_by)
-
-    # --- Combine QuerySets + Paginate ---
-    combined_products = list(products_qs) + list(vendor_products_qs)
+    # --- Search filter (last, so the hit limit applies to filtered products) ---
+    if search_query:
+        hits = get_search_backend().search(search_query, within=(products_qs, vendor_products_qs))
+        products_qs, vendor_products_qs, _ = search_catalog(products_qs, vendor_products_qs, hits)
 
-    paginator = Paginator(combined_products, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # --- Combine (UNION ALL), sort + paginate in the database ---
+    sort_by = clean_sort(sort_by)
+    combined_products = CatalogQuery(products_qs, vendor_products_qs, sort_by)
 
-    # --- Sidebar filters (dynamic, based on the filtered querysets) ---
-    filtered_product_ids = list(products_qs.values_list('id', flat=True))
-    filtered_vendor_product_ids = list(vendor_products_qs.values_list('id', flat=True))
+    page_obj = paginate_catalog(combined_products, request)
 
-    product_variations_qs = ProductVariation.objects.filter(product_id__in=filtered_product_ids)
-    vendor_product_variations_qs = VendorProductVariation.objects.filter(product_id__in=filtered_vendor_product_ids)
-
-    # Get available colors
-    all_colors = (
-        set(product_variations_qs.exclude(color__exact='').values_list('color', flat=True).distinct())
-        .union(set(vendor_product_variations_qs.exclude(color__exact='').values_list('color', flat=True).distinct()))
-    )
-    colors = sorted([c for c in all_colors if c is not None])
-
-    # Get available sizes
-    all_sizes = (
-        set(product_variations_qs.exclude(size__exact='').values_list('size', flat=True).distinct())
-        .union(set(vendor_product_variations_qs.exclude(size__exact='').values_list('size', flat=True).distinct()))
-    )
-    sizes = sorted([s for s in all_sizes if s is not None])
-
-    # Get available weights
-    all_weights = (
-        set(product_variations_qs.exclude(weight__exact='').values_list('weight', flat=True).distinct())
-        .union(set(vendor_product_variations_qs.exclude(weight__exact='').values_list('weight', flat=True).distinct()))
-    )
-    weights = sorted([w for w in all_weights if w is not None])
-
-    available_filters = {
-        'colors': colors,
-        'sizes': sizes,
-        'weights': weights,
-    }
-
-    # --- Wishlist from cookies ---
-    try:
-        wishlist_ids = json.loads(request.COOKIES.get('wishlist_ids', '[]'))
-        wishlist_ids = [str(w) for w in wishlist_ids]
-    except json.JSONDecodeError:
-        wishlist_ids = []
+    # --- Sidebar filters (facets with counts, based on the filtered querysets) ---
+    available_filters = catalog_facets(products_qs, vendor_products_qs)
 
     # --- Context for template ---
     context = {
@@ -196,56 +140,54 @@ def category_detail(request, full_slug=None):
         'selected_colors': color_filter,
         'selected_sizes': size_filter,
         'selected_weights': weight_filter,
-        'sort_options': valid_sort_options,
+        'sort_options': CATALOG_SORT_OPTIONS,
         'current_sort': sort_by,
         'search_query': search_query,
         'current_category': current_category,
-        'wishlist_ids': wishlist_ids,
     }
     return render(request, 'website/category_detail.html', context)
+@cache_anonymous_page('layout')
 def product_detail(request, slug):
-    try:
-        product = Product.objects.get(slug=slug)
-        is_vendor_product = False
-    except Product.DoesNotExist:
-        product = get_object_or_404(VendorProduct, slug=slug, is_active=True, status='approved')
-        is_vendor_product = True
-
-    # Fetch all variations
-    variations_queryset = product.variations.all()
-
-    # Extract distinct attributes
-    colors = variations_queryset.filter(color__isnull=False).exclude(color__exact='').values_list('color', flat=True).distinct()
-    sizes = variations_queryset.filter(size__isnull=False).exclude(size__exact='').values_list('size', flat=True).distinct()
-    weights = variations_queryset.filter(weight__isnull=False).exclude(weight__exact='').values_list('weight', flat=True).distinct()
-
-    # JSON-serialize variations
-    def decimal_to_float(obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
-
-    variations_list = list(variations_queryset.values('id', 'color', 'size', 'weight', 'price', 'stock'))
-    variations_json = json.dumps(variations_list, default=decimal_to_float)
-
-    # Related products (only from Product model)
-    related_products = Product.objects.filter(
-        categories__in=product.categories.all()
-    ).exclude(pk=product.pk).distinct()[:5]
+    # One indexed lookup for both product kinds.
+    entry = ProductSlug.objects.select_related('product', 'vendor_product').filter(slug=slug).first()
+    product = entry.target if entry else None
+    is_vendor_product = isinstance(product, VendorProduct)
+    if product is None or (is_vendor_product and not (product.is_active and product.status == 'approved')):
+        raise Http404("No product matches the given query.")
+
+    # Variations come precomputed with the product; see Product.variation_matrix.
+    matrix = product.variation_matrix or {}
+
+    category_ids = list(product.categories.values_list('pk', flat=True))
+
+    related = related_products(product)
+    companions = bought_together([product.prefixed_id])
+
+    # The suggestion cards show other products' prices, so their changes
+    # invalidate this page too.
+    add_page_tags(
+        request,
+        f'product:{product.prefixed_id}',
+        *[f'category:{pk}' for pk in category_ids],
+        *[f'product:{suggestion.prefixed_id}' for suggestion in related + companions],
+    )
 
     context = {
         'product': product,
         'is_vendor_product': is_vendor_product,
-        'variations': variations_queryset,
-        'variations_json': variations_json,
-        'colors': colors,
-        'sizes': sizes,
-        'weights': weights,
-        'related_products': related_products,
+        'variations': matrix.get('variations', []),
+        'variations_json': product.variations_json,
+        'variation_combinations': matrix.get('combinations', {}),
+        'colors': matrix.get('colors', []),
+        'sizes': matrix.get('sizes', []),
+        'weights': matrix.get('weights', []),
+        'related_products': related,
+        'bought_together': companions,
     }
 
     return render(request, 'website/product_detail.html', context)
 
+@cache_anonymous_page('layout', 'catalog')
 def shop(request):
     # --- Filters from request ---
     category_slug = request.GET.get('category')
@@ -271,11 +213,10 @@ def shop(request):
     all_products = Product.objects.filter(is_active=True)
     all_vendor_products = VendorProduct.objects.filter(status='approved')
 
-    # --- Aggregate prices ---
-    all_prices = list(all_products.values_list('regular_price', flat=True)) + \
-                 list(all_vendor_products.values_list('regular_price', flat=True))
-    overall_min_price = min(all_prices) if all_prices else 0
-    overall_max_price = max(all_prices) + 100 if all_prices else 1000
+    # --- Price range (precomputed catalog-wide stats) ---
+    price_range = get_price_range()
+    overall_min_price = price_range[0] if price_range else 0
+    overall_max_price = price_range[1] + 100 if price_range else 1000
 
     min_price_filter = selected_min_from_url or overall_min_price
     max_price_filter = selected_max_from_url or overall_max_price
@@ -290,15 +231,9 @@ def shop(request):
     if category_slug:
         category = Category.objects.filter(slug=category_slug.split('/')[-1]).first()
         if category:
-            def get_descendants(cat):
-                children = list(cat.children.all())
-                for child in cat.children.all():
-                    children.extend(get_descendants(child))
-                return children
-
-            all_categories = [category] + get_descendants(category)
-            products = products.filter(categories__in=all_categories)
-            vendor_products = vendor_products.filter(categories__in=all_categories)
+            descendant_ids = category.get_descendant_ids()
+            products = products.filter(categories__in=descendant_ids)
+            vendor_products = vendor_products.filter(categories__in=descendant_ids)
 
     # --- Price filter ---
     price_filter = Q(regular_price__gte=min_price_filter, regular_price__lte=max_price_filter) | \
@@ -306,13 +241,6 @@ def shop(request):
     products = products.filter(price_filter)
     vendor_products = vendor_products.filter(price_filter)
 
-    # --- Search filter ---
-    if search_query:
-        search_q = Q(name__icontains=search_query) | Q(short_description__icontains=search_query) | \
-                   Q(description__icontains=search_query) | Q(categories__name__icontains=search_query)
-        products = products.filter(search_q)
-        vendor_products = vendor_products.filter(search_q)
-
     # --- Variation filters ---
     variation_q = Q()
     if color_filter:
@@ -325,56 +253,18 @@ def shop(request):
         products = products.filter(variation_q)
         vendor_products = vendor_products.filter(variation_q)
 
-    # --- Sorting ---
-    valid_sort_options = {
-        '-created_at': 'Newest',
-        'created_at': 'Oldest',
-        'name': 'Name (A-Z)',
-        '-name': 'Name (Z-A)',
-        'regular_price': 'Price (Low to High)',
-        '-regular_price': 'Price (High to Low)',
-    }
-    sort_by = sort_by if sort_by in valid_sort_options else '-created_at'
-    products = products.order_by(sort_by)
-    vendor_products = vendor_products.order_by(sort_by)
-
-    # --- Combine + paginate ---
-    combined_products = sorted(
-        chain(products, vendor_products),
-        key=lambda x: getattr(x, sort_by.lstrip('-')) or 0,
-        reverse=sort_by.startswith('-')
-    )
-    paginator = Paginator(combined_products, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    # --- Sidebar filters (merged Product + VendorProduct variations) ---
-    # Colors
-    product_colors = ProductVariation.objects.filter(product__in=all_products).exclude(color__isnull=True).exclude(color__exact='').values_list('color', flat=True).distinct()
-    vendor_colors = VendorProductVariation.objects.filter(product__in=all_vendor_products).exclude(color__isnull=True).exclude(color__exact='').values_list('color', flat=True).distinct()
-    colors = sorted(set(product_colors).union(set(vendor_colors)))
-
-    # Sizes
-    product_sizes = ProductVariation.objects.filter(product__in=all_products).exclude(size__isnull=True).exclude(size__exact='').values_list('size', flat=True).distinct()
-    vendor_sizes = VendorProductVariation.objects.filter(product__in=all_vendor_products).exclude(size__isnull=True).exclude(size__exact='').values_list('size', flat=True).distinct()
-    sizes = sorted(set(product_sizes).union(set(vendor_sizes)))
-
-    # Weights
-    product_weights = ProductVariation.objects.filter(product__in=all_products).exclude(weight__isnull=True).exclude(weight__exact='').values_list('weight', flat=True).distinct()
-    vendor_weights = VendorProductVariation.objects.filter(product__in=all_vendor_products).exclude(weight__isnull=True).exclude(weight__exact='').values_list('weight', flat=True).distinct()
-    weights = sorted(set(product_weights).union(set(vendor_weights)))
-
-    available_filters = {
-        'colors': colors,
-        'sizes': sizes,
-        'weights': weights,
-    }
+    # --- Search filter (last, so the hit limit applies to filtered products) ---
+    if search_query:
+        hits = get_search_backend().search(search_query, within=(products, vendor_products))
+        products, vendor_products, _ = search_catalog(products, vendor_products, hits)
 
-    # --- Wishlist ---
-    try:
-        wishlist_ids = json.loads(request.COOKIES.get('wishlist_ids', '[]'))
-    except json.JSONDecodeError:
-        wishlist_ids = []
+    # --- Combine (UNION ALL), sort + paginate in the database ---
+    sort_by = clean_sort(sort_by)
+    combined_products = CatalogQuery(products, vendor_products, sort_by)
+    page_obj = paginate_catalog(combined_products, request)
+
+    # --- Sidebar filters (merged Product + VendorProduct variation facets) ---
+    available_filters = catalog_facets(all_products, all_vendor_products)
 
     # --- Context ---
     context = {
@@ -388,83 +278,123 @@ def shop(request):
         'selected_colors': color_filter,
         'selected_sizes': size_filter,
         'selected_weights': weight_filter,
-        'sort_options': valid_sort_options,
+        'sort_options': CATALOG_SORT_OPTIONS,
         'current_sort': sort_by,
         'search_query': search_query or '',
         'current_category': category_slug or '',
-        'wishlist_ids': wishlist_ids,
     }
     return render(request, 'website/shop.html', context)
 
 
+def autocomplete_api(request):
+    query = request.GET.get('q', '').strip()
+    return JsonResponse({'results': catalog_autocomplete.lookup(query) if query else []})
+
+
+def bought_together_api(request):
+    # ids are prefixed ids: one product, or everything in the cart.
+    suggestions = bought_together(request.GET.getlist('ids'))
+    return JsonResponse({'results': [
+        {
+            'id': product.prefixed_id,
+            'name': product.name,
+            'url': reverse('website:product_detail', args=[product.slug]),
+            'regular_price': float(product.regular_price) if product.regular_price else 0.0,
+            'sale_price': float(product.sale_price) if product.sale_price else None,
+            'image': product.primary_image.url if product.primary_image else '/static/icons/default-image.webp',
+        }
+        for product in suggestions
+    ]})
+
+
+@staff_member_required
+def cache_stats_api(request):
+    # Counters are per worker process.
+    return JsonResponse({
+        'product_cards': product_card_stats.as_dict(),
+        'pages': page_cache_stats.as_dict(),
+    })
+
+
 def wishlist_page_view(request):
     return render(request, 'website/wishlist.html', {})
 
-@require_POST
+def _wishlist_products(prefixed_ids):
+    """
+    The visible wishlisted products ordered by name: one query per product
+    model, each sorted in SQL, merged here. Cards use the denormalized
+    primary image, so nothing is queried per item.
+    """
+    ids = {PRODUCT_KIND: set(), VENDOR_PRODUCT_KIND: set()}
+    for pid in prefixed_ids:
+        if isinstance(pid, str):
+            kind, _, pk = pid.partition('-')
+            if kind in ids and pk.isdigit():
+                ids[kind].add(int(pk))
+
+    by_name = ('name', 'pk')
+    products = Product.objects.filter(pk__in=ids[PRODUCT_KIND], is_active=True).order_by(*by_name)
+    vendor_products = VendorProduct.objects.filter(pk__in=ids[VENDOR_PRODUCT_KIND], status='approved').order_by(*by_name)
+    return list(heapq.merge(
+        products if ids[PRODUCT_KIND] else [],
+        vendor_products if ids[VENDOR_PRODUCT_KIND] else [],
+        key=lambda product: product.name,
+    ))
+
+
+def _wishlist_etag(products):
+    versions = '|'.join(
+        f'{product.prefixed_id}:{product.updated_at}:{product.primary_image.name or ""}' for product in products
+    )
+    return hashlib.md5(versions.encode()).hexdigest()
+
+
+@require_http_methods(['GET', 'POST'])
 @csrf_exempt
 def wishlist_products_api(request):
-    if request.content_type != 'application/json':
-        return JsonResponse({"error": "Content-Type must be application/json"}, status=415)
-
-    try:
-        data = json.loads(request.body)
-        product_ids_from_frontend = data.get('product_ids', [])
-
-        if not isinstance(product_ids_from_frontend, list):
-            return JsonResponse({"error": "product_ids must be a list."}, status=400)
-
-        # Separate IDs
-        regular_ids = []
-        vendor_ids = []
-
-        for pid in product_ids_from_frontend:
-            if isinstance(pid, str):
-                if pid.startswith('p-'):
-                    try:
-                        regular_ids.append(int(pid.split('-')[1]))
-                    except (ValueError, IndexError):
-                        continue
-                elif pid.startswith('v-'):
-                    try:
-                        vendor_ids.append(int(pid.split('-')[1]))
-                    except (ValueError, IndexError):
-                        continue
-
-        regular_products = Product.objects.filter(pk__in=regular_ids, is_active=True)
-        vendor_products = VendorProduct.objects.filter(pk__in=vendor_ids, status='approved')
-
-        all_wishlist_products = list(regular_products) + list(vendor_products)
-        all_wishlist_products.sort(key=lambda x: x.name or "")
-
-        serialized_products = []
-        for product in all_wishlist_products:
-            image_url = '/static/icons/default-image.webp'
-            product_images = getattr(product, 'images', None)
-
-            if product_images and product_images.exists() and product_images.first().image:
-                image_url = product_images.first().image.url
-
-            sale_price = float(product.sale_price) if product.sale_price else None
-            regular_price = float(product.regular_price) if product.regular_price else 0.0
-
-            serialized_products.append({
-                'id': product.prefixed_id,
-                'name': product.name,
-                'slug': product.slug,
-                'regular_price': regular_price,
-                'sale_price': sale_price,
-                'image': image_url,
-            })
-
-        return JsonResponse(serialized_products, safe=False)
-
-    except json.JSONDecodeError:
-        return JsonResponse({"error": "Invalid JSON in request body."}, status=400)
-    except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.exception("Error in wishlist_products_api:")
-        return JsonResponse({"error": "An unexpected error occurred."}, status=500)
+    # GET ?ids=p-1&ids=v-2 can be revalidated with the ETag; POSTing
+    # {"product_ids": [...]} is still accepted.
+    if request.method == 'GET':
+        product_ids_from_frontend = request.GET.getlist('ids')
+    else:
+        if request.content_type != 'application/json':
+            return JsonResponse({"error": "Content-Type must be application/json"}, status=415)
+        try:
+            product_ids_from_frontend = json.loads(request.body).get('product_ids', [])
+        except (json.JSONDecodeError, AttributeError):
+            return JsonResponse({"error": "Invalid JSON in request body."}, status=400)
+
+    if not isinstance(product_ids_from_frontend, list):
+        return JsonResponse({"error": "product_ids must be a list."}, status=400)
+
+    products = _wishlist_products(product_ids_from_frontend)
+    etag = _wishlist_etag(products)
+    if request.method == 'GET':
+        not_modified = get_conditional_response(request, etag=quote_etag(etag))
+        if not_modified is not None:
+            return not_modified
+
+    serialized_products = []
+    for product in products:
+        image_url = '/static/icons/default-image.webp'
+        if product.primary_image:
+            image_url = product.primary_image.url
+
+        sale_price = float(product.sale_price) if product.sale_price else None
+        regular_price = float(product.regular_price) if product.regular_price else 0.0
+
+        serialized_products.append({
+            'id': product.prefixed_id,
+            'name': product.name,
+            'slug': product.slug,
+            'regular_price': regular_price,
+            'sale_price': sale_price,
+            'image': image_url,
+        })
+
+    response = JsonResponse(serialized_products, safe=False)
+    response['ETag'] = quote_etag(etag)
+    return response
     
     
 def checkout_ecommerce(request):
@@ -478,30 +408,13 @@ def checkout_ecommerce(request):
             if not isinstance(cart_items, list):
                 cart_items = [cart_items]
 
-            total_amount = Decimal('0.0')
-            cleaned_cart_items = []
-
-            for item in cart_items:
-                try:
-                    price = Decimal(str(item['price']))
-                    quantity = Decimal(str(item['quantity']))
-                    total_amount += price * quantity
-
-                    vendor_id = item.get('vendor_id')
-                    if vendor_id in [None, '']:
-                        return JsonResponse({'error': f"Missing vendor_id for item: {item.get('name', 'Unknown')}"}, status=400)
-
-                    cleaned_cart_items.append({
-                        'name': item.get('name', ''),
-                        'image': item.get('image', ''),
-                        'price': float(price),
-                        'quantity': int(quantity),
-                        'variation': item.get('variation', {}),
-                        'vendor_id': str(vendor_id),
-                        'product_id': str(item.get('product_id')),
-                    })
-                except Exception as item_error:
-                    return JsonResponse({'error': f"Error processing item: {item_error}"}, status=400)
+            # Prices, names and vendors come from the catalog, not the cart.
+            try:
+                cart_lines, total_amount = price_cart(cart_items)
+            except CartError as error:
+                # A malformed cart is the client's bug; a stale one needs the shopper.
+                status = 409 if error.problems and not isinstance(error, InvalidCart) else 400
+                return JsonResponse({'error': str(error), 'lines': error.problems}, status=status)
 
             delivery_zone = request.POST.get('delivery_zone')
             if not delivery_zone:
@@ -514,15 +427,23 @@ def checkout_ecommerce(request):
 
             grand_total = total_amount + delivery_charge.charge
 
-            order = Ecommercecheckouts.objects.create(
-                items_json=cleaned_cart_items,
-                customer_name=request.POST.get('customer_name', ''),
-                customer_phone=request.POST.get('customer_phone_number', ''),
-                customer_address=request.POST.get('customer_address', ''),
-                delivery_charge=delivery_charge,
-                total_amount=grand_total,
-                status='processing'
-            )
+            # Stock is taken last, so the row locks are held only briefly
+            # before commit; running out rolls the whole checkout back.
+            try:
+                with transaction.atomic():
+                    order = Ecommercecheckouts.objects.create(
+                        items_json=[line.item for line in cart_lines],
+                        customer_name=request.POST.get('customer_name', ''),
+                        customer_phone=request.POST.get('customer_phone_number', ''),
+                        customer_address=request.POST.get('customer_address', ''),
+                        delivery_charge=delivery_charge,
+                        total_amount=grand_total,
+                        status='processing'
+                    )
+                    record_order_lines(order, cart_lines)
+                    reserve_stock(order, cart_lines)
+            except OutOfStock as error:
+                return JsonResponse({'error': str(error), 'lines': error.problems}, status=409)
 
             return redirect('/order_success/?orderid=' + str(order.id))
 
@@ -547,6 +468,7 @@ def order_success(request):
         'order': order,
     })
 
+@conditional_page('layout', 'catalog')
 def search(request):
     category_slug = request.GET.get('category')
     min_price_param = request.GET.get('min_price')
@@ -555,24 +477,24 @@ def search(request):
     color_filter = request.GET.getlist('color')
     size_filter = request.GET.getlist('size')
     weight_filter = request.GET.getlist('weight')
-    sort_by = request.GET.get('sort_by', '-created_at')
+    sort_by = request.GET.get('sort_by', RELEVANCE_SORT if search_query else '-created_at')
 
     # Base queries
     products_qs = Product.objects.filter(is_active=True)
     vendor_products_qs = VendorProduct.objects.filter(status='approved', is_active=True)
 
-    # Price range calculation
-    overall_min_price = min(
-        products_qs.aggregate(p=Min('regular_price'))['p'] or float('inf'),
-        vendor_products_qs.aggregate(p=Min('regular_price'))['p'] or float('inf')
-    )
-    overall_max_price = max(
-        products_qs.aggregate(p=Max('regular_price'))['p'] or 0,
-        vendor_products_qs.aggregate(p=Max('regular_price'))['p'] or 0
-    )
-    if overall_min_price == float('inf'):
-        overall_min_price = 0
-    overall_max_price += 100
+    # One vendor's products (autocomplete vendor suggestions link here)
+    vendor_id = request.GET.get('vendor', '')
+    if not vendor_id.isdigit():
+        vendor_id = ''
+    if vendor_id:
+        products_qs = products_qs.filter(vendor_id=vendor_id)
+        vendor_products_qs = vendor_products_qs.filter(vendor_id=vendor_id)
+
+    # Price range (precomputed catalog-wide stats)
+    price_range = get_price_range()
+    overall_min_price = price_range[0] if price_range else 0
+    overall_max_price = (price_range[1] if price_range else 0) + 100
 
     # Selected price from request
     try:
@@ -593,14 +515,9 @@ def search(request):
         last_slug = category_slug.split('/')[-1]
         category = Category.objects.filter(slug=last_slug).first()
         if category:
-            def get_descendants(cat):
-                descendants = list(cat.children.all())
-                for child in cat.children.all():
-                    descendants.extend(get_descendants(child))
-                return descendants
-            all_categories = [category] + get_descendants(category)
-            products_qs = products_qs.filter(categories__in=all_categories).distinct()
-            vendor_products_qs = vendor_products_qs.filter(categories__in=all_categories).distinct()
+            descendant_ids = category.get_descendant_ids()
+            products_qs = products_qs.filter(categories__in=descendant_ids).distinct()
+            vendor_products_qs = vendor_products_qs.filter(categories__in=descendant_ids).distinct()
 
     # Price filtering
     price_filter = Q(regular_price__gte=selected_min, regular_price__lte=selected_max) | \
@@ -608,15 +525,6 @@ def search(request):
     products_qs = products_qs.filter(price_filter).distinct()
     vendor_products_qs = vendor_products_qs.filter(price_filter).distinct()
 
-    # Search filtering
-    if search_query:
-        search_q = Q(name__icontains=search_query) | \
-                   Q(short_description__icontains=search_query) | \
-                   Q(description__icontains=search_query) | \
-                   Q(categories__name__icontains=search_query)
-        products_qs = products_qs.filter(search_q).distinct()
-        vendor_products_qs = vendor_products_qs.filter(search_q).distinct()
-
     # Variation filters
     variation_q = Q()
     if color_filter:
@@ -627,67 +535,28 @@ def search(request):
         variation_q &= Q(variations__weight__in=weight_filter)
     if variation_q:
         products_qs = products_qs.filter(variation_q).distinct()
+        vendor_products_qs = vendor_products_qs.filter(variation_q).distinct()
 
-    vendor_variation_q = Q()
-    if color_filter:
-        vendor_variation_q &= Q(vendor_variations__color__in=color_filter)
-    if size_filter:
-        vendor_variation_q &= Q(vendor_variations__size__in=size_filter)
-    if weight_filter:
-        vendor_variation_q &= Q(vendor_variations__weight__in=weight_filter)
-    if vendor_variation_q:
-        vendor_products_qs = vendor_products_qs.filter(vendor_variation_q).distinct()
-
-    # Combine all products
-    all_combined = list(products_qs) + list(vendor_products_qs)
-
-    # Sorting
-    valid_sort_options = {
-        '-created_at': 'Newest',
-        'created_at': 'Oldest',
-        'name': 'Name (A-Z)',
-        '-name': 'Name (Z-A)',
-        'regular_price': 'Price (Low to High)',
-        '-regular_price': 'Price (High to Low)',
-    }
-    if sort_by in valid_sort_options:
-        reverse = sort_by.startswith('-')
-        key = sort_by.lstrip('-')
-        all_combined.sort(key=lambda x: getattr(x, key, 0) or 0, reverse=reverse)
+    # Search filtering (full-text index, ranked), within the filtered
+    # products so the hit limit doesn't cut matches the filters keep
+    ranking = None
+    if search_query:
+        hits = get_search_backend().search(search_query, within=(products_qs, vendor_products_qs))
+        products_qs, vendor_products_qs, ranking = search_catalog(products_qs, vendor_products_qs, hits)
+
+    # Combine all products: rank order for relevance, otherwise UNION ALL
+    # with sorting + pagination in the database
+    if ranking is not None and sort_by == RELEVANCE_SORT:
+        all_combined = RankedCatalogQuery(products_qs, vendor_products_qs, ranking)
     else:
-        sort_by = '-created_at'
-        all_combined.sort(key=lambda x: getattr(x, 'created_at', None) or 0, reverse=True)
+        sort_by = clean_sort(sort_by)
+        all_combined = CatalogQuery(products_qs, vendor_products_qs, sort_by)
 
     # Pagination
-    paginator = Paginator(all_combined, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate_catalog(all_combined, request)
 
-    # Filters (without None/empty values)
-    variation_qs = ProductVariation.objects.filter(product__in=products_qs)
-    vendor_variation_qs = VendorProductVariation.objects.filter(product__in=vendor_products_qs)
-
-    colors = sorted(set(
-        list(variation_qs.exclude(color__isnull=True).exclude(color__exact='').values_list('color', flat=True)) +
-        list(vendor_variation_qs.exclude(color__isnull=True).exclude(color__exact='').values_list('color', flat=True))
-    ))
-
-    sizes = sorted(set(
-        list(variation_qs.exclude(size__isnull=True).exclude(size__exact='').values_list('size', flat=True)) +
-        list(vendor_variation_qs.exclude(size__isnull=True).exclude(size__exact='').values_list('size', flat=True))
-    ))
-
-    weights = sorted(set(
-        list(variation_qs.exclude(weight__isnull=True).exclude(weight__exact='').values_list('weight', flat=True)) +
-        list(vendor_variation_qs.exclude(weight__isnull=True).exclude(weight__exact='').values_list('weight', flat=True))
-    ))
-
-    # Wishlist
-    wishlist_ids_cookie_str = request.COOKIES.get('wishlist_ids', '[]')
-    try:
-        initial_wishlist_ids = [str(i) for i in json.loads(wishlist_ids_cookie_str)]
-    except json.JSONDecodeError:
-        initial_wishlist_ids = []
+    # Filters (facets with counts, without None/empty values)
+    available_filters = catalog_facets(products_qs, vendor_products_qs)
 
     context = {
         'products': page_obj,
@@ -696,19 +565,15 @@ def search(request):
         'max_price': overall_max_price,
         'selected_min': selected_min,
         'selected_max': selected_max,
-        'available_filters': {
-            'colors': colors,
-            'sizes': sizes,
-            'weights': weights,
-        },
+        'available_filters': available_filters,
         'selected_colors': color_filter,
         'selected_sizes': size_filter,
         'selected_weights': weight_filter,
-        'sort_options': valid_sort_options,
+        'sort_options': SEARCH_SORT_OPTIONS if ranking is not None else CATALOG_SORT_OPTIONS,
         'current_sort': sort_by,
         'search_query': search_query or '',
         'current_category': category_slug or '',
-        'wishlist_ids': initial_wishlist_ids,
+        'current_vendor': vendor_id,
     }
     return render(request, 'website/search.html', context)
 